@@ -18,9 +18,50 @@ except ImportError:
     
 check_version('labscript', '2.0.1', '3')
 
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker
+from labscript_devices import labscript_device, alias_companion_classes
+from labscript_devices.Profiling import profile
 from labscript import TriggerableDevice, LabscriptError, set_passed_properties
 import numpy as np
+from bisect import bisect_left, insort
+
+
+class ExposureIndex(object):
+    """The exposures of all the cameras sharing a trigger device, indexed so
+    that checking a new exposure against them does not need a scan of every
+    previous exposure."""
+    def __init__(self):
+        # (t, duration) -> the cameras that have requested that trigger:
+        self.triggers = {}
+        # camera -> its exposures as (start, end) sorted by start, and as (end, start) sorted by end:
+        self.by_start = {}
+        self.by_end = {}
+        
+    def add(self, camera, t, duration):
+        self.triggers.setdefault((t, duration), set()).add(camera)
+        insort(self.by_start.setdefault(camera, []), (t, t + duration))
+        insort(self.by_end.setdefault(camera, []), (t + duration, t))
+        
+    def requested_by_other(self, camera, t, duration):
+        """Whether a camera other than this one has already requested this trigger"""
+        requested_by = self.triggers.get((t, duration), ())
+        return len(requested_by) > (camera in requested_by)
+        
+    def recovery_time_conflict(self, camera, start, end, minimum_recovery_time):
+        """Returns the (start, end) of an exposure of this camera that ends or
+        starts less than minimum_recovery_time from the given exposure, or None"""
+        if not minimum_recovery_time > 0:
+            return None
+        # Other exposures starting too soon after this one ends, or ending too soon before it starts:
+        for edge, exposures, key_is_start in [(end, self.by_start.get(camera, []), True),
+                                              (start, self.by_end.get(camera, []), False)]:
+            # Only exposures with an edge within minimum_recovery_time of this one can conflict:
+            i = bisect_left(exposures, (edge - minimum_recovery_time,))
+            while i < len(exposures) and exposures[i][0] <= edge + minimum_recovery_time:
+                if abs(exposures[i][0] - edge) < minimum_recovery_time:
+                    return exposures[i] if key_is_start else exposures[i][::-1]
+                i += 1
+        return None
+        
 
 @labscript_device
 class Camera(TriggerableDevice):
@@ -32,13 +73,16 @@ class Camera(TriggerableDevice):
     
     @set_passed_properties(
         property_names = {
-            "connection_table_properties": ["BIAS_port"],
+            "connection_table_properties": ["BIAS_port", "transfer_frames"],
             "device_properties": ["serial_number", "SDK", "effective_pixel_size", "exposure_time", "orientation", "trigger_edge_type", "minimum_recovery_time"]}
         )
     def __init__(self, name, parent_device, connection,
                  BIAS_port = 1027, serial_number = 0x0, SDK='', effective_pixel_size=0.0,
                  exposure_time=float('nan'), orientation='side', trigger_edge_type='rising', minimum_recovery_time=0,
-                 **kwargs):
+                 transfer_frames=False, **kwargs):
+        # transfer_frames: if True, and BLACS talks to the camera server over
+        # ZMQ, the server sends frames to BLACS to be written into the shot
+        # file, rather than writing them itself over the shared drive.
                     
         # not a class attribute, so we don't have to have a subclass for each model of camera:
         self.trigger_edge_type = trigger_edge_type
@@ -75,41 +119,46 @@ class Camera(TriggerableDevice):
             raise LabscriptError("exposure_time must be > 0, not %s"%str(duration))
         # Only ask for a trigger if one has not already been requested by 
         # another camera attached to the same trigger:
-        already_requested = False
-        for camera in self.trigger_device.child_devices:
-            if camera is not self:
-                for _, other_t, _, other_duration in camera.exposures:
-                    if t == other_t and duration == other_duration:
-                        already_requested = True
-        if not already_requested:
+        exposure_index = self.exposure_index
+        if not exposure_index.requested_by_other(self, t, duration):
             self.trigger_device.trigger(t, duration)
         # Check for exposures too close together (check for overlapping 
         # triggers already performed in self.trigger_device.trigger()):
         start = t
         end = t + duration
-        for exposure in self.exposures:
-            _, other_t, _, other_duration = exposure
-            other_start = other_t
-            other_end = other_t + other_duration
-            if abs(other_start - end) < self.minimum_recovery_time or abs(other_end - start) < self.minimum_recovery_time:
-                raise LabscriptError('%s %s has two exposures closer together than the minimum recovery time: ' %(self.description, self.name) + \
-                                     'one at t = %fs for %fs, and another at t = %fs for %fs. '%(t,duration,start,duration) + \
-                                     'The minimum recovery time is %fs.'%self.minimum_recovery_time)
+        conflict = exposure_index.recovery_time_conflict(self, start, end, self.minimum_recovery_time)
+        if conflict is not None:
+            other_start, other_end = conflict
+            raise LabscriptError('%s %s has two exposures closer together than the minimum recovery time: ' %(self.description, self.name) + \
+                                 'one at t = %fs for %fs, and another at t = %fs for %fs. '%(t,duration,other_start,other_end-other_start) + \
+                                 'The minimum recovery time is %fs.'%self.minimum_recovery_time)
         self.exposures.append((name, t, frametype, duration))
+        exposure_index.add(self, t, duration)
         return duration
+        
+    @property
+    def exposure_index(self):
+        """The ExposureIndex shared by all cameras on this camera's trigger device"""
+        try:
+            return self.trigger_device._camera_exposure_index
+        except AttributeError:
+            self.trigger_device._camera_exposure_index = ExposureIndex()
+            return self.trigger_device._camera_exposure_index
     
     def do_checks(self):
         # Check that all Cameras sharing a trigger device have exposures when we have exposures:
         for camera in self.trigger_device.child_devices:
             if camera is not self:
+                other_exposures = set(camera.exposures)
                 for exposure in self.exposures:
-                    if exposure not in camera.exposures:
+                    if exposure not in other_exposures:
                         _, start, _, duration = exposure
                         raise LabscriptError('Cameras %s and %s share a trigger. ' % (self.name, camera.name) + 
                                              '%s has an exposure at %fs for %fs, ' % (self.name, start, duration) +
                                              'but there is no matching exposure for %s. ' % camera.name +
                                              'Cameras sharing a trigger must have identical exposure times and durations.')
                         
+    @profile
     def generate_code(self, hdf5_file):
         self.do_checks()
         table_dtypes = [('name','a256'), ('time',float), ('frametype','a256'), ('exposure_time',float)]
@@ -122,202 +171,7 @@ class Camera(TriggerableDevice):
             
         # DEPRECATED backward campatibility for use of exposuretime keyword argument instead of exposure_time:
         self.set_property('exposure_time', self.exposure_time, location='device_properties', overwrite=True)
-            
-            
-
-import os
-from blacs.tab_base_classes import Worker, define_state
-from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
 
-from blacs.device_base_class import DeviceTab
-
-from qtutils import UiLoader
-
-@BLACS_tab
-class CameraTab(DeviceTab):
-    def initialise_GUI(self):
-        layout = self.get_tab_layout()
-        ui_filepath = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'camera.ui')
-        self.ui = UiLoader().load(ui_filepath)
-        layout.addWidget(self.ui)
-        
-        port = int(self.settings['connection_table'].find_by_name(self.settings["device_name"]).BLACS_connection)
-        self.ui.port_label.setText(str(port)) 
-        
-        self.ui.is_responding.setVisible(False)
-        self.ui.is_not_responding.setVisible(False)
-        
-        self.ui.host_lineEdit.returnPressed.connect(self.update_settings_and_check_connectivity)
-        self.ui.use_zmq_checkBox.toggled.connect(self.update_settings_and_check_connectivity)
-        self.ui.check_connectivity_pushButton.clicked.connect(self.update_settings_and_check_connectivity)
-        
-    def get_save_data(self):
-        return {'host': str(self.ui.host_lineEdit.text()), 'use_zmq': self.ui.use_zmq_checkBox.isChecked()}
-    
-    def restore_save_data(self, save_data):
-        print 'restore save data running'
-        if save_data:
-            host = save_data['host']
-            self.ui.host_lineEdit.setText(host)
-            if 'use_zmq' in save_data:
-                use_zmq = save_data['use_zmq']
-                self.ui.use_zmq_checkBox.setChecked(use_zmq)
-        else:
-            self.logger.warning('No previous front panel state to restore')
-        
-        # call update_settings if primary_worker is set
-        # this will be true if you load a front panel from the file menu after the tab has started
-        if self.primary_worker:
-            self.update_settings_and_check_connectivity()
-            
-    def initialise_workers(self):
-        worker_initialisation_kwargs = {'port': self.ui.port_label.text()}
-        self.create_worker("main_worker", CameraWorker, worker_initialisation_kwargs)
-        self.primary_worker = "main_worker"
-        self.update_settings_and_check_connectivity()
-       
-    @define_state(MODE_MANUAL, queue_state_indefinitely=True, delete_stale_states=True)
-    def update_settings_and_check_connectivity(self, *args):
-        self.ui.saying_hello.setVisible(True)
-        self.ui.is_responding.setVisible(False)
-        self.ui.is_not_responding.setVisible(False)
-        kwargs = self.get_save_data()
-        responding = yield(self.queue_work(self.primary_worker, 'update_settings_and_check_connectivity', **kwargs))
-        self.update_responding_indicator(responding)
-        
-    def update_responding_indicator(self, responding):
-        self.ui.saying_hello.setVisible(False)
-        if responding:
-            self.ui.is_responding.setVisible(True)
-            self.ui.is_not_responding.setVisible(False)
-        else:
-            self.ui.is_responding.setVisible(False)
-            self.ui.is_not_responding.setVisible(True)
 
-@BLACS_worker            
-class CameraWorker(Worker):
-    def init(self):#, port, host, use_zmq):
-#        self.port = port
-#        self.host = host
-#        self.use_zmq = use_zmq
-        global socket; import socket
-        global zmq; import zmq
-        global zprocess; import zprocess
-        global shared_drive; import labscript_utils.shared_drive as shared_drive
-        
-        self.host = ''
-        self.use_zmq = False
-        
-    def update_settings_and_check_connectivity(self, host, use_zmq):
-        self.host = host
-        self.use_zmq = use_zmq
-        if not self.host:
-            return False
-        if not self.use_zmq:
-            return self.initialise_sockets(self.host, self.port)
-        else:
-            response = zprocess.zmq_get_raw(self.port, self.host, data='hello')
-            if response == 'hello':
-                return True
-            else:
-                raise Exception('invalid response from server: ' + str(response))
-                
-    def initialise_sockets(self, host, port):
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        assert port, 'No port number supplied.'
-        assert host, 'No hostname supplied.'
-        assert str(int(port)) == port, 'Port must be an integer.'
-        s.settimeout(10)
-        s.connect((host, int(port)))
-        s.send('hello\r\n')
-        response = s.recv(1024)
-        s.close()
-        if 'hello' in response:
-            return True
-        else:
-            raise Exception('invalid response from server: ' + response)
-    
-    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
-        h5file = shared_drive.path_to_agnostic(h5file)
-        if not self.use_zmq:
-            return self.transition_to_buffered_sockets(h5file,self.host, self.port)
-        response = zprocess.zmq_get_raw(self.port, self.host, data=h5file)
-        if response != 'ok':
-            raise Exception('invalid response from server: ' + str(response))
-        response = zprocess.zmq_get_raw(self.port, self.host, timeout = 10)
-        if response != 'done':
-            raise Exception('invalid response from server: ' + str(response))
-        return {} # indicates final values of buffered run, we have none
-        
-    def transition_to_buffered_sockets(self, h5file, host, port):
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(120)
-        s.connect((host, int(port)))
-        s.send('%s\r\n'%h5file)
-        response = s.recv(1024)
-        if not 'ok' in response:
-            s.close()
-            raise Exception(response)
-        response = s.recv(1024)
-        if not 'done' in response:
-            s.close()
-            raise Exception(response)
-        return {} # indicates final values of buffered run, we have none
-        
-    def transition_to_manual(self):
-        if not self.use_zmq:
-            return self.transition_to_manual_sockets(self.host, self.port)
-        response = zprocess.zmq_get_raw(self.port, self.host, 'done')
-        if response != 'ok':
-            raise Exception('invalid response from server: ' + str(response))
-        response = zprocess.zmq_get_raw(self.port, self.host, timeout = 10)
-        if response != 'done':
-            raise Exception('invalid response from server: ' + str(response))
-        return True # indicates success
-        
-    def transition_to_manual_sockets(self, host, port):
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(120)
-        s.connect((host, int(port)))
-        s.send('done\r\n')
-        response = s.recv(1024)
-        if response != 'ok\r\n':
-            s.close()
-            raise Exception(response)
-        response = s.recv(1024)
-        if not 'done' in response:
-            s.close()
-            raise Exception(response)
-        return True # indicates success
-        
-    def abort_buffered(self):
-        return self.abort()
-        
-    def abort_transition_to_buffered(self):
-        return self.abort()
-    
-    def abort(self):
-        if not self.use_zmq:
-            return self.abort_sockets(self.host, self.port)
-        response = zprocess.zmq_get_raw(self.port, self.host, 'abort')
-        if response != 'done':
-            raise Exception('invalid response from server: ' + str(response))
-        return True # indicates success 
-        
-    def abort_sockets(self, host, port):
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(120)
-        s.connect((host, int(port)))
-        s.send('abort\r\n')
-        response = s.recv(1024)
-        if not 'done' in response:
-            s.close()
-            raise Exception(response)
-        return True # indicates success 
-    
-    def program_manual(self, values):
-        return {}
-    
-    def shutdown(self):
-        return
-        
+# The BLACS tab and worker have moved to Camera_blacs.py:
+alias_companion_classes(__name__, ['CameraTab', 'CameraWorker'])
@@ -0,0 +1,233 @@
+#####################################################################
+#                                                                   #
+# /CameraConnection.py                                              #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+"""Persistent connections from a CameraWorker to camera servers, over either
+the line-based socket protocol or ZMQ. Connections are kept open between
+shots and re-established automatically if the server goes away. Also the
+client side of transferring frames from a camera server over ZMQ."""
+
+import time
+import json
+import socket
+import select
+import threading
+from collections import deque
+
+import numpy as np
+
+# How many recent connect and round trip times each connection remembers:
+N_TIMINGS = 100
+
+
+class ConnectionClosed(socket.error):
+    pass
+
+
+class _Connection(object):
+    def __init__(self, host, port):
+        self.host = host
+        self.port = int(port)
+        self.connect_times = deque(maxlen=N_TIMINGS)
+        self.round_trip_times = deque(maxlen=N_TIMINGS)
+
+    def latency_statistics(self):
+        """Returns min/mean/max of the recent connect and round trip times, in seconds"""
+        statistics = {}
+        for name, times in [('connect', self.connect_times), ('round_trip', self.round_trip_times)]:
+            if times:
+                statistics[name] = {'min': min(times), 'mean': sum(times)/len(times), 'max': max(times), 'count': len(times)}
+        return statistics
+
+
+class LineConnection(_Connection):
+    """A TCP connection to a camera server speaking the line based protocol,
+    in which every command and response is terminated by '\\r\\n'."""
+    def __init__(self, host, port, timeout=120, connect_timeout=10):
+        _Connection.__init__(self, host, port)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.sock = None
+        self._buffer = ''
+
+    def connect(self):
+        self.close()
+        start_time = time.time()
+        self.sock = socket.create_connection((self.host, self.port), self.connect_timeout)
+        self.connect_times.append(time.time() - start_time)
+        # Send commands immediately rather than waiting to coalesce them,
+        # and have the OS notice if the server disappears:
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._buffer = ''
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self._buffer = ''
+
+    def _server_has_closed(self):
+        # A socket that is readable while we are not expecting anything has
+        # either been closed by the server, or has stale data on it:
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return not self.sock.recv(1, socket.MSG_PEEK)
+        except socket.error:
+            return True
+
+    def send(self, line):
+        if self.sock is None or self._server_has_closed():
+            self.connect()
+        self.sock.sendall(line + '\r\n')
+
+    def readline(self, timeout=None):
+        """Returns the next line from the server, without its terminator"""
+        self.sock.settimeout(self.timeout if timeout is None else timeout)
+        while '\n' not in self._buffer:
+            data = self.sock.recv(4096)
+            if not data:
+                self.close()
+                raise ConnectionClosed('Camera server at %s:%d closed the connection'%(self.host, self.port))
+            self._buffer += data
+        line, self._buffer = self._buffer.split('\n', 1)
+        return line.rstrip('\r')
+
+    def command(self, line, timeout=None):
+        """Sends a command and returns the first line of the response. If the
+        server has dropped the connection, reconnects and tries once more."""
+        while True:
+            reused = self.sock is not None
+            start_time = time.time()
+            try:
+                self.send(line)
+                response = self.readline(timeout)
+            except socket.timeout:
+                # The server may still act on the command, so don't repeat it:
+                self.close()
+                raise
+            except socket.error:
+                self.close()
+                if not reused:
+                    raise
+                continue
+            self.round_trip_times.append(time.time() - start_time)
+            return response
+
+
+class ZMQConnection(_Connection):
+    """A ZMQ REQ socket connected to a camera server, kept open between
+    requests. If a request times out the socket is replaced, since a REQ
+    socket cannot send again until it has received a reply."""
+    def __init__(self, host, port, timeout=5):
+        _Connection.__init__(self, host, port)
+        global zmq; import zmq
+        self.timeout = timeout
+        self.context = zmq.Context.instance()
+        self.sock = None
+
+    def connect(self):
+        self.close()
+        start_time = time.time()
+        self.sock = self.context.socket(zmq.REQ)
+        self.sock.setsockopt(zmq.LINGER, 0)
+        self.sock.connect('tcp://%s:%d'%(socket.gethostbyname(self.host), self.port))
+        self.connect_times.append(time.time() - start_time)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def request(self, data='hello', timeout=None, multipart=False):
+        """Sends data and returns the reply. If multipart, returns the parts
+        of the reply as zmq.Frames, without copying them."""
+        if self.sock is None:
+            self.connect()
+        if timeout is None:
+            timeout = self.timeout
+        start_time = time.time()
+        self.sock.send(data)
+        if not self.sock.poll(timeout*1000):
+            self.close()
+            raise zmq.Again('Camera server at %s:%d did not respond within %s seconds'%(self.host, self.port, str(timeout)))
+        if multipart:
+            response = self.sock.recv_multipart(copy=False)
+        else:
+            response = self.sock.recv()
+        self.round_trip_times.append(time.time() - start_time)
+        return response
+
+
+class ConnectionPool(object):
+    """Open connections to camera servers, keyed by host, port and protocol"""
+    def __init__(self):
+        self.connections = {}
+
+    def get(self, host, port, use_zmq=False):
+        key = (host, int(port), bool(use_zmq))
+        if key not in self.connections:
+            connection_class = ZMQConnection if use_zmq else LineConnection
+            self.connections[key] = connection_class(host, port)
+        return self.connections[key]
+
+    def close_all(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections = {}
+
+
+def write_frames(hdf5_file, orientation, frame_infos, frames, compression='gzip', compression_opts=1):
+    """Writes each frame to the dataset /images/<orientation>/<name>/<frametype>
+    for its exposure's name and frametype, where lyse expects it, and where
+    camera servers writing into the shot file themselves put it. Compressed
+    frames are stored as a single chunk each."""
+    group = hdf5_file.require_group('images').require_group(orientation)
+    for info, frame in zip(frame_infos, frames):
+        exposure_group = group.require_group(info['name'])
+        if info['frametype'] in exposure_group:
+            raise Exception('Frame %s (%s) has already been written'%(info['name'], info['frametype']))
+        exposure_group.create_dataset(info['frametype'], data=frame, chunks=frame.shape if compression else None,
+                                      compression=compression, compression_opts=compression_opts if compression else None,
+                                      shuffle=compression is not None)
+
+
+def transfer_frames(connection, hdf5_file, batch_bytes=64*2**20, timeout=120, compression='gzip', compression_opts=1, lock=None):
+    """Has the camera server at the other end of a ZMQConnection send us the
+    shot's frames, and writes them into hdf5_file with write_frames(). We ask
+    for at most batch_bytes of frames at a time, and write them before asking
+    for more, so a fast camera cannot outrun the disk. The frames are written
+    straight from the received message buffers, without copying. lock, if
+    given, is held whilst writing, for when several cameras share the file.
+    Returns the number of frames, the number of bytes, and how long it took."""
+    if lock is None:
+        lock = threading.Lock()
+    response = connection.request('transfer')
+    if response != 'ok':
+        raise Exception('invalid response from server: ' + str(response))
+    start_time = time.time()
+    n_frames = 0
+    n_bytes = 0
+    while True:
+        parts = connection.request('frames %d'%batch_bytes, timeout=timeout, multipart=True)
+        try:
+            header = json.loads(parts[0].bytes)
+        except ValueError:
+            raise Exception('invalid response from server: ' + parts[0].bytes)
+        frames = [np.frombuffer(part, dtype=info['dtype']).reshape(info['shape'])
+                  for info, part in zip(header['frames'], parts[1:])]
+        with lock:
+            write_frames(hdf5_file, header['orientation'], header['frames'], frames, compression, compression_opts)
+        n_frames += len(frames)
+        n_bytes += sum(frame.nbytes for frame in frames)
+        if header['done']:
+            return n_frames, n_bytes, time.time() - start_time
@@ -0,0 +1,340 @@
+#####################################################################
+#                                                                   #
+# /Camera_blacs.py                                                  #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+from labscript_devices import BLACS_tab, BLACS_worker
+from labscript_devices.TransitionTiming import timed_transitions
+
+import os
+from blacs.tab_base_classes import Worker, define_state
+from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
+
+from blacs.device_base_class import DeviceTab
+
+from qtutils import UiLoader
+
+@BLACS_tab
+class CameraTab(DeviceTab):
+    def initialise_GUI(self):
+        layout = self.get_tab_layout()
+        ui_filepath = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'camera.ui')
+        self.ui = UiLoader().load(ui_filepath)
+        layout.addWidget(self.ui)
+        
+        port = int(self.settings['connection_table'].find_by_name(self.settings["device_name"]).BLACS_connection)
+        self.ui.port_label.setText(str(port)) 
+        
+        self.ui.is_responding.setVisible(False)
+        self.ui.is_not_responding.setVisible(False)
+        
+        self.ui.host_lineEdit.returnPressed.connect(self.update_settings_and_check_connectivity)
+        self.ui.use_zmq_checkBox.toggled.connect(self.update_settings_and_check_connectivity)
+        self.ui.check_connectivity_pushButton.clicked.connect(self.update_settings_and_check_connectivity)
+        
+    def get_save_data(self):
+        return {'host': str(self.ui.host_lineEdit.text()), 'use_zmq': self.ui.use_zmq_checkBox.isChecked()}
+    
+    def restore_save_data(self, save_data):
+        print 'restore save data running'
+        if save_data:
+            host = save_data['host']
+            self.ui.host_lineEdit.setText(host)
+            if 'use_zmq' in save_data:
+                use_zmq = save_data['use_zmq']
+                self.ui.use_zmq_checkBox.setChecked(use_zmq)
+        else:
+            self.logger.warning('No previous front panel state to restore')
+        
+        # call update_settings if primary_worker is set
+        # this will be true if you load a front panel from the file menu after the tab has started
+        if self.primary_worker:
+            self.update_settings_and_check_connectivity()
+            
+    def worker_initialisation_kwargs(self):
+        properties = self.settings['connection_table'].find_by_name(self.device_name).properties
+        return {'port': self.ui.port_label.text(), 'transfer_frames': properties.get('transfer_frames', False)}
+        
+    def initialise_workers(self):
+        self.create_worker("main_worker", CameraWorker, self.worker_initialisation_kwargs())
+        self.primary_worker = "main_worker"
+        self.update_settings_and_check_connectivity()
+       
+    @define_state(MODE_MANUAL, queue_state_indefinitely=True, delete_stale_states=True)
+    def update_settings_and_check_connectivity(self, *args):
+        self.ui.saying_hello.setVisible(True)
+        self.ui.is_responding.setVisible(False)
+        self.ui.is_not_responding.setVisible(False)
+        kwargs = self.get_save_data()
+        responding = yield(self.queue_work(self.primary_worker, 'update_settings_and_check_connectivity', **kwargs))
+        self.update_responding_indicator(responding)
+        
+    def update_responding_indicator(self, responding):
+        self.ui.saying_hello.setVisible(False)
+        if responding:
+            self.ui.is_responding.setVisible(True)
+            self.ui.is_not_responding.setVisible(False)
+        else:
+            self.ui.is_responding.setVisible(False)
+            self.ui.is_not_responding.setVisible(True)
+
+@BLACS_worker            
+@timed_transitions
+class CameraWorker(Worker):
+    # Set by the tab from the connection table:
+    transfer_frames = False
+    # How many bytes of frames to ask a camera server for at a time when it is sending us frames:
+    transfer_batch_bytes = 64*2**20
+    transfer_timeout = 120
+    transfer_compression = 'gzip'
+    transfer_compression_opts = 1
+    
+    def init(self):#, port, host, use_zmq):
+#        self.port = port
+#        self.host = host
+#        self.use_zmq = use_zmq
+        global time; import time
+        global traceback; import traceback
+        global deque; from collections import deque
+        global ThreadPool; from multiprocessing.pool import ThreadPool
+        global shared_drive; import labscript_utils.shared_drive as shared_drive
+        global CameraConnection; import labscript_devices.CameraConnection as CameraConnection
+        global threading; import threading
+        global h5py; import labscript_utils.h5_lock, h5py
+        
+        self.host = ''
+        self.use_zmq = False
+        # The (host, port) of each camera server. There is more than one if
+        # this worker is driving a group of cameras:
+        self.servers = []
+        # Connections to the camera servers are kept open from shot to shot:
+        self.connections = CameraConnection.ConnectionPool()
+        # Threads for talking to a group of camera servers at once:
+        self.thread_pool = None
+        # How long each camera server recently took for each phase, and its most recent results:
+        self.phase_times = {}
+        self.results = {}
+        # For frames sent to us by the camera servers, rather than written by them:
+        self.h5file = None
+        self.h5file_lock = threading.Lock()
+        self.transfer_rates = {}
+        
+    def update_settings_and_check_connectivity(self, host, use_zmq):
+        # Settings may have changed, so start afresh:
+        self.connections.close_all()
+        if self.thread_pool is not None:
+            self.thread_pool.close()
+            self.thread_pool = None
+        self.results = {}
+        self.host = host
+        self.use_zmq = use_zmq
+        # host may be a comma separated list of servers, each as host or host:port:
+        self.servers = []
+        for server in self.host.split(','):
+            server = server.strip()
+            if server:
+                server_host, _, server_port = server.partition(':')
+                self.servers.append((server_host, server_port or self.port))
+        if not self.servers:
+            return False
+        for server_host, server_port in self.servers:
+            # Create the connections now rather than from several threads later:
+            self.connections.get(server_host, server_port, self.use_zmq)
+            self.phase_times.setdefault('%s:%s'%(server_host, server_port), {})
+            self.transfer_rates.setdefault('%s:%s'%(server_host, server_port), deque(maxlen=100))
+        if len(self.servers) > 1:
+            self.thread_pool = ThreadPool(len(self.servers))
+        if self.transfer_frames and not self.use_zmq:
+            self.logger.warning('Frames can only be transferred to BLACS over ZMQ. The camera server will write them to the shot file itself.')
+        if not self.use_zmq:
+            self.run_on_cameras('connect', self.initialise_sockets)
+        else:
+            self.run_on_cameras('connect', self.initialise_zmq)
+        return True
+        
+    def run_on_cameras(self, phase, function, *args):
+        """Calls function(*args, host, port) for every camera server, all at
+        once if there are several. Records how long each took and whether it
+        succeeded in self.results, and raises an exception describing every
+        camera server that failed."""
+        def run(server):
+            start_time = time.time()
+            try:
+                function(*(args + server))
+                error = None
+            except Exception:
+                if len(self.servers) == 1:
+                    raise
+                error = traceback.format_exc()
+            return server, time.time() - start_time, error
+            
+        if len(self.servers) > 1:
+            results = self.thread_pool.map(run, self.servers)
+        else:
+            results = [run(server) for server in self.servers]
+        self.results[phase] = {}
+        failures = []
+        for (host, port), duration, error in results:
+            camera = '%s:%s'%(host, port)
+            self.phase_times[camera].setdefault(phase, deque(maxlen=100)).append(duration)
+            self.results[phase][camera] = {'success': error is None, 'duration': duration, 'error': error}
+            if error is not None:
+                failures.append('Camera server %s failed during %s:\n%s'%(camera, phase, error))
+        if failures:
+            raise Exception('\n'.join(failures))
+        return self.results[phase]
+        
+    def latency_statistics(self):
+        """Per camera server min/mean/max time of connecting to and round
+        trips with the server"""
+        statistics = {}
+        for host, port in self.servers:
+            statistics['%s:%s'%(host, port)] = self.connections.get(host, port, self.use_zmq).latency_statistics()
+        return statistics
+        
+    def camera_statistics(self):
+        """Per camera server min/mean/max time of each phase, as well as the
+        latencies reported by latency_statistics()"""
+        latencies = self.latency_statistics()
+        statistics = {}
+        for host, port in self.servers:
+            camera = '%s:%s'%(host, port)
+            # Phases and latencies are kept apart, there is a 'connect' of each:
+            statistics[camera] = {'latencies': latencies[camera], 'phases': {}}
+            for phase, times in self.phase_times[camera].items():
+                statistics[camera]['phases'][phase] = {'min': min(times), 'mean': sum(times)/len(times), 'max': max(times), 'count': len(times)}
+            rates = self.transfer_rates[camera]
+            if rates:
+                statistics[camera]['transfer_MB_per_s'] = {'min': min(rates), 'mean': sum(rates)/len(rates), 'max': max(rates), 'count': len(rates)}
+        return statistics
+                
+    def initialise_sockets(self, host, port):
+        assert port, 'No port number supplied.'
+        assert host, 'No hostname supplied.'
+        assert str(int(port)) == port, 'Port must be an integer.'
+        response = self.connections.get(host, port).command('hello', timeout=10)
+        if 'hello' in response:
+            return True
+        else:
+            raise Exception('invalid response from server: ' + response)
+            
+    def initialise_zmq(self, host, port):
+        response = self.connections.get(host, port, use_zmq=True).request('hello')
+        if response == 'hello':
+            return True
+        else:
+            raise Exception('invalid response from server: ' + str(response))
+    
+    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
+        self.h5file = h5file
+        h5file = shared_drive.path_to_agnostic(h5file)
+        if not self.use_zmq:
+            self.run_on_cameras('transition_to_buffered', self.transition_to_buffered_sockets, h5file)
+        else:
+            self.run_on_cameras('transition_to_buffered', self.transition_to_buffered_zmq, h5file)
+        return {} # indicates final values of buffered run, we have none
+        
+    def transition_to_buffered_zmq(self, h5file, host, port):
+        connection = self.connections.get(host, port, use_zmq=True)
+        response = connection.request(h5file)
+        if response != 'ok':
+            raise Exception('invalid response from server: ' + str(response))
+        response = connection.request(timeout = 10)
+        if response != 'done':
+            raise Exception('invalid response from server: ' + str(response))
+        
+    def transition_to_buffered_sockets(self, h5file, host, port):
+        connection = self.connections.get(host, port)
+        response = connection.command(h5file)
+        if not 'ok' in response:
+            connection.close()
+            raise Exception(response)
+        response = connection.readline()
+        if not 'done' in response:
+            connection.close()
+            raise Exception(response)
+        return {} # indicates final values of buffered run, we have none
+        
+    def transition_to_manual(self):
+        if not self.use_zmq:
+            self.run_on_cameras('transition_to_manual', self.transition_to_manual_sockets)
+        elif self.transfer_frames:
+            with h5py.File(self.h5file, 'a') as hdf5_file:
+                self.run_on_cameras('transition_to_manual', self.transfer_frames_zmq, hdf5_file)
+        else:
+            self.run_on_cameras('transition_to_manual', self.transition_to_manual_zmq)
+        return True # indicates success
+        
+    def transition_to_manual_zmq(self, host, port):
+        connection = self.connections.get(host, port, use_zmq=True)
+        response = connection.request('done')
+        if response != 'ok':
+            raise Exception('invalid response from server: ' + str(response))
+        response = connection.request(timeout = 10)
+        if response != 'done':
+            raise Exception('invalid response from server: ' + str(response))
+        
+    def transfer_frames_zmq(self, hdf5_file, host, port):
+        connection = self.connections.get(host, port, use_zmq=True)
+        n_frames, n_bytes, transfer_time = CameraConnection.transfer_frames(connection, hdf5_file, self.transfer_batch_bytes,
+                                                                            self.transfer_timeout, self.transfer_compression,
+                                                                            self.transfer_compression_opts, self.h5file_lock)
+        if transfer_time:
+            self.transfer_rates['%s:%s'%(host, port)].append(n_bytes/transfer_time/1e6)
+        self.logger.info('%s:%s sent %d frames (%.1f MB) in %.3f s'%(host, port, n_frames, n_bytes/1e6, transfer_time))
+        
+    def transition_to_manual_sockets(self, host, port):
+        connection = self.connections.get(host, port)
+        response = connection.command('done')
+        if response != 'ok':
+            connection.close()
+            raise Exception(response)
+        response = connection.readline()
+        if not 'done' in response:
+            connection.close()
+            raise Exception(response)
+        return True # indicates success
+        
+    def abort_buffered(self):
+        return self.abort()
+        
+    def abort_transition_to_buffered(self):
+        return self.abort()
+    
+    def abort(self):
+        if not self.use_zmq:
+            self.run_on_cameras('abort', self.abort_sockets)
+        else:
+            self.run_on_cameras('abort', self.abort_zmq)
+        return True # indicates success 
+        
+    def abort_zmq(self, host, port):
+        response = self.connections.get(host, port, use_zmq=True).request('abort')
+        if response != 'done':
+            raise Exception('invalid response from server: ' + str(response))
+        
+    def abort_sockets(self, host, port):
+        connection = self.connections.get(host, port)
+        # The connection may be partway through an exchange we are abandoning:
+        connection.close()
+        response = connection.command('abort')
+        if not 'done' in response:
+            connection.close()
+            raise Exception(response)
+        return True # indicates success 
+    
+    def program_manual(self, values):
+        return {}
+    
+    def shutdown(self):
+        self.connections.close_all()
+        if self.thread_pool is not None:
+            self.thread_pool.close()
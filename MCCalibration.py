@@ -0,0 +1,112 @@
+#####################################################################
+#                                                                   #
+# /MCCalibration.py                                                 #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Conversion between volts and the counts Measurement Computing boards are
+programmed in. UL.cbFromEngUnits and UL.cbToEngUnits convert one value per
+call, so a Calibration asks them about a few values in a board's range, and
+then converts whole arrays with numpy, giving the same results they would.
+The UL module is passed in, so this can be checked against
+labscript_devices.simulated.universallibrary as well as the real thing."""
+
+import numpy as np
+
+# The boards' DACs are 16 bit:
+N_COUNTS = 2**16
+
+# How close, in counts, a value has to be to the step between two counts for
+# UL's own arithmetic to possibly round it differently to ours:
+TOLERANCE = 0.01
+
+
+class Calibration(object):
+    """The conversion between volts and counts for one board and range.
+    Volts are looked up in a table of what cbToEngUnits says for each count.
+    The table is worked out in one go from a linear fit, if that agrees with
+    cbToEngUnits for every count probed, otherwise it is filled in by calling
+    cbToEngUnits as counts are first converted. Counts are linear in volts,
+    rounded to nearest or truncated, whichever cbFromEngUnits is found to do.
+    Values it is not clear how UL would round, and values out of range, are
+    passed to cbFromEngUnits individually."""
+    def __init__(self, UL, BoardNum, Range, n_probes=1024):
+        self.UL = UL
+        self.BoardNum = BoardNum
+        self.Range = Range
+        self.n_ul_calls = 0
+        # What cbToEngUnits says for each count, where known:
+        self.volts = np.empty(N_COUNTS)
+        self.known = np.zeros(N_COUNTS, dtype=bool)
+        self.all_known = False
+        self.offset, last = self.toVolts([0, N_COUNTS - 1])
+        self.lsb = (last - self.offset)/(N_COUNTS - 1)
+
+        # Probe a quarter and three quarters of the way between counts. If
+        # UL rounds to nearest, these give different counts:
+        counts = np.linspace(0, N_COUNTS - 2, n_probes).astype(int)
+        volts = self.toVolts(counts)
+        # If a straight line through the ends gives exactly what UL does for
+        # every count probed, use it for them all:
+        linear_volts = self.offset + np.arange(N_COUNTS)*self.lsb
+        self.linear_volts = bool(np.array_equal(linear_volts[self.known], self.volts[self.known]))
+        if self.linear_volts:
+            self.volts = linear_volts
+            self.known[:] = True
+            self.all_known = True
+        probes = np.concatenate([volts + 0.25*self.lsb, volts + 0.75*self.lsb])
+        answers = np.array([UL.cbFromEngUnits(BoardNum, Range, probe, 0) for probe in probes])
+        self.n_ul_calls += len(probes)
+        rounded = np.mean(answers[n_probes:] == counts + 1) > 0.5
+        self.rounding = 'nearest' if rounded else 'truncate'
+        self._shift = 0.5 if rounded else 0.0
+        # Check we agree with UL on them all, otherwise leave all conversions to UL:
+        self.linear = True
+        self.linear = bool(np.all(self.fromVolts(probes) == answers))
+
+    def fromVolts(self, values):
+        """Returns the counts for an array of values in volts"""
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.empty(values.shape, dtype=np.int64)
+        if self.linear:
+            steps = (values - self.offset)/self.lsb + self._shift
+            finite = np.isfinite(steps)
+            steps[~finite] = 0
+            counts[...] = np.floor(steps)
+            uncertain = ((np.abs(steps - np.round(steps)) < TOLERANCE) | (counts < 0) | (counts > N_COUNTS - 1)
+                         | ~finite)
+        else:
+            uncertain = np.ones(values.shape, dtype=bool)
+        indices = np.nonzero(uncertain)
+        self.n_ul_calls += len(indices[0])
+        counts[indices] = [self.UL.cbFromEngUnits(self.BoardNum, self.Range, value, 0) for value in values[indices]]
+        return counts
+
+    def toVolts(self, counts):
+        """Returns the values in volts for an array of counts. Counts out of
+        range are passed to cbToEngUnits individually."""
+        counts = np.asarray(counts, dtype=int)
+        in_range = (counts >= 0) & (counts < N_COUNTS)
+        if in_range.all():
+            return self.lookup(counts)
+        volts = np.empty(counts.shape)
+        volts[in_range] = self.lookup(counts[in_range])
+        indices = np.nonzero(~in_range)
+        self.n_ul_calls += len(indices[0])
+        volts[indices] = [self.UL.cbToEngUnits(self.BoardNum, self.Range, int(count), 0.0) for count in counts[indices]]
+        return volts
+
+    def lookup(self, counts):
+        """Returns the values in volts for an array of counts in range, from
+        the table, filling in any it doesn't have yet"""
+        if not self.all_known:
+            unknown = np.unique(counts[~self.known[counts]])
+            self.n_ul_calls += len(unknown)
+            self.volts[unknown] = [self.UL.cbToEngUnits(self.BoardNum, self.Range, int(count), 0.0) for count in unknown]
+            self.known[unknown] = True
+        return self.volts[counts]
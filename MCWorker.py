@@ -3,67 +3,175 @@
 Created on Sat Mar 11 16:14:51 2017
 
 @author: Kevin
+
+Real-time sequencer for the USB-3114. MC_Task runs in its own process, polling
+the counter that counts clock ticks and, on each tick, writing that step's
+digital outputs and loading the next step's analog outputs, which the board
+latches on the following tick (SIMULTANEOUS mode). The output tables are
+passed in through shared memory, and statistics on how promptly each tick was
+serviced are sent back through a queue once the sequence is done.
 """
+import ctypes
+import traceback
+from multiprocessing import Process, Queue
+from multiprocessing.sharedctypes import RawArray, RawValue
+from Queue import Empty
+# time.clock on Windows, which unlike time.time has sub-microsecond resolution:
+from timeit import default_timer as timer
+
 import numpy as np
 from UniversalLibrary import UniversalLibrary as UL
 from UniversalLibrary import constants as ULC
-import time
-
-def MC_Task(ao_data, do_data, time_data):
-    
-    BoardNum = 0         # for USB-3114, set in InstaCal, or by config functions
-    LowChan = 0          #
-    HighChan = 15        #
-    NumPoints = 16       # Total number of points to output.
-    Rate = 0             # Rate can't be set for this board.
-    Range = 0            # Has to be set in Instacal (or config function??)
-    zero32 = np.uint32(0)
-    
-    # Set all digital ports to output
-    UL.cbDConfigPort(BoardNum, ULC.AUXPORT, ULC.DIGITALOUT)
-    
-    # Clear the counter 
-    UL.cbCLoad32( BoardNum, RegNum = ULC.LOADREG1, LoadValue = 0)
-    # Dummy value for the counter (is this even necessary?)
-    
-    print("Beginning MC_Task output")
-    
-    # pre-programming data for analog step 0
-    step = 0
-    UL.cbAOutScan(BoardNum, LowChan, HighChan, NumPoints, Rate, Range, ao_data[0], ULC.SIMULTANEOUS)
-    print("Programmed ao_data for step 0")
-    
-    while True:
-        count = UL.cbCIn32(BoardNum, CounterNum = 1, Count = zero32)
-        if count < step:
-            time.sleep(0.01)
-            continue
-        if count == step:
-            UL.cbDOut(BoardNum, PortNum = 1, DataValue = do_data[step])
-            print("Output digital values for step %d" % step)  
-            step = step + 1
-            if step == len(time_data):
-                break
-            else:
-                UL.cbAOutScan(BoardNum, LowChan, HighChan, NumPoints, Rate, Range, ao_data[step], ULC.SIMULTANEOUS)
-                print("Pre-programmed ao_data for step %d" % step)
-                continue                
-        if count > step :
-            print("Steps %d through %d were skipped, output rate too high!" % (step, count-1) )
-        
-    print("I think we're all done here?")       
-            
-            
+
+LowChan = 0          #
+HighChan = 15        #
+NumPoints = 16       # Total number of points to output.
+Rate = 0             # Rate can't be set for this board.
+Range = 0            # Has to be set in Instacal (or config function??)
+
+# Edges of the bins of the histogram of how long after its clock tick each
+# step was output, in seconds:
+LATENCY_BINS = [0, 10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, float('inf')]
+
+
+def make_shared_tables(ao_data, do_data):
+    """Copies the analog table (one row of NumPoints counts per step) and the
+    digital table (one byte per step) into shared memory, returning the
+    shared arrays"""
+    ao_data = np.asarray(ao_data, dtype=np.uint16)
+    do_data = np.asarray(do_data, dtype=np.uint8)
+    ao_shared = RawArray(ctypes.c_uint16, ao_data.size)
+    np.ctypeslib.as_array(ao_shared)[:] = ao_data.ravel()
+    do_shared = RawArray(ctypes.c_uint8, do_data.size)
+    np.ctypeslib.as_array(do_shared)[:] = do_data
+    return ao_shared, do_shared
+
+
+def MC_Task(BoardNum, ao_shared, do_shared, n_steps, results, stop):
+    """Outputs n_steps steps from the shared tables, one per clock tick, until
+    done or stop.value is set. Puts ('ready', None) on the results queue once
+    waiting for the first tick, then ('done', statistics), or ('error',
+    traceback) if anything goes wrong."""
+    try:
+        ao_data = np.ctypeslib.as_array(ao_shared).reshape((n_steps, NumPoints))
+        do_data = np.ctypeslib.as_array(do_shared)
+        zero32 = np.uint32(0)
+
+        # Set all digital ports to output
+        UL.cbDConfigPort(BoardNum, ULC.AUXPORT, ULC.DIGITALOUT)
+        # Clear the counter
+        UL.cbCLoad32(BoardNum, ULC.LOADREG1, 0)
+        # pre-programming data for analog step 0
+        UL.cbAOutScan(BoardNum, LowChan, HighChan, NumPoints, Rate, Range, ao_data[0], ULC.SIMULTANEOUS)
+        results.put(('ready', None))
+
+        # Local names, to save attribute lookups in the loop:
+        cbCIn32, cbDOut, cbAOutScan = UL.cbCIn32, UL.cbDOut, UL.cbAOutScan
+        AUXPORT, SIMULTANEOUS = ULC.AUXPORT, ULC.SIMULTANEOUS
+        # Upper bounds on how long after its tick each step was output:
+        latencies = np.zeros(n_steps)
+        serviced = np.zeros(n_steps, dtype=bool)
+        # (first, last) steps whose ticks were missed:
+        skipped = []
+
+        step = 0
+        start_time = not_seen = timer()
+        while step < n_steps and not stop.value:
+            poll_time = timer()
+            count = cbCIn32(BoardNum, 1, zero32)
+            if count <= step:
+                # The next tick is yet to come:
+                not_seen = poll_time
+                continue
+            count = min(count, n_steps)
+            if count > step + 1:
+                # Ticks came faster than we could keep up with:
+                skipped.append((step, count - 2))
+            step = count
+            cbDOut(BoardNum, AUXPORT, int(do_data[step - 1]))
+            if step < n_steps:
+                cbAOutScan(BoardNum, LowChan, HighChan, NumPoints, Rate, Range, ao_data[step], SIMULTANEOUS)
+            # The tick came after the last poll that didn't see it:
+            latencies[step - 1] = timer() - not_seen
+            serviced[step - 1] = True
+            # and the poll that saw it did not see the one after:
+            not_seen = poll_time
+        duration = timer() - start_time
+
+        latencies = latencies[serviced]
+        statistics = {'steps': n_steps,
+                      'completed': step,
+                      'skipped': skipped,
+                      'n_skipped': sum(last - first + 1 for first, last in skipped),
+                      'duration': duration,
+                      'latency_bins': LATENCY_BINS,
+                      'latency_histogram': np.histogram(latencies, bins=LATENCY_BINS)[0].tolist(),
+                      'mean_latency': latencies.mean() if len(latencies) else None,
+                      'max_latency': latencies.max() if len(latencies) else None}
+        results.put(('done', statistics))
+    except Exception:
+        results.put(('error', traceback.format_exc()))
+
+
+class Sequencer(object):
+    """Runs MC_Task in a subprocess to output the given tables, one step per
+    clock tick"""
+    def __init__(self, BoardNum, ao_data, do_data):
+        self.n_steps = len(do_data)
+        ao_shared, do_shared = make_shared_tables(ao_data, do_data)
+        self.results = Queue()
+        self.stop_flag = RawValue(ctypes.c_byte, 0)
+        self.process = Process(name='MC_Task', target=MC_Task,
+                               args=(BoardNum, ao_shared, do_shared, self.n_steps, self.results, self.stop_flag))
+        self.process.daemon = True
+
+    def _get_message(self, timeout):
+        try:
+            message, result = self.results.get(timeout=timeout)
+        except Empty:
+            return None, None
+        if message == 'error':
+            self.process.join()
+            raise Exception('MC_Task failed:\n' + result)
+        return message, result
+
+    def start(self, timeout=10):
+        """Starts the sequencer, returning once it is waiting for the first clock tick"""
+        self.process.start()
+        message, result = self._get_message(timeout)
+        if message != 'ready':
+            self.stop()
+            raise Exception('MC_Task was not ready within %d seconds'%timeout)
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds for the sequence to finish, stopping it
+        if it hasn't. Returns its statistics."""
+        message, statistics = self._get_message(timeout)
+        if message is None:
+            return self.stop()
+        self.process.join()
+        return statistics
+
+    def stop(self):
+        """Stops the sequence, returning its statistics"""
+        self.stop_flag.value = 1
+        message, statistics = self._get_message(timeout=5)
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        return statistics
+
+
 if __name__ == "__main__":
-    ao_data0 = np.zeros(16, dtype=np.int16)
-    ao_data1 = np.array([60000, 60000, 60000, 60000, 60000, 60000, 60000, 60000, 
-                         60000, 60000, 60000, 60000, 60000, 60000, 60000, 60000], dtype = np.int16)
+    ao_data0 = np.zeros(16, dtype=np.uint16)
+    ao_data1 = np.array([60000, 60000, 60000, 60000, 60000, 60000, 60000, 60000,
+                         60000, 60000, 60000, 60000, 60000, 60000, 60000, 60000], dtype = np.uint16)
     ao_data = [ao_data0, ao_data1, ao_data0, ao_data1, ao_data0, ao_data1, ao_data0, ao_data1, ao_data0 ]
-    
-    do_data0 = '0b01010101'
-    do_data1 = '0b10101010'
+
+    do_data0 = int('01010101', 2)
+    do_data1 = int('10101010', 2)
     do_data = [do_data0, do_data1, do_data0, do_data1, do_data0, do_data1, do_data0, do_data1, do_data0 ]
-    
-    time_data = [1,2,3,4,5,6,7,8,9]
-    
-    MC_Task(ao_data, do_data, time_data)
\ No newline at end of file
+
+    sequencer = Sequencer(0, ao_data, do_data)
+    sequencer.start()
+    print(sequencer.wait(timeout=60))
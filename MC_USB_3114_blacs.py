@@ -0,0 +1,281 @@
+########################################################################
+#                                                                      #
+# /MC_USB_3114_blacs.py                                                #
+#                                                                      #
+# Copyright 2016, Kevin Wright                                         #
+#                                                                      #
+# This file is a device class for Measurement Computing USB-3114 DAQs  #
+# It was constructed based on the NI board device class included in    #
+# in the core modules of Labscript                                     #
+########################################################################
+
+from labscript_devices import BLACS_tab, BLACS_worker
+from labscript_devices.TransitionTiming import timed_transitions
+
+import numpy as np
+import labscript_utils.h5_lock, h5py
+import labscript_utils.properties
+
+from UniversalLibrary import UniversalLibrary as UL
+from UniversalLibrary import constants as ULC
+
+from labscript_devices.MCWorker import Sequencer
+
+from blacs.tab_base_classes import Worker, define_state
+from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
+from blacs.device_base_class import DeviceTab
+
+do_data0 = int('10101010', 2)
+do_data1 = int('01010101', 2)
+dummy_do_data = [do_data0, do_data1] * 5
+ao_data0 = [0] * 16
+ao_data1 = [32768] * 16
+dummy_ao_data = [ao_data0, ao_data1] * 5
+dummy_time_data = [1,2,3,4,5]
+
+
+@BLACS_tab
+class MC_USB_3114Tab(DeviceTab):
+    def initialise_GUI(self):
+        # Capabilities
+        self.num_AO = 16
+        self.num_DO = 8
+        self.base_units = 'V'
+        self.base_min = 0
+        self.base_max = 10.0
+        self.base_step = 0.1
+        self.base_decimals = 3
+        
+        # Create the AO output objects
+        ao_prop = {}
+        for i in range(self.num_AO):
+            ao_prop['ao%d'%i] = {'base_unit':self.base_units,
+                                 'min':self.base_min,
+                                 'max':self.base_max,
+                                 'step':self.base_step,
+                                 'decimals':self.base_decimals
+                                }
+        
+        do_prop = {}
+        for i in range(self.num_DO):
+            do_prop['port0/line%d'%i] = {}
+            
+            
+        # Create the output objects    
+        self.create_analog_outputs(ao_prop)        
+        # Create widgets for analog outputs only
+        dds_widgets, ao_widgets, do_widgets = self.auto_create_widgets()
+        
+        # now create the digital output objects
+        self.create_digital_outputs(do_prop)        
+        # manually create the digital output widgets so they are grouped separately
+        do_widgets = self.create_digital_widgets(do_prop)
+        
+        def do_sort(channel):
+            flag = channel.replace('port0/line','')
+            flag = int(flag)
+            return '%02d'%(flag)
+    
+        def ao_sort(channel):
+            flag = channel.replace('ao','')
+            flag = int(flag)
+            return '%02d'%(flag)
+            
+            
+        # and auto place the widgets in the UI
+        self.auto_place_widgets(("Analog Outputs",ao_widgets,ao_sort),("Digital Outputs",do_widgets,do_sort))
+        
+        # Store the device name and board number
+        connection_object = self.settings['connection_table'].find_by_name(self.device_name)
+        self.name = str(connection_object.BLACS_connection)
+        self.BoardNum = connection_object.properties.get('BoardNum', 0)
+        
+        # Create and set the primary worker
+        self.create_worker("main_worker", MCUSB3114Worker,{'name':self.name, 'limits': [self.base_min,self.base_max], 'num_AO':self.num_AO, 'num_DO': self.num_DO,
+                                                           'BoardNum': self.BoardNum})
+        self.primary_worker = "main_worker"
+
+        # Set the capabilities of this device
+        self.supports_remote_value_check(False)
+        self.supports_smart_programming(False) 
+    
+    
+@BLACS_worker
+@timed_transitions
+class MCUSB3114Worker(Worker):
+    # How long to wait for the sequencer to see its last clock tick once the shot is over, in seconds:
+    sequencer_timeout = 5
+    
+    def init(self):
+        exec 'from UniversalLibrary import UniversalLibrary as UL' in globals()
+        exec 'from UniversalLibrary import constants as ULC' in globals()
+        global h5py; import labscript_utils.h5_lock, h5py
+        global numpy; import numpy
+        global Calibration; from labscript_devices.MCCalibration import Calibration
+        
+        #TODO: fiugre out how to get this value from the device class?
+        self.RANGE = ULC.UNI10VOLTS # = 100
+        # Conversions between volts and counts, keyed by range:
+        self.calibrations = {}
+        
+        # Initialize the output data for all channels to some funky values for testing
+        # TODO: set these values all to zero after initial code debugging is done
+        self.ao_data = dummy_ao_data[0]
+        self.do_data = [(dummy_do_data[0] >> i) & 1 for i in range(self.num_DO)]
+        self.time_data = dummy_time_data # do we need this? 
+        
+        # The subprocess outputting the shot, and how it went last time:
+        self.sequencer = None
+        self.last_sequencer_statistics = None
+        
+        # Configure digital port for output
+        UL.cbDConfigPort(self.BoardNum, ULC.AUXPORT, ULC.DIGITALOUT)
+	
+        # Write initial data values to the outputs
+        self.setup_static_channels()    
+
+    def lines_to_byte(self, values):
+        """The port's output byte for the values of its lines, line0 being the
+        least significant bit, as in the DIGITAL_OUTS of a shot"""
+        return sum(int(bool(value)) << i for i, value in enumerate(values))
+        
+    def setup_static_channels(self):
+        byte = self.lines_to_byte(self.do_data)
+        UL.cbDOut(self.BoardNum, ULC.AUXPORT, byte) # set DO channels to initial default values
+        scaled_ao_data = self.fromVolts(self.ao_data)
+        for i in range(self.num_AO): 
+            UL.cbAOut(self.BoardNum, i, 0, int(scaled_ao_data[i]) ) # set AO channels to their initial defaults
+    
+    def shutdown(self):
+        if self.sequencer is not None:
+            self.sequencer.stop()
+
+    def program_manual(self,front_panel_values):
+        self.ao_data = [ front_panel_values['ao%d'%i] for i in range(self.num_AO)]
+        self.do_data = [ front_panel_values['port0/line%d'%i] for i in range(self.num_DO)]
+        self.setup_static_channels()
+        
+    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
+        # Store the initial values in case we have to abort and restore them:
+        # TODO: Coerce/quantise these correctly before returning them
+        self.initial_values = initial_values
+        ao_channels = []
+        ao_data = None
+        do_bitfield = None
+            
+        with self.timing.span('h5_read'):
+            with h5py.File(h5file,'r') as hdf5_file:
+                group = hdf5_file['devices/'][device_name]
+                device_properties = labscript_utils.properties.get(hdf5_file, device_name, 'device_properties')
+                h5_data = group.get('ANALOG_OUTS')
+                if h5_data:
+                    self.buffered_using_analog = True
+                    ao_channels = [int(channel.split('/')[-1].replace('ao','')) 
+                                   for channel in device_properties['analog_out_channels'].split(', ')]
+                    ao_data = numpy.array(h5_data,dtype=np.float64)
+                else:
+                    self.buffered_using_analog = False   
+                
+                h5_data = group.get('DIGITAL_OUTS')
+                if h5_data:
+                    self.buffered_using_digital = True
+                    do_bitfield = numpy.array(h5_data,dtype=numpy.uint8)
+                else:
+                    self.buffered_using_digital = False            
+                
+        # The values to leave the outputs at after the shot, starting with those of the front panel:
+        self.final_values = dict(initial_values)
+            
+        if not (self.buffered_using_analog or self.buffered_using_digital):
+            return self.final_values
+        n_steps = len(ao_data) if ao_data is not None else len(do_bitfield)
+            
+        # Channels not used in the shot stay at their front panel values:
+        ao_table = numpy.empty((n_steps, self.num_AO), dtype=numpy.uint16)
+        ao_table[:] = self.fromVolts([initial_values['ao%d'%i] for i in range(self.num_AO)])
+        ao_table[:,ao_channels] = self.fromVolts(ao_data)
+        for i, channel in enumerate(ao_channels):
+            self.final_values['ao%d'%channel] = float(ao_data[-1,i])
+        do_table = numpy.empty(n_steps, dtype=numpy.uint8)
+        if do_bitfield is not None:
+            do_table[:] = do_bitfield
+            for i in range(self.num_DO):
+                self.final_values['port0/line%d'%i] = int((do_bitfield[-1] >> i) & 1)
+        else:
+            do_table[:] = self.lines_to_byte([initial_values['port0/line%d'%i] for i in range(self.num_DO)])
+            
+        with self.timing.span('upload'):
+            self.sequencer = Sequencer(self.BoardNum, ao_table, do_table)
+            self.sequencer.start()
+        
+        return self.final_values
+        
+    def sequencer_statistics(self):
+        """How promptly the sequencer output each step of the last shot: the
+        number of steps skipped, and a histogram of how long after its clock
+        tick each step was output"""
+        return self.last_sequencer_statistics
+        
+    def finish_sequence(self, abort):
+        """Waits for the sequencer to finish the shot, or stops it if aborting,
+        and logs how it went"""
+        if abort:
+            statistics = self.sequencer.stop()
+        else:
+            statistics = self.sequencer.wait(self.sequencer_timeout)
+        self.sequencer = None
+        self.last_sequencer_statistics = statistics
+        if statistics is None:
+            self.logger.warning('Sequencer did not report how the shot went')
+            return
+        self.logger.info('Sequencer output %d of %d steps in %.3f s, max latency %s us'%(
+                         statistics['completed'], statistics['steps'], statistics['duration'],
+                         '%.0f'%(1e6*statistics['max_latency']) if statistics['max_latency'] is not None else '-'))
+        self.logger.debug('Latency histogram (bin edges in us: count): ' + 
+                          ', '.join('%g-%g: %d'%(1e6*start, 1e6*stop, count) for start, stop, count in 
+                                    zip(statistics['latency_bins'][:-1], statistics['latency_bins'][1:], statistics['latency_histogram'])))
+        if statistics['n_skipped']:
+            self.logger.warning('Sequencer skipped %d steps, output rate too high! Skipped steps: %s'%(
+                                statistics['n_skipped'], ', '.join('%d-%d'%skip for skip in statistics['skipped'])))
+        if not abort and statistics['completed'] < statistics['steps']:
+            self.logger.warning('Sequencer only saw %d of %d clock ticks'%(statistics['completed'], statistics['steps']))
+                
+    def calibration(self, Range):
+        """The conversion between volts and counts for a range, worked out the first time it's needed"""
+        if Range not in self.calibrations:
+            calibration = Calibration(UL, self.BoardNum, Range)
+            self.logger.debug('Range %d: counts %s from volts%s'%(Range, 'truncated' if calibration.rounding == 'truncate' else 'rounded',
+                              '' if calibration.linear else ', not linearly, converting with UL'))
+            self.logger.debug('Range %d: volts from counts %s'%(Range, 'linearly' if calibration.linear_volts else 'as UL gives them'))
+            self.calibrations[Range] = calibration
+        return self.calibrations[Range]
+        
+    def fromVolts(self, values):
+        """Counts for an array of values in volts, as UL.cbFromEngUnits would give"""
+        return self.calibration(self.RANGE).fromVolts(values)
+
+    def toVolts(self, values):
+        """Values in volts for an array of counts, as UL.cbToEngUnits would give"""
+        return self.calibration(self.RANGE).toVolts(values)
+		
+    def outrange(self, volt_value):
+        return int(self.fromVolts(volt_value))
+            
+    def transition_to_manual(self,abort=False):
+        if self.sequencer is not None:
+            self.finish_sequence(abort)
+        if abort:
+            # Reprogram the initial states:
+            self.program_manual(self.initial_values)           
+        else:
+            # Stay at the final values of the shot:
+            self.program_manual(self.final_values)
+        return True
+        
+    def abort_transition_to_buffered(self):
+        # TODO: untested
+        return self.transition_to_manual(True)
+        
+    def abort_buffered(self):
+        # TODO: untested
+        return self.transition_to_manual(True)    
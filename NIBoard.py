@@ -1,5 +1,6 @@
 import numpy as np
 from labscript_devices import runviewer_parser
+from labscript_devices.Profiling import profile
 from labscript import IntermediateDevice, AnalogOut, DigitalOut, AnalogIn, bitfield, config, LabscriptError, set_passed_properties
 import labscript_utils.h5_lock, h5py
 import labscript_utils.properties
@@ -40,6 +41,7 @@ class NIBoard(IntermediateDevice):
         bits = bitfield(outputarray,dtype=self.digital_dtype)
         return bits
             
+    @profile
     def generate_code(self, hdf5_file):
         IntermediateDevice.generate_code(self, hdf5_file)
         analogs = {}
@@ -122,6 +124,7 @@ class RunviewerClass(object):
         for i in range(self.num_digitals):
             self.port_strings[i] = 'port0/line%d'%i
             
+    @profile
     def get_traces(self, add_trace, clock=None):
         if clock is None:
             # we're the master pseudoclock, software triggered. So we don't have to worry about trigger delays, etc
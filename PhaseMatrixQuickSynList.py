@@ -0,0 +1,92 @@
+#####################################################################
+#                                                                   #
+# /PhaseMatrixQuickSynList.py                                       #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+import numpy as np
+from labscript_devices import labscript_device, runviewer_parser
+from labscript_devices.PhaseMatrixQuickSyn import PhaseMatrixQuickSyn, RunviewerClass as QuickSynRunviewerClass
+from labscript_devices.Profiling import profile
+
+from labscript import (IntermediateDevice, Device, AnalogQuantity, StaticDigitalOut, config, LabscriptError,
+                       set_passed_properties)
+
+
+class QuickSynListDDS(Device):
+    """A DDS whose frequency is stepped through a list, one point per tick of
+    the PhaseMatrixQuickSynList's clockline. Supports only frequency control,
+    and the output can be enabled or disabled only at the start of the shot."""
+    description = 'PhaseMatrix QuickSyn list mode DDS'
+    allowed_children = [AnalogQuantity,StaticDigitalOut]
+    generation = 2
+    
+    @set_passed_properties()    
+    def __init__(self, name, parent_device, connection, freq_limits = None, freq_conv_class = None,freq_conv_params = {}):
+        Device.__init__(self,name,parent_device,connection)
+        self.frequency = AnalogQuantity(self.name+'_freq',self,'freq',freq_limits,freq_conv_class,freq_conv_params)
+        self.frequency.default_value = 0.5e9
+        self.gate = StaticDigitalOut(self.name+'_gate',self,'gate')
+        
+    def setfreq(self,t,value,units=None):
+        self.frequency.constant(t,value,units)
+            
+    def setamp(self,t,value,units=None):
+        raise LabscriptError('QuickSyn does not support amplitude control')
+        
+    def setphase(self,t,value,units=None):
+        raise LabscriptError('QuickSyn does not support phase control')
+            
+    def enable(self):       
+        """output can be enabled or disabled only at the start of the shot"""
+        self.gate.go_high()
+                            
+    def disable(self):
+        """output can be enabled or disabled only at the start of the shot"""
+        self.gate.go_low()
+        
+        
+@labscript_device              
+class PhaseMatrixQuickSynList(IntermediateDevice, PhaseMatrixQuickSyn):
+    """A QuickSyn connected to a clockline, stepping through a list of
+    frequencies on each clock tick. Its output is a QuickSynListDDS."""
+    description = 'QuickSyn Frequency Synthesiser, list mode'
+    allowed_children = [QuickSynListDDS]
+    generation = 0
+    # The QuickSyn takes ~100us to switch frequency, so give it a little longer than that:
+    clock_limit = 5e3
+    # Points in the device's list memory:
+    max_list_points = 4096
+
+    @set_passed_properties()
+    def __init__(self, name, parent_device, com_port):
+        IntermediateDevice.__init__(self, name, parent_device)
+        self.BLACS_connection = com_port
+    
+    @profile
+    def generate_code(self, hdf5_file):
+        # The pseudoclock has already finalised the outputs' timeseries:
+        dds = self.get_output()
+        dds.frequency.raw_output, dds.frequency.scale_factor = self.quantise_freq(dds.frequency.raw_output, dds)
+        # The device repeats the first point, see QuickSynWorker.program_list:
+        if len(dds.frequency.raw_output) > self.max_list_points - 1:
+            raise LabscriptError('%s can only step through %d frequencies. '%(self.name, self.max_list_points - 1) +
+                                 'Please decrease the sample rates of devices on the same clock, ' + 
+                                 'or connect %s to a different pseudoclock.'%self.name)
+        table = np.zeros(len(dds.frequency.raw_output), dtype=[('freq0', np.uint64)])
+        table['freq0'] = dds.frequency.raw_output
+        grp = self.write_static_data(hdf5_file, dds)
+        grp.create_dataset('TABLE_DATA',compression=config.compression,data=table) 
+
+
+@runviewer_parser
+class RunviewerClass(QuickSynRunviewerClass):
+    """Shows the frequency at each clock tick"""
+    pass
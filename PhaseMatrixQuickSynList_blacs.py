@@ -0,0 +1,20 @@
+#####################################################################
+#                                                                   #
+# /PhaseMatrixQuickSynList_blacs.py                                 #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+from labscript_devices import BLACS_tab
+from labscript_devices.PhaseMatrixQuickSyn_blacs import PhaseMatrixQuickSynTab
+
+@BLACS_tab
+class PhaseMatrixQuickSynListTab(PhaseMatrixQuickSynTab):
+    # The QuickSynWorker programs a frequency list whenever the shot has one
+    pass
@@ -0,0 +1,367 @@
+#####################################################################
+#                                                                   #
+# /PhaseMatrixQuickSyn_blacs.py                                     #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+from labscript_devices import BLACS_tab, BLACS_worker
+from labscript_devices.TransitionTiming import timed_transitions
+import numpy as np
+
+from blacs.tab_base_classes import Worker, define_state
+from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
+from blacs.device_base_class import DeviceTab
+from qtutils import UiLoader
+import os
+
+@BLACS_tab
+class PhaseMatrixQuickSynTab(DeviceTab):
+    # How often to check the status, in ms, while the output is settling
+    # after a frequency change, and once it is stable:
+    fast_status_interval = 250
+    slow_status_interval = 5000
+    
+    def initialise_GUI(self):
+        # Create DDS Output objects
+        dds_prop = {'dds 0':{'freq':{'base_unit':   'Hz',
+                                     'min':         0.5e9,
+                                     'max':         10e9,
+                                     'step':        1e6,
+                                     'decimals':    3},
+                             'gate':{}
+                                 }
+                                 }
+
+       
+        # Create the output objects    
+        self.create_dds_outputs(dds_prop)        
+        # Create widgets for output objects
+        dds_widgets,ao_widgets,do_widgets = self.auto_create_widgets()
+        # and auto place the widgets in the UI
+        self.auto_place_widgets(("DDS Outputs",dds_widgets))
+        
+        self.status_ui = UiLoader().load(os.path.join(os.path.dirname(os.path.realpath(__file__)),'phasematrixquicksyn.ui'))
+        self.get_tab_layout().addWidget(self.status_ui)
+        self.status_ui.ref_button.clicked.connect(self.update_reference_out)
+        self.status_ui.blanking_button.clicked.connect(self.update_blanking)
+        self.status_ui.lock_recovery_button.clicked.connect(self.update_lock_recovery)
+        
+        
+        # Store the COM port to be used
+        self.address = str(self.settings['connection_table'].find_by_name(self.settings["device_name"]).BLACS_connection)
+        
+        # Create and set the primary worker
+        self.create_worker("main_worker",QuickSynWorker,{'address':self.address})
+        self.primary_worker = "main_worker"
+
+        # Set the capabilities of this device
+        self.supports_remote_value_check(True)
+        self.supports_smart_programming(True) 
+        self.status_interval = self.slow_status_interval
+        self.statemachine_timeout_add(self.status_interval, self.status_monitor)
+        
+        
+        
+
+    
+    # This function gets the status of the phasematrix,
+    # and updates the front panel widgets!
+    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
+    def status_monitor(self):
+        # When called with a queue, this function writes to the queue
+        # when the pulseblaster is waiting. This indicates the end of
+        # an experimental run.
+        self.status = yield(self.queue_work(self._primary_worker,'check_status'))
+        #TODO: update some widgets to reflect the current state
+        self.status_ui.temperature_label.setText(str(self.status['temperature']))
+        
+        if self.status['freqlock']:
+            self.status_ui.freq_lock_label.setText('locked')
+        else:
+            self.status_ui.freq_lock_label.setText('unlocked')
+            
+        if self.status['reflock'] and self.status['ref']:
+            self.status_ui.ref_lock_label.setText('locked')
+        elif self.status['ref']:
+            self.status_ui.ref_lock_label.setText('unlocked')
+        else:
+            self.status_ui.ref_lock_label.setText('disconnected')
+            
+        # Check often while the output is settling in manual mode, and rarely
+        # once it's stable, or during a shot, so as to leave the serial line free:
+        if self.status['settling'] and self.mode == MODE_MANUAL:
+            status_interval = self.fast_status_interval
+        else:
+            status_interval = self.slow_status_interval
+        if status_interval != self.status_interval:
+            self.status_interval = status_interval
+            self.statemachine_timeout_remove(self.status_monitor)
+            self.statemachine_timeout_add(self.status_interval, self.status_monitor)
+            
+        self.status_ui.ref_button.setChecked(self.status['ref_output'])
+        self.status_ui.blanking_button.setChecked(self.status['blanking'])
+        self.status_ui.lock_recovery_button.setChecked(self.status['lock_recovery'])
+        
+        
+    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True,True)
+    def update_reference_out(self):
+        value = self.status_ui.ref_button.isChecked()
+        yield(self.queue_work(self._primary_worker,'update_reference_out',value))
+        
+    
+    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True,True)
+    def update_blanking(self):
+        value = self.status_ui.blanking_button.isChecked()
+        yield(self.queue_work(self._primary_worker,'update_blanking',value))
+        
+    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True,True)
+    def update_lock_recovery(self):
+        value = self.status_ui.lock_recovery_button.isChecked()
+        print value
+        yield(self.queue_work(self._primary_worker,'update_lock_recovery',value))
+       
+
+@BLACS_worker
+@timed_transitions
+class QuickSynWorker(Worker):
+    # How long after a frequency change the output counts as settling even if
+    # it reports being locked, in seconds:
+    settling_time = 1.0
+    # How long a temperature reading is reused for once the output is stable, in seconds:
+    temperature_interval = 60.0
+    # How many frequencies to send per line when uploading a frequency list:
+    list_chunk_size = 100
+    
+    def init(self):
+        global serial; import serial
+        global h5py; import labscript_utils.h5_lock, h5py
+        global time; import time
+        global QuickSynConnection; from labscript_devices.QuickSynSerial import QuickSynConnection
+    
+        baud_rate=115200
+        port = self.address
+        self.connection = serial.Serial(port, baudrate = baud_rate, timeout=0.1)
+        self.connection.readlines()
+        
+        # The (frequency in mHz, gate) last programmed, so unchanged static data needn't be sent again:
+        self.smart_cache = {'STATIC_DATA': None, 'TABLE_DATA': None}
+        self.last_frequency_change = time.time()
+        self.temperature = None
+        self.temperature_time = 0
+        
+        # Commands are paced by the device's answers, rather than by sleeping
+        # in case it isn't ready. Find out how quickly it can be asked things:
+        self.quicksyn = QuickSynConnection(self.connection, logger=self.logger)
+        min_gap = self.quicksyn.calibrate_min_gap()
+        self.logger.info('QuickSyn needs %.1f ms between commands'%(1e3*min_gap))
+        
+        #check to see if the reference is set to external. If not, make it so! (should we ask the user about this?)
+        response = self.quicksyn.query('ROSC:SOUR?')
+        if response == 'INT\n':
+            #ref was set to internal, let's change it to ext
+            self.quicksyn.write('ROSC:SOUR EXT')
+            
+        # In case a previous run was left in list mode:
+        self.list_mode = self.quicksyn.query('FREQ:MODE?').strip() == 'LIST'
+        if self.list_mode:
+            self.quicksyn.write('FREQ:MODE CW')
+            self.list_mode = False
+    
+    def check_remote_values(self):
+        # Get the currently output values:
+
+        results = {'dds 0':{}}
+
+        line = self.quicksyn.query('FREQ?')
+        # Convert mHz to Hz:
+        results['dds 0']['freq'] = float(line)/1000
+
+        line = self.quicksyn.query('OUTP:STAT?')
+
+        #get the gate status
+        results['dds 0']['gate'] = 0 if line == 'OFF\n' else 1
+
+
+        return results
+    
+    def check_status(self):
+        results = {}
+        line = self.quicksyn.query('STAT?')
+        
+        #get the status and convert to binary, and take off the '0b' header:
+        status = bin(int(line,16))[2:]
+        # if the status is less than 8 bits long, pad the start with zeros!
+        while len(status)<8:
+            status = '0'+status
+        # byte 0 is the 1 for an external ref, 0 for no external ref
+        results['ref'] = int(status[-1])
+        # byte 1 is high for rf unlocked, low for rf locked. This is silly, let's reverse it!
+        results['freqlock'] = int(not int(status[-2]))
+        # byte 2 is the high for ref unlocked, low for ref locked. Again, let's swap this!
+        results['reflock'] = int(not int(status[-3]))
+        # byte 3 tells us if the output is on or off,  we don't care since the check values function deals with this
+        
+        
+        # byte 4 will go high if there is a voltage error.
+        #In this case, we probably just want to raise an exception to get the user's attention
+        if int(status[-5]):
+            self.logger.critical('Device is reporting voltage error')
+            raise Exception('Voltage error')
+        # byte 5 tells us if the internal reference is being output
+        results['ref_output'] = int(status[-6])
+        # byte 6 tells us if blanking is on (i.e. turning off output while it changes frequency)
+        results['blanking'] = int(status[-7])
+        # byte 7 tells us if lock recovery is on,
+        
+        results['lock_recovery'] = int(status[-8])
+        
+        # The output is settling until it has been locked for a while since the
+        # frequency last changed. The reference lock only counts if there is an
+        # external reference, without one it never reports being locked:
+        now = time.time()
+        results['settling'] = (not results['freqlock'] or (results['ref'] and not results['reflock'])
+                               or now - self.last_frequency_change < self.settling_time)
+        
+        # now let's check it's temperature! It changes slowly, so only ask
+        # every so often:
+        if self.temperature is None or now - self.temperature_time > self.temperature_interval:
+            self.temperature = float(self.quicksyn.query('DIAG:MEAS? 21'))
+            self.temperature_time = now
+        results['temperature'] = self.temperature
+        
+        # check if the temperature is bad, if it is, raise an exception. Hopefully one day this will be sent to syslog,
+        #at which point we'll add some extra magic to segregate into warning and critical temperatures.
+        
+        if results['temperature'] > 50.0:
+            raise Exception('WARNING: Temperature is too high! Temperature is %s'%results['temperature'])
+            return results
+        
+        return results
+    
+    def program_manual(self,front_panel_values):
+        freq = front_panel_values['dds 0']['freq']
+        #program in millihertz:
+        freq*=1e3
+        gate = front_panel_values['dds 0']['gate']
+        # Set both in one exchange:
+        self.program_static(int(freq), int(gate))
+        
+        return self.check_remote_values()
+        
+    def program_static(self, freq, gate):
+        """Sets the frequency in mHz and the output state, and remembers them
+        for smart programming"""
+        self.quicksyn.write('FREQ %i'%freq, 'OUTP:STAT %i'%gate)
+        if self.smart_cache['STATIC_DATA'] is None or freq != self.smart_cache['STATIC_DATA'][0]:
+            self.last_frequency_change = time.time()
+        self.smart_cache['STATIC_DATA'] = (freq, gate)
+        
+    def program_list(self, frequencies, fresh):
+        """Uploads a list of frequencies in mHz to step through, unless it is
+        the list already uploaded"""
+        # The device outputs the first point as soon as it enters list mode,
+        # and steps on every trigger, including the one at the start of the
+        # shot. So the first point is repeated:
+        frequencies = np.concatenate([frequencies[:1], frequencies])
+        if not fresh and self.smart_cache['TABLE_DATA'] is not None and np.array_equal(frequencies, self.smart_cache['TABLE_DATA']):
+            self.logger.debug('Frequency list unchanged, not uploading.')
+            return
+        # In case the upload fails partway through:
+        self.smart_cache['TABLE_DATA'] = None
+        with self.timing.span('upload'):
+            for i in range(0, len(frequencies), self.list_chunk_size):
+                command = 'LIST:FREQ' if i == 0 else 'LIST:FREQ:APP'
+                self.quicksyn.write(command + ' ' + ','.join('%i'%freq for freq in frequencies[i:i+self.list_chunk_size]))
+        with self.timing.span('verify'):
+            n_points = int(self.quicksyn.query('LIST:FREQ:POIN?'))
+        if n_points != len(frequencies):
+            raise Exception('QuickSyn frequency list has %d points, expected %d'%(n_points, len(frequencies)))
+        self.logger.debug('Uploaded %d point frequency list.'%n_points)
+        self.smart_cache['TABLE_DATA'] = frequencies
+        
+    def command_statistics(self):
+        """min/mean/max latency of each kind of command recently sent, and
+        the gap left between commands"""
+        return {'min_gap': self.quicksyn.min_gap, 'latencies': self.quicksyn.latency_statistics()}
+        
+        
+    def update_reference_out(self,value):
+        pass
+        
+    def update_blanking(self,value):
+        pass
+        
+    def update_lock_recovery(self,value):
+        pass
+    
+    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
+        # Store the initial values in case we have to abort and restore them:
+        self.initial_values = initial_values
+        # Store the final values to for use during transition_to_static:
+        self.final_values = {}
+        table_data = None
+        with self.timing.span('h5_read'):
+            with h5py.File(h5file) as hdf5_file:
+                group = hdf5_file['/devices/'+device_name]
+                # If there are values to set the unbuffered outputs to, set them now:
+                if 'STATIC_DATA' in group:
+                    data = group['STATIC_DATA'][:][0]
+                # And a list of frequencies to step through, if any:
+                if 'TABLE_DATA' in group:
+                    table_data = group['TABLE_DATA'][:]
+                
+        static_data = (int(data['freq0']), 1)#int(data['gate0']))
+        if fresh or static_data != self.smart_cache['STATIC_DATA']:
+            self.logger.debug('Static data has changed, reprogramming.')
+            with self.timing.span('upload'):
+                self.program_static(*static_data)
+        
+        
+        # Save these values into final_values so the GUI can
+        # be updated at the end of the run to reflect them:
+        final_values = {'dds 0':{}}
+        
+        final_values['dds 0']['freq'] = data['freq0']/1e3
+        final_values['dds 0']['gate'] = 1#data['gate0']
+        
+        if table_data is not None:
+            self.program_list(table_data['freq0'], fresh)
+            # Step through the list on each clock tick:
+            self.quicksyn.write('LIST:TRIG:SOUR EXT', 'FREQ:MODE LIST')
+            self.list_mode = True
+            final_values['dds 0']['freq'] = table_data['freq0'][-1]/1e3
+            
+        self.final_values = final_values
+        return final_values
+        
+    def abort_transition_to_buffered(self):
+        return self.transition_to_manual(True)
+        
+    def abort_buffered(self):
+        return self.transition_to_manual(True)
+    
+
+    
+    def transition_to_manual(self,abort = False):
+        if self.list_mode:
+            self.quicksyn.write('FREQ:MODE CW')
+            self.list_mode = False
+            if not abort:
+                # Keep outputting the last frequency in the list:
+                self.program_static(int(round(1e3*self.final_values['dds 0']['freq'])), 1)
+        if abort:
+            # If we're aborting the run, reset to original value
+            self.program_manual(self.initial_values)
+        # If we're not aborting the run, stick with buffered value. Nothing to do really!
+        # return the current values in the device
+        return True
+        
+    def shutdown(self):
+        self.connection.close()
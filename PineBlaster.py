@@ -12,11 +12,11 @@
 #####################################################################
 
 from labscript import PseudoclockDevice, Pseudoclock, ClockLine, config, LabscriptError, set_passed_properties
-from labscript_devices import runviewer_parser, BLACS_tab, BLACS_worker, labscript_device
+from labscript_devices import runviewer_parser, labscript_device, alias_companion_classes
+from labscript_devices.Profiling import profile
 
 import numpy as np
 import labscript_utils.h5_lock, h5py
-import labscript_utils.properties
 
 
 
@@ -46,9 +46,11 @@ class PineBlaster(PseudoclockDevice):
     max_instructions = 15000
     
     @set_passed_properties(property_names = {
-        "connection_table_properties": ["usbport"]}
+        "connection_table_properties": ["usbport", "max_boot_time"]}
         )    
-    def __init__(self, name, trigger_device=None, trigger_connection=None, usbport='COM1'):
+    def __init__(self, name, trigger_device=None, trigger_connection=None, usbport='COM1', max_boot_time=10):
+        # max_boot_time: how long, in seconds, BLACS waits for the device to
+        # answer after resetting it before giving up on it.
         PseudoclockDevice.__init__(self, name, trigger_device, trigger_connection)
         self.BLACS_connection = usbport
         
@@ -77,6 +79,7 @@ class PineBlaster(PseudoclockDevice):
         else:
             raise LabscriptError('You have connected %s (class %s) to %s, but %s does not support children with that class.'%(device.name, device.__class__, self.name, self.name))
     
+    @profile
     def generate_code(self, hdf5_file):
         PseudoclockDevice.generate_code(self, hdf5_file)
         group = hdf5_file['devices'].create_group(self.name)   
@@ -128,7 +131,15 @@ class RunviewerClass(object):
         self.device = device
         
             
-    def get_traces(self, add_trace, clock=None):
+    # The maximum number of clock edges iter_clock_edges() yields at a time:
+    chunk_size = 2**20
+    
+    def iter_clock_edges(self, clock=None, chunk_size=None):
+        """Yields the (times, states) of the PineBlaster's clock output in
+        chunks of at most chunk_size edges, so that a very long clock never
+        needs to be held in memory all at once"""
+        if chunk_size is None:
+            chunk_size = self.chunk_size
         if clock is not None:
             times, clock_value = clock[0], clock[1]
             clock_indices = np.where((clock_value[1:]-clock_value[:-1])==1)[0]+1
@@ -137,38 +148,67 @@ class RunviewerClass(object):
             if clock_value[0] == 1:
                 clock_indices = np.insert(clock_indices, 0, 0)
             clock_ticks = times[clock_indices]
-
-        
             
         # get the pulse program
         with h5py.File(self.path, 'r') as f:
             pulse_program = f['devices/%s/PULSE_PROGRAM'%self.name][:]
             
-        time = []
-        states = []
         trigger_index = 0
         t = 0 if clock is None else clock_ticks[trigger_index]+self.trigger_delay
         trigger_index += 1
         
-        clock_factor = self.clock_resolution/2.
-        
-        for row in pulse_program:
-            if row['period'] == 0:
+        # (period, reps) of the instructions making up the next chunk:
+        periods = []
+        reps = []
+        n_edges = 0
+        for period, instruction_reps in zip(pulse_program['period'], pulse_program['reps']):
+            if period == 0:
                 #special case
-                if row['reps'] == 1: # WAIT
+                if instruction_reps == 1: # WAIT
+                    if reps:
+                        edge_times, states, t = self._clock_edges(t, periods, reps)
+                        yield edge_times, states
+                        periods, reps, n_edges = [], [], 0
                     if clock is not None:
                         t = clock_ticks[trigger_index]+self.trigger_delay
                         trigger_index += 1
                     else:
                         t += self.wait_delay
-            else:    
-                for i in range(row['reps']):
-                    for j in range(1, -1, -1):
-                        time.append(t)
-                        states.append(j)
-                        t += row['period']*clock_factor
-        
-        clock = (np.array(time), np.array(states))
+                continue
+            while instruction_reps:
+                # Split the instruction between chunks if it doesn't fit in this one:
+                chunk_reps = min(instruction_reps, max(1, (chunk_size - n_edges)//2))
+                periods.append(period)
+                reps.append(chunk_reps)
+                n_edges += 2*chunk_reps
+                instruction_reps -= chunk_reps
+                if chunk_size - n_edges < 2:
+                    edge_times, states, t = self._clock_edges(t, periods, reps)
+                    yield edge_times, states
+                    periods, reps, n_edges = [], [], 0
+        if reps:
+            edge_times, states, t = self._clock_edges(t, periods, reps)
+            yield edge_times, states
+            
+    def _clock_edges(self, t, periods, reps):
+        """Returns the times and states of the rising and falling edges of
+        the given instructions starting at time t, and the time at which
+        they end"""
+        reps = np.array(reps)
+        clock_factor = self.clock_resolution/2.
+        half_periods = np.repeat(np.array(periods)*clock_factor, 2*reps)
+        # Accumulating from t in sequence gives the same times as stepping through each tick:
+        edge_times = np.cumsum(np.concatenate([[t], half_periods]))
+        states = np.tile([1, 0], reps.sum())
+        return edge_times[:-1], states, edge_times[-1]
+            
+    @profile
+    def get_traces(self, add_trace, clock=None):
+        chunks = list(self.iter_clock_edges(clock))
+        if chunks:
+            clock = (np.concatenate([times for times, _ in chunks]), np.concatenate([states for _, states in chunks]))
+        else:
+            clock = (np.array([]), np.array([]))
         
         clocklines_and_triggers = {}
         for pseudoclock_name, pseudoclock in self.device.child_list.items():
@@ -179,158 +219,6 @@ class RunviewerClass(object):
             
         return clocklines_and_triggers
 
-from blacs.tab_base_classes import Worker, define_state
-from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
-
-from blacs.device_base_class import DeviceTab
-
-@BLACS_tab
-class PineblasterTab(DeviceTab):
-    
-    def initialise_GUI(self):
-        # Create a single digital output     
-        self.create_digital_outputs({'internal':{}})        
-        # Create widgets for output objects
-        _,_,do_widgets = self.auto_create_widgets()
-        # and auto place the widgets in the UI
-        self.auto_place_widgets(("Flags", do_widgets))
-        
-        # Store the board number to be used
-        self.usb_port = str(self.settings['connection_table'].find_by_name(self.device_name).BLACS_connection)
-        # Create and set the primary worker
-        self.create_worker("main_worker", PineblasterWorker, {'usbport':self.usb_port})
-        self.primary_worker = "main_worker"
-        
-        # Set the capabilities of this device
-        self.supports_smart_programming(True) 
-     
-    def get_child_from_connection_table(self, parent_device_name, port):
-        # This is a direct output, let's search for it on the internal Pseudoclock
-        if parent_device_name == self.device_name:
-            device = self.connection_table.find_by_name(self.device_name)
-            pseudoclock = device.child_list[device.child_list.keys()[0]] # there should always be one (and only one) child, the Pseudoclock
-            clockline = None
-            for child_name, child in pseudoclock.child_list.items():
-                # store a reference to the internal clockline
-                if child.parent_port == port:                
-                    return DeviceTab.get_child_from_connection_table(self, pseudoclock.name, port)
-            
-        return '-'
-        
-     
-    @define_state(MODE_BUFFERED,True)  
-    def status_monitor(self, notify_queue):
-        status = yield(self.queue_work(self.primary_worker, 'status_monitor'))        
-        if status:
-            # Experiment is over. Tell the queue manager about it
-            notify_queue.put('done')
-            self.statemachine_timeout_remove(self.status_monitor)
-        
-    @define_state(MODE_BUFFERED,True)  
-    def start_run(self, notify_queue):
-        """Starts the Pineblaster, notifying the queue manager when
-        the run is over"""
-        self.statemachine_timeout_add(100, self.status_monitor, notify_queue)
-        yield(self.queue_work(self.primary_worker, 'start_run'))
-
-
-@BLACS_worker        
-class PineblasterWorker(Worker):
-    def init(self):
-        global h5py; import labscript_utils.h5_lock, h5py
-        global serial; import serial
-        global time; import time
-        self.smart_cache = []
-    
-        self.pineblaster = serial.Serial(self.usbport, 115200, timeout=1)
-        # Device has a finite startup time:
-        time.sleep(5)
-        self.pineblaster.write('hello\r\n')
-        response = self.pineblaster.readline()
-        
-        if response == 'hello\r\n':
-            return
-        elif response:
-            raise Exception('PineBlaster is confused: saying %s instead of hello'%(repr(response)))
-        else:
-            raise Exception('PineBlaster is not saying hello back when greeted politely. How rude. Maybe it needs a reboot.')
-            
-            
-    def shutdown(self):
-        self.pineblaster.close()
-        
-    def program_manual(self, values):    
-        value = values['internal'] # there is only one value
-        self.pineblaster.write('go high\r\n' if value else 'go low\r\n')
-        response = self.pineblaster.readline()
-        assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
-        return {}
-        
-    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
-        if fresh:
-            self.smart_cache = []
-        self.program_manual({'internal':0})
-        
-        with h5py.File(h5file,'r') as hdf5_file:
-            group = hdf5_file['devices/%s'%device_name]
-            pulse_program = group['PULSE_PROGRAM'][:]
-            device_properties = labscript_utils.properties.get(hdf5_file, device_name, 'device_properties')
-            self.is_master_pseudoclock = device_properties['is_master_pseudoclock']
-            
-        for i, instruction in enumerate(pulse_program):
-            if i == len(self.smart_cache):
-                # Pad the smart cache out to be as long as the program:
-                self.smart_cache.append(None)
-                
-            # Only program instructions that differ from what's in the smart cache:
-            if self.smart_cache[i] != instruction:
-                self.pineblaster.write('set %d %d %d\r\n'%(i, instruction['period'], instruction['reps']))
-                response = self.pineblaster.readline()
-                assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
-                self.smart_cache[i] = instruction
-                
-        if not self.is_master_pseudoclock:
-            # Get ready for a hardware trigger:
-            self.pineblaster.write('hwstart\r\n')
-            response = self.pineblaster.readline()
-            assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
-            
-        return {'internal':0} # always finish on 0
-            
-    def start_run(self):
-        # Start in software:
-        self.pineblaster.write('start\r\n')
-        response = self.pineblaster.readline()
-        assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
-    
-    def status_monitor(self):
-        # Wait to see if it's done within the timeout:
-        response = self.pineblaster.readline()
-        if response:
-            assert response == 'done\r\n'
-            return True
-        return False
-        
-    def transition_to_manual(self):
-        # Wait until the pineblaster says it's done:
-        if not self.is_master_pseudoclock:
-            # If we're the master pseudoclock then this already happened
-            # in status_monitor, so we don't need to do it again
-            response = self.pineblaster.readline()
-            assert response == 'done\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
-            # print 'done!'
-        return True
-    
-    def abort_buffered(self):
-        return self.abort()
-    
-    def abort_transition_to_buffered(self):
-        return self.abort()
-    
-    def abort(self):
-        self.pineblaster.write('restart\r\n')
-        time.sleep(5)
-        self.shutdown()
-        self.init()
-        return True
 
+# The BLACS tab and worker have moved to PineBlaster_blacs.py:
+alias_companion_classes(__name__, ['PineblasterTab', 'PineblasterWorker'])
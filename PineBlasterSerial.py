@@ -0,0 +1,87 @@
+#####################################################################
+#                                                                   #
+# /PineBlasterSerial.py                                             #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Serial protocol helpers for the PineBlaster firmware. These have no BLACS
+dependencies, so they can be driven against the simulated PineBlaster in
+labscript_devices.simulated.pineblaster as well as a real device."""
+
+import time
+from collections import deque
+
+# Size in bytes of the firmware's serial receive buffer. We never have more
+# than this many bytes of unacknowledged commands in flight, otherwise the
+# firmware drops characters:
+RX_BUFFER_SIZE = 128
+
+
+def upload_instructions(connection, pulse_program, indices, rx_buffer_size=RX_BUFFER_SIZE):
+    """Programs the instructions of pulse_program at the given indices.
+    Rather than waiting for each 'ok' before sending the next 'set' command,
+    commands are streamed so as to keep up to rx_buffer_size bytes in flight,
+    and every acknowledgement is checked as it arrives. Returns the number of
+    instructions programmed."""
+    periods = pulse_program['period'][indices]
+    reps = pulse_program['reps'][indices]
+    commands = ['set %d %d %d\r\n'%args for args in zip(indices, periods, reps)]
+
+    in_flight = deque()
+    bytes_in_flight = 0
+    next_command = 0
+    while next_command < len(commands) or in_flight:
+        # Send as many commands as will fit in the firmware's receive buffer:
+        chunk = []
+        while next_command < len(commands):
+            command = commands[next_command]
+            if in_flight and bytes_in_flight + len(command) > rx_buffer_size:
+                break
+            chunk.append(command)
+            in_flight.append((indices[next_command], len(command)))
+            bytes_in_flight += len(command)
+            next_command += 1
+        if chunk:
+            connection.write(''.join(chunk))
+        # Then collect the oldest acknowledgement to make room for more:
+        index, n_bytes = in_flight.popleft()
+        bytes_in_flight -= n_bytes
+        response = connection.readline()
+        if response != 'ok\r\n':
+            raise Exception('PineBlaster said %s when programming instruction %d, expected \'ok\''%(repr(response), index))
+    return len(commands)
+
+
+def wait_for_boot(connection, max_boot_time=10, probe_timeout=0.05, max_probe_timeout=1.0):
+    """Greets the PineBlaster with 'hello' until it says hello back, waiting
+    for each reply with an exponentially increasing timeout, starting at
+    probe_timeout and capped at max_probe_timeout. Gives up after
+    max_boot_time seconds. Returns how long the device took to respond."""
+    start_time = time.time()
+    original_timeout = connection.timeout
+    try:
+        while True:
+            connection.timeout = probe_timeout
+            connection.write('hello\r\n')
+            response = connection.readline()
+            if response == 'hello\r\n':
+                break
+            if time.time() - start_time > max_boot_time:
+                if response:
+                    raise Exception('PineBlaster is confused: saying %s instead of hello'%(repr(response)))
+                raise Exception('PineBlaster is not saying hello back when greeted politely. How rude. Maybe it needs a reboot.')
+            probe_timeout = min(2*probe_timeout, max_probe_timeout)
+        boot_time = time.time() - start_time
+        # Discard replies to any earlier probes that were heard but that we
+        # stopped waiting for, so they are not mistaken for later responses:
+        connection.timeout = 0.05
+        while connection.readline():
+            pass
+    finally:
+        connection.timeout = original_timeout
+    return boot_time
@@ -0,0 +1,190 @@
+#####################################################################
+#                                                                   #
+# /PineBlaster_blacs.py                                             #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+from labscript_devices import BLACS_tab, BLACS_worker
+from labscript_devices.TransitionTiming import timed_transitions
+import labscript_utils.h5_lock, h5py
+import labscript_utils.properties
+
+from blacs.tab_base_classes import Worker, define_state
+from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
+
+from blacs.device_base_class import DeviceTab
+
+from labscript_devices.PineBlasterSerial import upload_instructions, wait_for_boot
+from labscript_devices.SmartCache import changed_instructions, updated_smart_cache
+
+@BLACS_tab
+class PineblasterTab(DeviceTab):
+    
+    def initialise_GUI(self):
+        # Create a single digital output     
+        self.create_digital_outputs({'internal':{}})        
+        # Create widgets for output objects
+        _,_,do_widgets = self.auto_create_widgets()
+        # and auto place the widgets in the UI
+        self.auto_place_widgets(("Flags", do_widgets))
+        
+        # Store the board number to be used
+        connection_object = self.settings['connection_table'].find_by_name(self.device_name)
+        self.usb_port = str(connection_object.BLACS_connection)
+        # And how long to wait for it to boot (default value for backward compat with old connection tables):
+        self.max_boot_time = connection_object.properties.get('max_boot_time', 10)
+        # Create and set the primary worker
+        self.create_worker("main_worker", PineblasterWorker, {'usbport':self.usb_port, 'max_boot_time':self.max_boot_time})
+        self.primary_worker = "main_worker"
+        
+        # Set the capabilities of this device
+        self.supports_smart_programming(True) 
+     
+    def get_child_from_connection_table(self, parent_device_name, port):
+        # This is a direct output, let's search for it on the internal Pseudoclock
+        if parent_device_name == self.device_name:
+            device = self.connection_table.find_by_name(self.device_name)
+            pseudoclock = device.child_list[device.child_list.keys()[0]] # there should always be one (and only one) child, the Pseudoclock
+            clockline = None
+            for child_name, child in pseudoclock.child_list.items():
+                # store a reference to the internal clockline
+                if child.parent_port == port:                
+                    return DeviceTab.get_child_from_connection_table(self, pseudoclock.name, port)
+            
+        return '-'
+        
+     
+    @define_state(MODE_BUFFERED,True)  
+    def status_monitor(self, notify_queue):
+        status = yield(self.queue_work(self.primary_worker, 'status_monitor'))        
+        if status:
+            # Experiment is over. Tell the queue manager about it
+            notify_queue.put('done')
+            self.statemachine_timeout_remove(self.status_monitor)
+        
+    @define_state(MODE_BUFFERED,True)  
+    def start_run(self, notify_queue):
+        """Starts the Pineblaster, notifying the queue manager when
+        the run is over"""
+        self.statemachine_timeout_add(100, self.status_monitor, notify_queue)
+        yield(self.queue_work(self.primary_worker, 'start_run'))
+
+
+@BLACS_worker        
+@timed_transitions
+class PineblasterWorker(Worker):
+    # How long to leave the port closed after telling the device to restart,
+    # so that it has gone down before we reconnect and probe it, in seconds:
+    restart_time = 0.1
+    
+    def init(self):
+        global h5py; import labscript_utils.h5_lock, h5py
+        global serial; import serial
+        global time; import time
+        # The instructions last programmed into the device, or None if unknown:
+        self.smart_cache = None
+        # How long the device took to boot each time we connected to it:
+        self.boot_times = []
+        self.connect()
+        
+    def connect(self):
+        self.pineblaster = serial.Serial(self.usbport, 115200, timeout=1)
+        # Opening the port resets the device, which has a finite startup time:
+        self.wait_for_boot()
+        
+    def wait_for_boot(self):
+        boot_time = wait_for_boot(self.pineblaster, self.max_boot_time)
+        self.boot_times.append(boot_time)
+        self.logger.info('PineBlaster responded %.3f seconds after reset'%boot_time)
+            
+    def shutdown(self):
+        self.pineblaster.close()
+        
+    def program_manual(self, values):    
+        value = values['internal'] # there is only one value
+        self.pineblaster.write('go high\r\n' if value else 'go low\r\n')
+        response = self.pineblaster.readline()
+        assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
+        return {}
+        
+    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
+        if fresh:
+            self.smart_cache = None
+        self.program_manual({'internal':0})
+        
+        with self.timing.span('h5_read'):
+            with h5py.File(h5file,'r') as hdf5_file:
+                group = hdf5_file['devices/%s'%device_name]
+                pulse_program = group['PULSE_PROGRAM'][:]
+                device_properties = labscript_utils.properties.get(hdf5_file, device_name, 'device_properties')
+                self.is_master_pseudoclock = device_properties['is_master_pseudoclock']
+            
+        # Only program instructions that differ from what's in the smart cache:
+        indices = changed_instructions(pulse_program, self.smart_cache)
+        try:
+            with self.timing.span('upload'):
+                upload_instructions(self.pineblaster, pulse_program, indices)
+        except Exception:
+            # We no longer know what is in the PineBlaster's memory:
+            self.smart_cache = None
+            raise
+        self.smart_cache = updated_smart_cache(pulse_program, self.smart_cache)
+        self.logger.debug('Programmed %d of %d instructions'%(len(indices), len(pulse_program)))
+
+        if not self.is_master_pseudoclock:
+            # Get ready for a hardware trigger:
+            self.pineblaster.write('hwstart\r\n')
+            response = self.pineblaster.readline()
+            assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
+            
+        return {'internal':0} # always finish on 0
+            
+    def start_run(self):
+        # Start in software:
+        self.pineblaster.write('start\r\n')
+        response = self.pineblaster.readline()
+        assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
+    
+    def status_monitor(self):
+        # Wait to see if it's done within the timeout:
+        response = self.pineblaster.readline()
+        if response:
+            assert response == 'done\r\n'
+            return True
+        return False
+        
+    def transition_to_manual(self):
+        # Wait until the pineblaster says it's done:
+        if not self.is_master_pseudoclock:
+            # If we're the master pseudoclock then this already happened
+            # in status_monitor, so we don't need to do it again
+            response = self.pineblaster.readline()
+            assert response == 'done\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
+            # print 'done!'
+        return True
+    
+    def abort_buffered(self):
+        return self.abort()
+    
+    def abort_transition_to_buffered(self):
+        return self.abort()
+    
+    def abort(self):
+        self.pineblaster.write('restart\r\n')
+        self.pineblaster.flush()
+        # Restarting wipes the device's memory:
+        self.smart_cache = None
+        # Until it has actually reset, the device may still answer a probe as
+        # if it were back already. So drop the line, and give it time to go
+        # down before reconnecting, which waits for it to boot:
+        self.shutdown()
+        time.sleep(self.restart_time)
+        self.connect()
+        return True
@@ -0,0 +1,224 @@
+#####################################################################
+#                                                                   #
+# /Profiling.py                                                     #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A profiler for the time spent compiling shots, parsing them for runviewer
+and running them in BLACS workers, shared by every module in
+labscript_devices.
+
+Functions are profiled by decorating them, and parts of functions with
+span(), each under a name:
+
+    @profile
+    def generate_code(self, hdf5_file):
+        ...
+        with span('PulseBlaster.write_instructions'):
+            ...
+
+Decorated functions are named after their module and themselves. Profiling
+is off unless enabled, either with enable() or by setting the environment
+variable LABSCRIPT_DEVICES_PROFILE before labscript_devices is imported.
+While off, it costs each call to a decorated function a check of one
+attribute, and each span nothing but the with statement. While on, each call
+is added to the count, total, min and max time for its name, and kept in a
+random sample of at most RESERVOIR_SIZE of its calls, so memory use doesn't
+grow with the number of calls. report() gives the min, max, mean and
+percentiles for each name, the percentiles estimated from the sample once a
+name has had more calls than that. Decorate functions called once per shot,
+or per device, rather than once per instruction or sample, whose profiling
+would cost as much as they do. If LABSCRIPT_DEVICES_PROFILE is set, the
+report is printed to stderr when the interpreter exits, or written to the
+file it names if not set to 1."""
+
+import os
+import sys
+import atexit
+import random
+import functools
+import threading
+try:
+    from time import perf_counter as timer
+except ImportError:
+    # Python 2. time.clock on Windows, which unlike time.time has sub-microsecond resolution:
+    from timeit import default_timer as timer
+
+import numpy as np
+
+ENVIRONMENT_VARIABLE = 'LABSCRIPT_DEVICES_PROFILE'
+
+PERCENTILES = [50, 90, 99]
+
+# How many durations are kept for each name to estimate the percentiles from:
+RESERVOIR_SIZE = 1024
+
+
+class Span(object):
+    """Times the enclosed code, recording it under its name"""
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start_time = timer()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, timer() - self.start_time)
+
+
+class NullSpan(object):
+    """What span() returns when profiling is off"""
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+NULL_SPAN = NullSpan()
+
+
+class Durations(object):
+    """The number, total, min and max of the durations recorded under a name,
+    and a uniform random sample of at most RESERVOIR_SIZE of them"""
+    def __init__(self, duration):
+        self.calls = 1
+        self.total = self.min = self.max = duration
+        self.sample = [duration]
+
+    def add(self, duration, rng):
+        self.calls += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        # Reservoir sampling: each duration so far is in the sample with equal probability:
+        if len(self.sample) < RESERVOIR_SIZE:
+            self.sample.append(duration)
+        else:
+            i = rng.randrange(self.calls)
+            if i < RESERVOIR_SIZE:
+                self.sample[i] = duration
+
+
+class Profiler(object):
+    """The times taken by each named function or span while enabled. Safe to
+    record into from multiple threads."""
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        # {name: Durations}
+        self.durations = {}
+        self.rng = random.Random()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.durations = {}
+
+    def record(self, name, duration):
+        with self.lock:
+            try:
+                self.durations[name].add(duration, self.rng)
+            except KeyError:
+                self.durations[name] = Durations(duration)
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def profile(self, function, name=None):
+        """Returns the function, wrapped to record how long each call takes"""
+        if name is None:
+            name = '%s.%s'%(function.__module__.split('.')[-1], function.__name__)
+        @functools.wraps(function)
+        def profiled_function(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start_time = timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, timer() - start_time)
+        return profiled_function
+
+    def stats(self):
+        """Returns {name: {'calls', 'total', 'min', 'max', 'mean', 'p50',
+        'p90', 'p99'}}, with the times in seconds"""
+        with self.lock:
+            durations = dict((name, (aggregate.calls, aggregate.total, aggregate.min, aggregate.max,
+                                     np.array(aggregate.sample)))
+                             for name, aggregate in self.durations.items())
+        stats = {}
+        for name, (calls, total, min_duration, max_duration, sample) in durations.items():
+            stats[name] = {'calls': calls, 'total': total, 'min': min_duration, 'max': max_duration,
+                           'mean': total/calls}
+            for percentile, value in zip(PERCENTILES, np.percentile(sample, PERCENTILES)):
+                stats[name]['p%d'%percentile] = value
+        return stats
+
+    def report(self):
+        """Returns a table of the stats, in ms, slowest total first"""
+        columns = ['total', 'min', 'mean'] + ['p%d'%percentile for percentile in PERCENTILES] + ['max']
+        lines = ['%-50s %8s'%('name', 'calls') + ''.join(' %10s'%column for column in columns)]
+        stats = self.stats()
+        for name in sorted(stats, key=lambda name: -stats[name]['total']):
+            lines.append('%-50s %8d'%(name, stats[name]['calls']) +
+                         ''.join(' %10.3f'%(1e3*stats[name][column]) for column in columns))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, destination=None):
+        """Writes the report to a file object or filename, by default stderr"""
+        if destination is None:
+            destination = sys.stderr
+        if isinstance(destination, basestring):
+            with open(destination, 'w') as f:
+                f.write(self.report())
+        else:
+            destination.write(self.report())
+
+
+profiler = Profiler()
+
+enable = profiler.enable
+disable = profiler.disable
+reset = profiler.reset
+span = profiler.span
+stats = profiler.stats
+report = profiler.report
+dump = profiler.dump
+
+
+def is_enabled():
+    return profiler.enabled
+
+
+def profile(function_or_name):
+    """Decorator recording how long each call to a function takes, under the
+    given name, or named after its module and itself if used without one"""
+    if callable(function_or_name):
+        return profiler.profile(function_or_name)
+    return lambda function: profiler.profile(function, function_or_name)
+
+
+def _dump_at_exit(destination):
+    if profiler.durations:
+        dump(destination)
+
+
+if os.environ.get(ENVIRONMENT_VARIABLE, '0') != '0':
+    enable()
+    _destination = os.environ[ENVIRONMENT_VARIABLE]
+    atexit.register(_dump_at_exit, None if _destination == '1' else _destination)
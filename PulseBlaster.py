@@ -10,7 +10,8 @@
 # file in the root of the project for the full license.             #
 #                                                                   #
 #####################################################################
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker, runviewer_parser
+from labscript_devices import labscript_device, runviewer_parser, alias_companion_classes
+from labscript_devices.Profiling import profile
 
 from labscript import Device, PseudoclockDevice, Pseudoclock, ClockLine, IntermediateDevice, DigitalQuantity, DigitalOut, DDS, config, LabscriptError, set_passed_properties
 
@@ -21,49 +22,6 @@ import labscript_utils.h5_lock, h5py
 class x(object):
     pass
 
-import time
-
-profiles = {}
-def profile(funct):
-    func = funct.__name__
-    if func not in profiles:
-        profiles[func] = {'total_time':0, 'min':None, 'max':0, 'num_calls':0, 'average_time_per_call':0}
-    
-    def new_func(*args,**kwargs):
-        start_time = time.time()
-        ret = funct(*args,**kwargs)
-        runtime = time.time()-start_time
-        profiles[func]['total_time'] += runtime
-        profiles[func]['num_calls'] += 1
-        profiles[func]['min'] = profiles[func]['min'] if profiles[func]['min'] is not None and profiles[func]['min'] < runtime else runtime
-        profiles[func]['max'] = profiles[func]['max'] if profiles[func]['max'] > runtime else runtime
-        profiles[func]['average_time_per_call'] = profiles[func]['total_time']/profiles[func]['num_calls']
-        
-        return ret
-    # return new_func
-    return funct
-    
-def start_profile(name):
-    if name not in profiles:
-        profiles[name] = {'total_time':0, 'min':None, 'max':0, 'num_calls':0, 'average_time_per_call':0}
-        
-    if 'start_time' in profiles[name]:
-        raise Exception('You cannot call start_profile for %s without first calling stop_profile'%name)
-        
-    profiles[name]['start_time'] = time.time()
-    
-def stop_profile(name):
-    if name not in profiles or 'start_time' not in profiles[name]:
-        raise Exception('You must first call start_profile for %s before calling stop_profile')
-        
-    runtime = time.time()-profiles[name]['start_time']
-    del profiles[name]['start_time']
-    profiles[name]['total_time'] += runtime
-    profiles[name]['num_calls'] += 1
-    profiles[name]['min'] = profiles[name]['min'] if profiles[name]['min'] is not None and profiles[name]['min'] < runtime else runtime
-    profiles[name]['max'] = profiles[name]['max'] if profiles[name]['max'] > runtime else runtime
-    profiles[name]['average_time_per_call'] = profiles[name]['total_time']/profiles[name]['num_calls']
-          
 @labscript_device          
 class PulseBlaster(PseudoclockDevice):
     
@@ -243,6 +201,7 @@ class PulseBlaster(PseudoclockDevice):
                 
         return dig_outputs, dds_outputs
 
+    @profile
     def generate_registers(self, hdf5_file, dds_outputs):
         ampdicts = {}
         phasedicts = {}
@@ -312,6 +271,7 @@ class PulseBlaster(PseudoclockDevice):
             
         return freqdicts, ampdicts, phasedicts
         
+    @profile
     def convert_to_pb_inst(self, dig_outputs, dds_outputs, freqs, amps, phases):
         pb_inst = []
         
@@ -509,6 +469,7 @@ class PulseBlaster(PseudoclockDevice):
             raise AssertionError('Invalid programming scheme %s'%str(self.programming_scheme))
         return pb_inst
         
+    @profile
     def write_pb_inst_to_h5(self, pb_inst, hdf5_file):
         # OK now we squeeze the instructions into a numpy array ready for writing to hdf5:
         pb_dtype = [('freq0', np.int32), ('phase0', np.int32), ('amp0', np.int32), 
@@ -540,6 +501,7 @@ class PulseBlaster(PseudoclockDevice):
         self.set_property('stop_time', self.stop_time, location='device_properties')
 
         
+    @profile
     def generate_code(self, hdf5_file):
         # Generate the hardware instructions
         hdf5_file.create_group('/devices/'+self.name)
@@ -566,429 +528,9 @@ class PulseBlasterDirectOutputs(IntermediateDevice):
                 raise LabscriptError('You cannot specify a digital gate ' +
                                      'for a DDS connected to %s. '% (self.name) + 
                                      'The digital gate is always internal to the Pulseblaster.')
-            
-
-from blacs.tab_base_classes import Worker, define_state
-from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
-
-from blacs.device_base_class import DeviceTab
-
-from qtutils import UiLoader
-import os
-
-@BLACS_tab
-class PulseBlasterTab(DeviceTab):
-    
-    def initialise_GUI(self):
-        # Capabilities
-        self.base_units     = {'freq':'Hz',        'amp':'Vpp', 'phase':'Degrees'}
-        self.base_min       = {'freq':0.3,         'amp':0.0,   'phase':0}
-        self.base_max       = {'freq':150000000.0, 'amp':1.0,   'phase':360}
-        self.base_step      = {'freq':1000000,     'amp':0.01,  'phase':1}
-        self.base_decimals  = {'freq':1,           'amp':3,     'phase':3}
-        self.num_DDS = 2
-        self.num_DO = 12
-        
-        dds_prop = {}
-        for i in range(self.num_DDS): # 2 is the number of DDS outputs on this device
-            dds_prop['dds %d'%i] = {}
-            for subchnl in ['freq', 'amp', 'phase']:
-                dds_prop['dds %d'%i][subchnl] = {'base_unit':self.base_units[subchnl],
-                                                 'min':self.base_min[subchnl],
-                                                 'max':self.base_max[subchnl],
-                                                 'step':self.base_step[subchnl],
-                                                 'decimals':self.base_decimals[subchnl]
-                                                }
-            dds_prop['dds %d'%i]['gate'] = {}
-        
-        do_prop = {}
-        for i in range(self.num_DO): # 12 is the maximum number of flags on this device (some only have 4 though)
-            do_prop['flag %d'%i] = {}
-        
-        # Create the output objects    
-        self.create_dds_outputs(dds_prop)        
-        self.create_digital_outputs(do_prop)        
-        # Create widgets for output objects
-        dds_widgets,ao_widgets,do_widgets = self.auto_create_widgets()
-        
-        # Define the sort function for the digital outputs
-        def sort(channel):
-            flag = channel.replace('flag ','')
-            flag = int(flag)
-            return '%02d'%(flag)
-        
-        # and auto place the widgets in the UI
-        self.auto_place_widgets(("DDS Outputs",dds_widgets),("Flags",do_widgets,sort))
-        
-        # Store the board number to be used
-        connection_object = self.settings['connection_table'].find_by_name(self.device_name)
-        self.board_number = int(connection_object.BLACS_connection)
-        
-        # And which scheme we're using for buffered output programming and triggering:
-        # (default values for backward compat with old connection tables)
-        self.programming_scheme = connection_object.properties.get('programming_scheme', 'pb_start/BRANCH')
-            
-        # Create and set the primary worker
-        self.create_worker("main_worker",PulseblasterWorker,{'board_number':self.board_number,
-                                                             'programming_scheme': self.programming_scheme})
-        self.primary_worker = "main_worker"
-        
-        # Set the capabilities of this device
-        self.supports_smart_programming(True) 
-        
-        # Load status monitor (and start/stop/reset buttons) UI
-        ui = UiLoader().load(os.path.join(os.path.dirname(os.path.realpath(__file__)),'pulseblaster.ui'))        
-        self.get_tab_layout().addWidget(ui)
-        # Connect signals for buttons
-        ui.start_button.clicked.connect(self.start)
-        ui.stop_button.clicked.connect(self.stop)
-        ui.reset_button.clicked.connect(self.reset)
-        
-        # initialise dictionaries of data to display and get references to the QLabels
-        self.status_states = ['stopped', 'reset', 'running', 'waiting']
-        self.status = {}
-        self.status_widgets = {}
-        for state in self.status_states:
-            self.status[state] = False
-            self.status_widgets[state] = getattr(ui,'%s_label'%state)        
-        
-        # Create status monitor timout
-        self.statemachine_timeout_add(2000, self.status_monitor)
-        
-    def get_child_from_connection_table(self, parent_device_name, port):
-        # This is a direct output, let's search for it on the internal intermediate device called 
-        # PulseBlasterDirectOutputs
-        if parent_device_name == self.device_name:
-            device = self.connection_table.find_by_name(self.device_name)
-            pseudoclock = device.child_list[device.child_list.keys()[0]] # there should always be one (and only one) child, the Pseudoclock
-            clockline = None
-            for child_name, child in pseudoclock.child_list.items():
-                # store a reference to the internal clockline
-                if child.parent_port == 'internal':
-                    clockline = child
-                # if the port is in use by a clockline, return the clockline
-                elif child.parent_port == port:
-                    return child
-                
-            if clockline is not None:
-                # There should only be one child of this clock line, the direct outputs
-                direct_outputs = clockline.child_list[clockline.child_list.keys()[0]] 
-                # look to see if the port is used by a child of the direct outputs
-                return DeviceTab.get_child_from_connection_table(self, direct_outputs.name, port)
-            else:
-                return ''
-        else:
-            # else it's a child of a DDS, so we can use the default behaviour to find the device
-            return DeviceTab.get_child_from_connection_table(self, parent_device_name, port)
-    
-    # This function gets the status of the Pulseblaster from the spinapi,
-    # and updates the front panel widgets!
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def status_monitor(self,notify_queue=None):
-        # When called with a queue, this function writes to the queue
-        # when the pulseblaster is waiting. This indicates the end of
-        # an experimental run.
-        self.status, waits_pending = yield(self.queue_work(self._primary_worker,'check_status'))
-        
-        if self.programming_scheme == 'pb_start/BRANCH':
-            done_condition = self.status['waiting']
-        elif self.programming_scheme == 'pb_stop_programming/STOP':
-            done_condition = self.status['stopped']
-            
-        if notify_queue is not None and done_condition and not waits_pending:
-            # Experiment is over. Tell the queue manager about it, then
-            # set the status checking timeout back to every 2 seconds
-            # with no queue.
-            notify_queue.put('done')
-            self.statemachine_timeout_remove(self.status_monitor)
-            self.statemachine_timeout_add(2000,self.status_monitor)
-            if self.programming_scheme == 'pb_stop_programming/STOP':
-                # Not clear that on all models the outputs will be correct after being
-                # stopped this way, so we do program_manual with current values to be sure:
-                self.program_device()
-                
-        # Update widgets with new status
-        for state in self.status_states:
-            self.status_widgets[state].setText(str(self.status[state]))
-                        
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def start(self,widget=None):
-        yield(self.queue_work(self._primary_worker,'start_run'))
-        self.status_monitor()
-        
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def stop(self,widget=None):
-        yield(self.queue_work(self._primary_worker,'pb_stop'))
-        self.status_monitor()
-        
-    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)  
-    def reset(self,widget=None):
-        yield(self.queue_work(self._primary_worker,'pb_reset'))
-        self.status_monitor()
-    
-    @define_state(MODE_BUFFERED,True)  
-    def start_run(self, notify_queue):
-        """Starts the Pulseblaster, notifying the queue manager when
-        the run is over"""
-        self.statemachine_timeout_remove(self.status_monitor)
-        self.start()
-        self.statemachine_timeout_add(100,self.status_monitor,notify_queue)
-
-
-@BLACS_worker        
-class PulseblasterWorker(Worker):
-    def init(self):
-        from labscript_utils import check_version
-        check_version('spinapi', '3.1.1', '4')
-        exec 'from spinapi import *' in globals()
-        global h5py; import labscript_utils.h5_lock, h5py
-        global zprocess; import zprocess
-        
-        self.pb_start = pb_start
-        self.pb_stop = pb_stop
-        self.pb_reset = pb_reset
-        self.pb_close = pb_close
-        self.pb_read_status = pb_read_status
-        self.smart_cache = {'amps0':None,'freqs0':None,'phases0':None,
-                            'amps1':None,'freqs1':None,'phases1':None,
-                            'pulse_program':None,'ready_to_go':False,
-                            'initial_values':None}
-                            
-        # An event for checking when all waits (if any) have completed, so that
-        # we can tell the difference between a wait and the end of an experiment.
-        # The wait monitor device is expected to post such events, which we'll wait on:
-        self.all_waits_finished = zprocess.Event('all_waits_finished')
-        self.waits_pending = False
-    
-        pb_select_board(self.board_number)
-        pb_init()
-        pb_core_clock(75)
 
-    def program_manual(self,values):
-    
-        if self.programming_scheme == 'pb_stop_programming/STOP':
-            # Need to ensure device is stopped before programming - or we won't know what line it's on.
-            pb_stop()
-            
-        # Program the DDS registers:
-        for i in range(2):
-            pb_select_dds(i)
-            # Program the frequency, amplitude and phase into their
-            # zeroth registers:
-            program_amp_regs(values['dds %d'%i]['amp']) # Does not call pb_stop_programming anyway, so no kwarg needed
-            program_freq_regs(values['dds %d'%i]['freq']/10.0**6, call_stop_programming=False) # method expects MHz
-            program_phase_regs(values['dds %d'%i]['phase'], call_stop_programming=False)
 
-        # create flags string
-        # NOTE: The spinapi can take a string or integer for flags.
-                # If it is a string: 
-                #     flag: 0          12
-                #          '101100011111'
-                #
-                # If it is a binary number:
-                #     flag:12          0
-                #         0b111110001101
-                #
-                # Be warned!
-        flags = ''
-        for i in range(12):
-            if values['flag %d'%i]:
-                flags += '1'
-            else:
-                flags += '0'
-        
-        # Write the first two lines of the pulse program:
-        pb_start_programming(PULSE_PROGRAM)
-        # Line zero is a wait:
-        pb_inst_dds2(0,0,0,values['dds 0']['gate'],0,0,0,0,values['dds 1']['gate'],0,flags, WAIT, 0, 100)
-        # Line one is a brach to line 0:
-        pb_inst_dds2(0,0,0,values['dds 0']['gate'],0,0,0,0,values['dds 1']['gate'],0,flags, BRANCH, 0, 100)
-        pb_stop_programming()
-        
-        # Now we're waiting on line zero, so when we start() we'll go to
-        # line one, then brach back to zero, completing the static update:
-        pb_start()
-        
-        # The pulse program now has a branch in line one, and so can't proceed to the pulse program
-        # without a reprogramming of the first two lines:
-        self.smart_cache['ready_to_go'] = False
-        
-        # TODO: return coerced/quantised values
-        return {}
-        
-    def start_run(self):
-        if self.programming_scheme == 'pb_start/BRANCH':
-            pb_start()
-        elif self.programming_scheme == 'pb_stop_programming/STOP':
-            pb_stop_programming()
-            pb_start()
-        else:
-            raise ValueError('invalid programming_scheme: %s'%str(self.programming_scheme))
-    
-    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
-        self.h5file = h5file
-        if self.programming_scheme == 'pb_stop_programming/STOP':
-            # Need to ensure device is stopped before programming - or we wont know what line it's on.
-            pb_stop()
-        with h5py.File(h5file,'r') as hdf5_file:
-            group = hdf5_file['devices/%s'%device_name]
-            # Program the DDS registers:
-            ampregs = []
-            freqregs = []
-            phaseregs = []
-            for i in range(2):
-                amps = group['DDS%d/AMP_REGS'%i][:]
-                freqs = group['DDS%d/FREQ_REGS'%i][:]
-                phases = group['DDS%d/PHASE_REGS'%i][:]
-                
-                amps[0] = initial_values['dds %d'%i]['amp']
-                freqs[0] = initial_values['dds %d'%i]['freq']/10.0**6 # had better be in MHz!
-                phases[0] = initial_values['dds %d'%i]['phase']
-                
-                pb_select_dds(i)
-                # Only reprogram each thing if there's been a change:
-                if fresh or len(amps) != len(self.smart_cache['amps%d'%i]) or (amps != self.smart_cache['amps%d'%i]).any():   
-                    self.smart_cache['amps%d'%i] = amps
-                    program_amp_regs(*amps)
-                if fresh or len(freqs) != len(self.smart_cache['freqs%d'%i]) or (freqs != self.smart_cache['freqs%d'%i]).any():
-                    self.smart_cache['freqs%d'%i] = freqs
-                    # We must be careful not to call stop_programming() until the end,
-                    # lest the pulseblaster become responsive to triggers before we are done programming.
-                    # This is not an issue for program_amp_regs above, only for freq and phase regs.
-                    program_freq_regs(*freqs, call_stop_programming=False)
-                if fresh or len(phases) != len(self.smart_cache['phases%d'%i]) or (phases != self.smart_cache['phases%d'%i]).any():      
-                    self.smart_cache['phases%d'%i] = phases
-                    # See above comment - we must not call pb_stop_programming here:
-                    program_phase_regs(*phases, call_stop_programming=False)
-                
-                ampregs.append(amps)
-                freqregs.append(freqs)
-                phaseregs.append(phases)
-                
-            # Now for the pulse program:
-            pulse_program = group['PULSE_PROGRAM'][2:]
-            
-            #Let's get the final state of the pulseblaster. z's are the args we don't need:
-            freqreg0,phasereg0,ampreg0,en0,z,freqreg1,phasereg1,ampreg1,en1,z,flags,z,z,z = pulse_program[-1]
-            finalfreq0 = freqregs[0][freqreg0]*10.0**6 # Front panel expects frequency in Hz
-            finalfreq1 = freqregs[1][freqreg1]*10.0**6 # Front panel expects frequency in Hz
-            finalamp0 = ampregs[0][ampreg0]
-            finalamp1 = ampregs[1][ampreg1]
-            finalphase0 = phaseregs[0][phasereg0]
-            finalphase1 = phaseregs[1][phasereg1]
-            
-            # Always call start_programming regardless of whether we are going to do any
-            # programming or not. This is so that is the programming_scheme is 'pb_stop_programming/STOP'
-            # we are ready to be triggered by a call to pb_stop_programming() even if no programming
-            # occurred due to smart programming:
-            pb_start_programming(PULSE_PROGRAM)
-            
-            if fresh or (self.smart_cache['initial_values'] != initial_values) or \
-                (len(self.smart_cache['pulse_program']) != len(pulse_program)) or \
-                (self.smart_cache['pulse_program'] != pulse_program).any() or \
-                not self.smart_cache['ready_to_go']:
-            
-                self.smart_cache['ready_to_go'] = True
-                self.smart_cache['initial_values'] = initial_values
-                # Line zero is a wait on the final state of the program:
-                pb_inst_dds2(freqreg0,phasereg0,ampreg0,en0,0,freqreg1,phasereg1,ampreg1,en1,0,flags,WAIT,0,100)
-                
-                # create initial flags string
-                # NOTE: The spinapi can take a string or integer for flags.
-                # If it is a string: 
-                #     flag: 0          12
-                #          '101100011111'
-                #
-                # If it is a binary number:
-                #     flag:12          0
-                #         0b111110001101
-                #
-                # Be warned!
-                initial_flags = ''
-                for i in range(12):
-                    if initial_values['flag %d'%i]:
-                        initial_flags += '1'
-                    else:
-                        initial_flags += '0'
-                # Line one is a continue with the current front panel values:
-                pb_inst_dds2(0,0,0,initial_values['dds 0']['gate'],0,0,0,0,initial_values['dds 1']['gate'],0,initial_flags, CONTINUE, 0, 100)
-                # Now the rest of the program:
-                if fresh or len(self.smart_cache['pulse_program']) != len(pulse_program) or \
-                (self.smart_cache['pulse_program'] != pulse_program).any():
-                    self.smart_cache['pulse_program'] = pulse_program
-                    for args in pulse_program:
-                        pb_inst_dds2(*args)
-            
-            if self.programming_scheme == 'pb_start/BRANCH':
-                # We will be triggered by pb_start() if we are are the master pseudoclock or a single hardware trigger
-                # from the master if we are not:
-                pb_stop_programming()
-            elif self.programming_scheme == 'pb_stop_programming/STOP':
-                # Don't call pb_stop_programming(). We don't want to pulseblaster to respond to hardware
-                # triggers (such as 50/60Hz line triggers) until we are ready to run.
-                # Our start_method will call pb_stop_programming() when we are ready
-                pass
-            else:
-                raise ValueError('invalid programming_scheme %s'%str(self.programming_scheme))
-            
-            # Are there waits in use in this experiment? The monitor waiting for the end of
-            # the experiment will need to know:
-            self.waits_pending =  bool(len(hdf5_file['waits']))
-            
-            # Now we build a dictionary of the final state to send back to the GUI:
-            return_values = {'dds 0':{'freq':finalfreq0, 'amp':finalamp0, 'phase':finalphase0, 'gate':en0},
-                             'dds 1':{'freq':finalfreq1, 'amp':finalamp1, 'phase':finalphase1, 'gate':en1},
-                            }
-            # Since we are converting from an integer to a binary string, we need to reverse the string! (see notes above when we create flags variables)
-            return_flags = bin(flags)[2:].rjust(12,'0')[::-1]
-            for i in range(12):
-                return_values['flag %d'%i] = return_flags[i]
-                
-            return return_values
-            
-    def check_status(self):
-        if self.waits_pending:
-            try:
-                self.all_waits_finished.wait(self.h5file, timeout=0)
-                self.waits_pending = False
-            except zprocess.TimeoutError:
-                pass
-        return pb_read_status(), self.waits_pending
 
-    def transition_to_manual(self):
-        status, waits_pending = self.check_status()
-        
-        if self.programming_scheme == 'pb_start/BRANCH':
-            done_condition = status['waiting']
-        elif self.programming_scheme == 'pb_stop_programming/STOP':
-            done_condition = True # status['stopped']
-            
-        if done_condition and not waits_pending:
-            return True
-        else:
-            return False
-     
-    def abort_buffered(self):
-        # Stop the execution
-        self.pb_stop()
-        # Reset to the beginning of the pulse sequence
-        self.pb_reset()
-                
-        # abort_buffered in the GUI process queues up a program_device state
-        # which will reprogram the device and call pb_start()
-        # This ensures the device isn't accidentally retriggered by another device
-        # while it is running it's abort function
-        return True
-        
-    def abort_transition_to_buffered(self):
-        return True
-        
-    def shutdown(self):
-        #TODO: implement this
-        pass
-      
-
-            
 @runviewer_parser
 class PulseBlasterParser(object):
     num_dds = 2
@@ -1022,6 +564,7 @@ class PulseBlasterParser(object):
         
             
         
+    @profile
     def get_traces(self, add_trace, parent=None):
         if parent is None:
             # we're the master pseudoclock, software triggered. So we don't have to worry about trigger delays, etc
@@ -1067,7 +610,6 @@ class PulseBlasterParser(object):
                         row = pulse_program[j]
                         # buffer the index of traces used for this instruction
                         # Cuts the runtime down by ~60%
-                        # start_profile('loop_contents')
                         if j not in buffer:
                             clock.append(t)
                             self._add_pulse_program_row_to_traces(traces, row, dds)
@@ -1075,9 +617,7 @@ class PulseBlasterParser(object):
                         else:                            
                             clock.append(t)
                             self._add_pulse_program_row_from_buffer(traces, buffer[j])
-                        # stop_profile('loop_contents')
                             
-                        # start_profile('end_of_loop')
                         t+= row['length']*1.0e-9
                         
                         if row['inst'] == 3: # END_LOOP
@@ -1088,7 +628,6 @@ class PulseBlasterParser(object):
                         else:
                             # print 'in loop. j=%d, t=%.7f'%(j,t)
                             j+=1
-                        # stop_profile('end_of_loop')
                     loops -= 1
                     
                 i = j
@@ -1144,7 +683,6 @@ class PulseBlasterParser(object):
             
         return clocklines_and_triggers
     
-    @profile
     def _add_pulse_program_row_from_buffer(self, traces, index):
         for i in range(self.num_flags):
             traces[self.flag_strings[i]].append(traces[self.flag_strings[i]][index])
@@ -1155,7 +693,6 @@ class PulseBlasterParser(object):
             traces[current_strings['ddsphase']].append(traces[current_strings['ddsphase']][index])
             traces[current_strings['ddsamp']].append(traces[current_strings['ddsamp']][index])
             
-    @profile            
     def _add_pulse_program_row_to_traces(self, traces, row, dds, flags = None):
         # add flags
         if flags is None:
@@ -1183,5 +720,7 @@ class PulseBlasterParser(object):
             # Note: Using the inline if statement reduces the runtime (of this for loop) by 50%
             amp = current_dds['AMP'][row[current_strings['amp']]] if row[current_strings['dds_en']] else 0
             traces[current_strings['ddsamp']].append(amp)
-            
-            
+
+
+# The BLACS tab and worker have moved to PulseBlaster_blacs.py:
+alias_companion_classes(__name__, ['PulseBlasterTab', 'PulseblasterWorker'])
@@ -11,8 +11,8 @@
 #                                                                   #
 #####################################################################
 
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker, runviewer_parser
-from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS, Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker
+from labscript_devices import labscript_device, runviewer_parser, alias_companion_classes
+from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS
 
 
 @labscript_device
@@ -23,17 +23,5 @@ class PulseBlasterESRPro500(PulseBlaster_No_DDS):
     n_flags = 21
 
 
-@BLACS_tab    
-class pulseblasteresrpro500(Pulseblaster_No_DDS_Tab):
-    # Capabilities
-    num_DO = 21
-    def __init__(self,*args,**kwargs):
-        self.device_worker_class = PulseblasterESRPro500Worker 
-        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
-    
-    
-@BLACS_worker
-class PulseblasterESRPro500Worker(PulseblasterNoDDSWorker):
-    core_clock_freq = 500.0
-    
-     
+# The BLACS tab and worker have moved to PulseBlasterESRPro500_blacs.py:
+alias_companion_classes(__name__, ['pulseblasteresrpro500', 'PulseblasterESRPro500Worker'])
@@ -0,0 +1,28 @@
+#####################################################################
+#                                                                   #
+# /PulseBlasterESRPro500_blacs.py                                   #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+from labscript_devices import BLACS_tab, BLACS_worker
+from labscript_devices.PulseBlaster_No_DDS_blacs import Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker
+
+@BLACS_tab    
+class pulseblasteresrpro500(Pulseblaster_No_DDS_Tab):
+    # Capabilities
+    num_DO = 21
+    def __init__(self,*args,**kwargs):
+        self.device_worker_class = PulseblasterESRPro500Worker 
+        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
+    
+    
+@BLACS_worker
+class PulseblasterESRPro500Worker(PulseblasterNoDDSWorker):
+    core_clock_freq = 500.0
@@ -0,0 +1,63 @@
+#####################################################################
+#                                                                   #
+# /PulseBlasterProgramming.py                                       #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Pulse program upload helpers for the PulseBlaster workers. These have no
+BLACS dependencies, and take the spinapi module to program with, so they can
+be driven against the simulated spinapi in labscript_devices.simulated as
+well as the real one."""
+
+import numpy as np
+
+
+def upload_instructions(spinapi, pulse_program):
+    """Programs the instructions of pulse_program at the board's next
+    addresses, pb_start_programming(PULSE_PROGRAM) having been called.
+    pulse_program has the fields of pb_inst_dds2's arguments if it has a
+    'freq0' field, otherwise those of pb_inst_pbonly's.
+
+    If spinapi has pb_inst_dds2_array and pb_inst_pbonly_array, the whole
+    array is handed to them in one call. Otherwise each instruction is
+    programmed with its own call, unpacking Python tuples rather than numpy
+    records, which is several times faster. Returns the number of
+    instructions programmed."""
+    if 'freq0' in pulse_program.dtype.names:
+        bulk_function = getattr(spinapi, 'pb_inst_dds2_array', None)
+        function = spinapi.pb_inst_dds2
+    else:
+        bulk_function = getattr(spinapi, 'pb_inst_pbonly_array', None)
+        function = spinapi.pb_inst_pbonly
+    if bulk_function is not None:
+        bulk_function(pulse_program)
+    else:
+        for args in pulse_program.tolist():
+            function(*args)
+    return len(pulse_program)
+
+
+def upload_changed_instructions(spinapi, pulse_program, indices, start_address):
+    """Programs the instructions of pulse_program at the given indices, the
+    program starting at start_address, which is also the board's next address.
+
+    If spinapi has pb_set_program_address, each run of consecutive changed
+    instructions is written at its own address, leaving the others alone.
+    Otherwise instructions can only be written in order, so every instruction
+    up to the last changed one is rewritten, and only those after it are left
+    alone. Returns the number of instructions programmed."""
+    if not len(indices):
+        return 0
+    set_program_address = getattr(spinapi, 'pb_set_program_address', None)
+    if set_program_address is None:
+        return upload_instructions(spinapi, pulse_program[:indices[-1] + 1])
+    runs = np.split(indices, np.flatnonzero(np.diff(indices) != 1) + 1)
+    for run in runs:
+        set_program_address(start_address + run[0])
+        upload_instructions(spinapi, pulse_program[run[0]:run[-1] + 1])
+    return len(indices)
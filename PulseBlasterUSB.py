@@ -11,8 +11,8 @@
 #                                                                   #
 #####################################################################
 
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker, runviewer_parser
-from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS, Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker
+from labscript_devices import labscript_device, runviewer_parser, alias_companion_classes
+from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS
 
 @labscript_device
 class PulseBlasterUSB(PulseBlaster_No_DDS):
@@ -20,15 +20,7 @@ class PulseBlasterUSB(PulseBlaster_No_DDS):
     clock_limit = 8.3e6 # can probably go faster
     clock_resolution = 20e-9
     n_flags = 24
-    
-@BLACS_tab
-class PulseblasterUSBTab(Pulseblaster_No_DDS_Tab):
-    # Capabilities
-    num_DO = 24
-    def __init__(self,*args,**kwargs):
-        self.device_worker_class = PulseblasterUSBWorker 
-        pulseblaster_no_dds.__init__(self,*args,**kwargs)
-    
-@BLACS_worker   
-class PulseblasterUSBWorker(PulseblasterNoDDSWorker):
-    core_clock_freq = 100.0
+
+
+# The BLACS tab and worker have moved to PulseBlasterUSB_blacs.py:
+alias_companion_classes(__name__, ['PulseblasterUSBTab', 'PulseblasterUSBWorker'])
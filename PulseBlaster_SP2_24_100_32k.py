@@ -11,8 +11,8 @@
 #                                                                   #
 #####################################################################
 
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker, runviewer_parser
-from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS, Pulseblaster_No_DDS_Tab, PulseblasterNoDDSWorker
+from labscript_devices import labscript_device, runviewer_parser, alias_companion_classes
+from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS
 from labscript_devices.PulseBlaster import PulseBlasterParser
 
 @labscript_device
@@ -23,20 +23,12 @@ class PulseBlaster_SP2_24_100_32k(PulseBlaster_No_DDS):
     n_flags = 24
 
 
-@BLACS_tab    
-class PulseBlaster_SP2_24_100_32k_Tab(Pulseblaster_No_DDS_Tab):
-    num_DO = 24
-    def __init__(self,*args,**kwargs):
-        self.device_worker_class = PulseBlaster_SP2_24_100_32k_Worker 
-        Pulseblaster_No_DDS_Tab.__init__(self,*args,**kwargs)
-    
-    
-@BLACS_worker
-class PulseBlaster_SP2_24_100_32k_Worker(PulseblasterNoDDSWorker):
-    core_clock_freq = 100.0
-    
-     
+
 @runviewer_parser
 class PulseBlaster_SP2_24_100_32k_Parser(PulseBlasterParser):
     num_dds = 0
-    num_flags = 24
\ No newline at end of file
+    num_flags = 24
+
+
+# The BLACS tab and worker have moved to PulseBlaster_SP2_24_100_32k_blacs.py:
+alias_companion_classes(__name__, ['PulseBlaster_SP2_24_100_32k_Tab', 'PulseBlaster_SP2_24_100_32k_Worker'])
@@ -0,0 +1,139 @@
+#####################################################################
+#                                                                   #
+# /QuickSynSerial.py                                                #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Serial command engine for the PhaseMatrix QuickSyn. Rather than sleeping a
+fixed time between commands in case the device isn't ready, every exchange
+waits for the device's answer: settings are followed by *OPC?, which it
+answers once it has carried them out. These have no BLACS dependencies, so
+they can be driven against labscript_devices.simulated.quicksyn as well as a
+real device."""
+
+import time
+from collections import deque
+
+# How many recent latencies are remembered for each kind of command:
+N_LATENCIES = 100
+
+
+class QuickSynConnection(object):
+    """Wraps the serial connection to a QuickSyn. Exchanges are spaced at
+    least min_gap apart, measured from the end of one to the start of the
+    next. If merge_commands, settings made together are sent as one line of
+    SCPI commands separated by semicolons, and acknowledged once."""
+    def __init__(self, connection, min_gap=0, merge_commands=True, logger=None):
+        self.connection = connection
+        self.min_gap = min_gap
+        self.merge_commands = merge_commands
+        self.logger = logger
+        # Recent latencies of each kind of exchange, keyed by the commands without their arguments:
+        self.latencies = {}
+        # The shortest time the device has taken to answer a query, which is
+        # how long we allow it to carry out commands it doesn't answer:
+        self.round_trip_time = 0
+        self._last_exchange = 0
+
+    def _exchange(self, line, answered=True):
+        """Writes a line and returns the device's response, if any"""
+        delay = self._last_exchange + self.min_gap - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        start_time = time.time()
+        self.connection.write(line + '\r')
+        if not answered:
+            self._last_exchange = start_time + self.round_trip_time
+            return None
+        response = self.connection.readline()
+        if response == '':
+            # try again, it can be slow to answer:
+            response = self.connection.readline()
+        self._last_exchange = time.time()
+        latency = self._last_exchange - start_time
+        name = ';'.join(command.split()[0] for command in line.split(';'))
+        self.latencies.setdefault(name, deque(maxlen=N_LATENCIES)).append(latency)
+        if self.logger is not None:
+            self.logger.debug('%s: %.1f ms'%(line, 1e3*latency))
+        return response
+
+    def query(self, command):
+        """Returns the device's answer to a query such as 'FREQ?'"""
+        response = self._exchange(command)
+        if response == '':
+            # It may have still been busy, ask again:
+            response = self._exchange(command)
+        if response == '':
+            raise Exception('QuickSyn did not answer %s'%command)
+        return response
+
+    def write(self, *commands):
+        """Sends settings such as 'FREQ 1000000', returning once the device
+        has acknowledged carrying them all out"""
+        if self.merge_commands and len(commands) > 1:
+            response = self._exchange(';:'.join(commands) + ';*OPC?')
+            if response.strip() == '1':
+                return
+            # The device didn't understand them all together. Send them one at a time from now on:
+            self.merge_commands = False
+            if self.logger is not None:
+                self.logger.warning('QuickSyn said %s to merged commands, sending commands separately'%repr(response))
+            self.connection.readlines()
+        for command in commands:
+            if self.merge_commands:
+                response = self._exchange(command + ';*OPC?')
+            else:
+                self._exchange(command, answered=False)
+                response = self._exchange('*OPC?')
+                if response == '':
+                    # It may have still been busy, ask again:
+                    response = self._exchange('*OPC?')
+            if response.strip() != '1':
+                raise Exception('QuickSyn did not acknowledge %s, it said %s'%(command, repr(response)))
+
+    def _answers_probes(self, gap, n_probes):
+        self.min_gap = gap
+        if all(self._exchange('*OPC?') for _ in range(n_probes)):
+            return True
+        # Discard any answers that came too late:
+        self.connection.readlines()
+        return False
+
+    def calibrate_min_gap(self, n_probes=10, max_gap=0.05, resolution=1e-3, margin=2e-3):
+        """Finds the shortest gap between exchanges at which the device
+        answers n_probes *OPC? queries in a row: trying no gap, then doubling
+        from resolution up to max_gap, then bisecting down to resolution.
+        *OPC? has the shortest answer of any query, so leaves the device the
+        least time to recover before the next command. Sets min_gap to the gap
+        found plus margin, since longer commands take longer to arrive, and
+        returns it."""
+        if self._answers_probes(0, n_probes):
+            self.min_gap = 0
+        else:
+            bad_gap, good_gap = 0, resolution
+            while not self._answers_probes(good_gap, n_probes) and good_gap < max_gap:
+                bad_gap, good_gap = good_gap, min(2*good_gap, max_gap)
+            if good_gap < max_gap:
+                while good_gap - bad_gap > resolution:
+                    gap = (good_gap + bad_gap)/2
+                    if self._answers_probes(gap, n_probes):
+                        good_gap = gap
+                    else:
+                        bad_gap = gap
+            self.min_gap = min(good_gap + margin, max_gap)
+        if '*OPC?' in self.latencies:
+            self.round_trip_time = min(self.latencies['*OPC?'])
+        return self.min_gap
+
+    def latency_statistics(self):
+        """Returns min/mean/max of the recent latencies of each kind of exchange, in seconds"""
+        statistics = {}
+        for name, latencies in self.latencies.items():
+            statistics[name] = {'min': min(latencies), 'mean': sum(latencies)/len(latencies),
+                                'max': max(latencies), 'count': len(latencies)}
+        return statistics
@@ -15,7 +15,8 @@ import os
 from labscript import PseudoclockDevice, Pseudoclock, ClockLine, IntermediateDevice, DDS, config, startupinfo, LabscriptError, set_passed_properties
 import numpy as np
 
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker, runviewer_parser
+from labscript_devices import labscript_device, runviewer_parser, alias_companion_classes
+from labscript_devices.Profiling import profile
 
 # Define a RFBlasterPseudoclock that only accepts one child clockline
 class RFBlasterPseudoclock(Pseudoclock):    
@@ -74,6 +75,7 @@ class RFBlaster(PseudoclockDevice):
             raise LabscriptError('You have connected %s (class %s) to %s, but %s does not support children with that class.'%(device.name, device.__class__, self.name, self.name))
         
         
+    @profile
     def generate_code(self, hdf5_file):
         from rfblaster import caspr
         import rfblaster.rfjuice
@@ -212,231 +214,7 @@ class RFBlasterDirectOutputs(IntermediateDevice):
                                      'for a DDS connected to %s. '% (self.name))
                                      
         IntermediateDevice.add_device(self, device)
-        
-        
-        
-from blacs.tab_base_classes import Worker, define_state
-from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
-from blacs.device_base_class import DeviceTab
-
-
-@BLACS_tab
-class RFBlasterTab(DeviceTab):
-    def initialise_GUI(self):
-        # Capabilities 
-        self.base_units =     {'freq':'Hz',        'amp':'%',         'phase':'Degrees'}
-        self.base_min =       {'freq':500000,      'amp':0.0,         'phase':0}
-        self.base_max =       {'freq':350000000.0, 'amp':99.99389648, 'phase':360}
-        self.base_step =      {'freq':1000000,     'amp':1.0,         'phase':1}
-        #TODO: Find out what the amp and phase precision is
-        self.base_decimals =  {'freq':1,           'amp':3,           'phase':3}
-        self.num_DDS = 2  
-
-        # Create DDS Output objects
-        dds_prop = {}
-        for i in range(self.num_DDS): # 2 is the number of DDS outputs on this device
-            dds_prop['dds %d'%i] = {}
-            for subchnl in ['freq', 'amp', 'phase']:
-                dds_prop['dds %d'%i][subchnl] = {'base_unit':self.base_units[subchnl],
-                                                 'min':self.base_min[subchnl],
-                                                 'max':self.base_max[subchnl],
-                                                 'step':self.base_step[subchnl],
-                                                 'decimals':self.base_decimals[subchnl]
-                                                }
-            dds_prop['dds %d'%i]['gate'] = {}
-                
-        # Create the output objects    
-        self.create_dds_outputs(dds_prop)        
-        # Create widgets for output objects
-        dds_widgets,ao_widgets,do_widgets = self.auto_create_widgets()
-        # and auto place the widgets in the UI
-        self.auto_place_widgets(("DDS Outputs",dds_widgets))
-        
-        # Store the COM port to be used
-        self.address = "http://" + str(self.BLACS_connection) + ":8080"
-        
-        # Create and set the primary worker
-        self.create_worker("main_worker",RFBlasterWorker,{'address':self.address, 'num_DDS':self.num_DDS})
-        self.primary_worker = "main_worker"
 
-        # Set the capabilities of this device
-        self.supports_remote_value_check(True)
-        self.supports_smart_programming(False) 
-    
-    def get_child_from_connection_table(self, parent_device_name, port):
-        # This is a direct output, let's search for it on the internal intermediate device called 
-        # RFBlasterDirectOutputs
-        if parent_device_name == self.device_name:
-            device = self.connection_table.find_by_name(self.device_name)
-            pseudoclock = device.child_list[device.child_list.keys()[0]] # there should always be one (and only one) child, the Pseudoclock
-            clockline = pseudoclock.child_list[pseudoclock.child_list.keys()[0]] # there should always be one (and only one) child, the clockline
-            direct_outputs = clockline.child_list[clockline.child_list.keys()[0]] # There should only be one child of this clock line, the direct outputs
-            # look to see if the port is used by a child of the direct outputs
-            return DeviceTab.get_child_from_connection_table(self, direct_outputs.name, port)
-        else:
-            # else it's a child of a DDS, so we can use the default behaviour to find the device
-            return DeviceTab.get_child_from_connection_table(self, parent_device_name, port)
-    
-    # We override this because the RFBlaster doesn't really support remote_value_checking properly
-    # Here we specifically do not program the device (it's slow!) nor do we update the last programmed value to the current
-    # front panel state. This is because the remote value returned from the RFBlaster is always the last *manual* values programmed.
-    @define_state(MODE_BUFFERED,False)
-    def transition_to_manual(self,notify_queue,program=False):
-        self.mode = MODE_TRANSITION_TO_MANUAL
-        
-        success = yield(self.queue_work(self._primary_worker,'transition_to_manual'))
-        for worker in self._secondary_workers:
-            transition_success = yield(self.queue_work(worker,'transition_to_manual'))
-            if not transition_success:
-                success = False
-                # don't break here, so that as much of the device is returned to normal
-        
-        # Update the GUI with the final values of the run:
-        for channel, value in self._final_values.items():
-            if channel in self._AO:
-                self._AO[channel].set_value(value,program=False)
-            elif channel in self._DO:
-                self._DO[channel].set_value(value,program=False)
-            elif channel in self._DDS:
-                self._DDS[channel].set_value(value,program=False)
-        
-        if success:
-            notify_queue.put([self.device_name,'success'])
-            self.mode = MODE_MANUAL
-        else:
-            notify_queue.put([self.device_name,'fail'])
-            raise Exception('Could not transition to manual. You must restart this device to continue')
-            
-    
-@BLACS_worker
-class RFBlasterWorker(Worker):
-    def init(self):
-        exec 'from multipart_form import *' in globals()
-        exec 'from numpy import *' in globals()
-        global h5py; import labscript_utils.h5_lock, h5py
-        global urllib2; import urllib2
-        global re; import re
-        self.timeout = 30 #How long do we wait until we assume that the RFBlaster is dead? (in seconds)
-    
-        # See if the RFBlaster answers
-        urllib2.urlopen(self.address,timeout=self.timeout)
-        
-        self._last_program_manual_values = {}
-        
-    def program_manual(self,values):
-        self._last_program_manual_values = values
-        
-        form = MultiPartForm()
-        for i in range(self.num_DDS):
-            # Program the frequency, amplitude and phase
-            form.add_field("a_ch%d_in"%i,str(values['dds %d'%i]['amp']*values['dds %d'%i]['gate']))
-            form.add_field("f_ch%d_in"%i,str(values['dds %d'%i]['freq']*1e-6)) # method expects MHz
-            form.add_field("p_ch%d_in"%i,str(values['dds %d'%i]['phase']))
-            
-        form.add_field("set_dds","Set device")
-        # Build the request
-        req = urllib2.Request(self.address)
-        #raise Exception(form_values)
-        body = str(form)
-        req.add_header('Content-type', form.get_content_type())
-        req.add_header('Content-length', len(body))
-        req.add_data(body)
-        response = str(urllib2.urlopen(req,timeout=self.timeout).readlines())
-        return_vals = self.get_web_values(response)
-            
-        return return_vals
-        
-    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
-        with h5py.File(h5file,'r') as hdf5_file:
-            group = hdf5_file['devices'][device_name]
-            #Strip out the binary files and submit to the webserver
-            form = MultiPartForm()
-            self.final_values = {}
-            finalfreq = zeros(self.num_DDS)
-            finalamp = zeros(self.num_DDS)
-            finalphase = zeros(self.num_DDS)
-            for i in range(self.num_DDS):
-                #Find the final value from the human-readable part of the h5 file to use for
-                #the front panel values at the end
-                self.final_values['dds %d'%i] = {'freq':group['TABLE_DATA']["freq%d"%i][-1],
-                                                 'amp':group['TABLE_DATA']["amp%d"%i][-1]*100,
-                                                 'phase':group['TABLE_DATA']["phase%d"%i][-1],
-                                                 'gate':True
-                                                }
-                data = group['BINARY_CODE/DDS%d'%i].value
-                form.add_file_content("pulse_ch%d"%i,"output_ch%d.bin"%i,data)
-                
-        form.add_field("upload_and_run","Upload and start")
-        req = urllib2.Request(self.address)
-
-        body = str(form)
-        req.add_header('Content-type', form.get_content_type())
-        req.add_header('Content-length', len(body))
-        req.add_data(body)
-        post_buffered_web_vals = self.get_web_values(str(urllib2.urlopen(req,timeout = self.timeout).readlines()))
-
-        return self.final_values
-                 
-    def abort_transition_to_buffered(self):
-        # TODO: untested (this is probably wrong...)
-        form = MultiPartForm()
-        #tell the rfblaster to stop
-        form.add_field("halt","Halt execution")
-        req = urllib2.Request(self.address)
-        body = str(form)
-        req.add_header('Content-type', form.get_content_type())
-        req.add_header('Content-length', len(body))
-        req.add_data(body)
-        urllib2.urlopen(req,timeout=self.timeout)
-        return True
-    
-    def abort_buffered(self):
-        form = MultiPartForm()
-        #tell the rfblaster to stop
-        form.add_field("halt","Halt execution")
-        req = urllib2.Request(self.address)
-        body = str(form)
-        req.add_header('Content-type', form.get_content_type())
-        req.add_header('Content-length', len(body))
-        req.add_data(body)
-        urllib2.urlopen(req,timeout=self.timeout)
-        return True
-     
-    def transition_to_manual(self):
-        # TODO: check that the RF blaster program is finished?
-        return True
-     
-    def get_web_values(self,page): 
-        #prepare regular expressions for finding the values:
-        search = re.compile(r'name="([fap])_ch(\d+?)_in"\s*?value="([0-9.]+?)"')
-        webvalues = re.findall(search,page)
-        
-        register_name_map = {'f':'freq','a':'amp','p':'phase'}
-        newvals = {}
-        for i in range(self.num_DDS):
-            newvals['dds %d'%i] = {}
-        for register,channel,value in webvalues:
-            newvals['dds %d'%int(channel)][register_name_map[register]] = float(value)
-        for i in range(self.num_DDS):
-            if 'dds %d'%i in self._last_program_manual_values and newvals['dds %d'%i]['amp'] == 0:
-                newvals['dds %d'%i]['gate'] = self._last_program_manual_values['dds %d'%i]['gate']
-            else:
-                newvals['dds %d'%i]['gate'] = True
-                
-            newvals['dds %d'%i]['freq'] *= 1e6 # BLACS expects it in the base unit (Hz)
-            
-            # if the gate is off, keep the front panel amplitude
-            if not newvals['dds %d'%i]['gate']:
-                newvals['dds %d'%i]['amp'] = self._last_program_manual_values['dds %d'%i]['amp']
-            
-        return newvals
-    
-    def check_remote_values(self):
-        #read the webserver page to see what values it puts in the form
-        page = str(urllib2.urlopen(self.address,timeout=self.timeout).readlines())
-        return self.get_web_values(page)
-        
-    def shutdown(self):
-        # TODO: implement this?
-        pass
 
+# The BLACS tab and worker have moved to RFBlaster_blacs.py:
+alias_companion_classes(__name__, ['RFBlasterTab', 'RFBlasterWorker'])
@@ -0,0 +1,48 @@
+#####################################################################
+#                                                                   #
+# /SimCam_blacs.py                                                  #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+from labscript_devices import BLACS_tab, BLACS_worker
+from labscript_devices.Camera_blacs import CameraTab, CameraWorker
+
+@BLACS_tab
+class SimCamTab(CameraTab):
+    def initialise_workers(self):
+        worker_initialisation_kwargs = self.worker_initialisation_kwargs()
+        worker_initialisation_kwargs['device_name'] = self.device_name
+        self.create_worker("main_worker", SimCamWorker, worker_initialisation_kwargs)
+        self.primary_worker = "main_worker"
+        self.update_settings_and_check_connectivity()
+
+
+@BLACS_worker
+class SimCamWorker(CameraWorker):
+    def init(self):
+        CameraWorker.init(self)
+        global SimulatedCameraServer; from labscript_devices.simulated.camera_server import SimulatedCameraServer
+        self.server = None
+        
+    def update_settings_and_check_connectivity(self, host, use_zmq):
+        # Run the simulated camera server ourselves if it is meant to be on this machine:
+        local = host.strip() in ['localhost', '127.0.0.1']
+        if self.server is not None and (not local or self.server.use_zmq != use_zmq):
+            self.server.stop()
+            self.server = None
+        if local and self.server is None:
+            self.server = SimulatedCameraServer(self.port, self.device_name, use_zmq=use_zmq)
+            self.server.start()
+        return CameraWorker.update_settings_and_check_connectivity(self, host, use_zmq)
+        
+    def shutdown(self):
+        CameraWorker.shutdown(self)
+        if self.server is not None:
+            self.server.stop()
@@ -0,0 +1,39 @@
+#####################################################################
+#                                                                   #
+# /SmartCache.py                                                    #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Smart cache helpers for workers of pseudoclocks that program a table of
+instructions into a device's memory, and keep a copy of what they last
+programmed so they need only reprogram the instructions that have changed.
+These have no BLACS dependencies."""
+
+import numpy as np
+
+
+def changed_instructions(pulse_program, smart_cache):
+    """Returns the indices of the instructions in pulse_program that differ
+    from smart_cache, the array of instructions last programmed into the
+    device (or None if the device's memory is unknown)."""
+    if smart_cache is None:
+        return np.arange(len(pulse_program))
+    n_common = min(len(pulse_program), len(smart_cache))
+    changed = np.flatnonzero(pulse_program[:n_common] != smart_cache[:n_common])
+    return np.concatenate([changed, np.arange(n_common, len(pulse_program))])
+
+
+def updated_smart_cache(pulse_program, smart_cache):
+    """Returns the contents of the device's instruction memory after
+    pulse_program has been programmed over the top of smart_cache. Instructions
+    past the end of a shorter program are left as they were in the device."""
+    if smart_cache is None or len(pulse_program) >= len(smart_cache):
+        return pulse_program.copy()
+    smart_cache = smart_cache.copy()
+    smart_cache[:len(pulse_program)] = pulse_program
+    return smart_cache
@@ -0,0 +1,150 @@
+#####################################################################
+#                                                                   #
+# /TransitionTiming.py                                              #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Records how long BLACS workers take over each transition of a shot, and
+where the time goes, and saves it in the shot file, so that the device
+limiting the repetition rate can be found.
+
+Decorating a worker class with @timed_transitions times its
+transition_to_buffered, transition_to_manual, abort_buffered and
+abort_transition_to_buffered. Within them, parts of the work can be timed as
+named spans:
+
+    with self.timing.span('h5_read'):
+        ...
+
+Once the shot is over, the spans are written to the shot file as a table,
+/data/timing/<device name>/<worker class name>, since some devices have more
+than one worker. It has a row per span: the transition it was in, its name,
+and when it started, relative to the start of the transition, and how long
+it took, in seconds. Each transition's own duration is the span 'total'.
+
+When labscript_devices.Profiling is enabled, the same timings are recorded
+there too, named <worker class name>.<transition>[.<span>], so that they can
+be summarised over many shots."""
+
+import functools
+from contextlib import contextmanager
+
+import numpy as np
+
+from labscript_devices.Profiling import profiler, timer
+
+TRANSITIONS = ['transition_to_buffered', 'transition_to_manual', 'abort_buffered', 'abort_transition_to_buffered']
+
+# The transitions that end a shot, after which the timings are written:
+FINAL_TRANSITIONS = TRANSITIONS[1:]
+
+TIMING_GROUP = 'data/timing'
+
+TIMING_DTYPE = [('transition', 'a32'), ('span', 'a32'), ('start', float), ('duration', float)]
+
+
+class TransitionTiming(object):
+    """The spans timed during one shot by one worker"""
+    def __init__(self, worker_name):
+        self.worker_name = worker_name
+        self.device_name = None
+        self.h5file = None
+        # The transition in progress, and when it started:
+        self.transition = None
+        self.transition_start = None
+        # (transition, span, start, duration) of each span so far:
+        self.spans = []
+
+    def new_shot(self, device_name, h5file):
+        self.device_name = device_name
+        self.h5file = h5file
+        self.spans = []
+
+    def start(self, transition):
+        self.transition = transition
+        self.transition_start = timer()
+
+    def finish(self):
+        duration = timer() - self.transition_start
+        self.spans.append((self.transition, 'total', 0.0, duration))
+        if profiler.enabled:
+            profiler.record('%s.%s'%(self.worker_name, self.transition), duration)
+        self.transition = None
+
+    @contextmanager
+    def span(self, name):
+        """Times the enclosed code as a span of the transition in progress,
+        if any"""
+        start_time = timer()
+        try:
+            yield
+        finally:
+            if self.transition is not None:
+                duration = timer() - start_time
+                self.spans.append((self.transition, name, start_time - self.transition_start, duration))
+                if profiler.enabled:
+                    profiler.record('%s.%s.%s'%(self.worker_name, self.transition, name), duration)
+
+    def write(self, logger=None):
+        """Writes the spans so far into the shot file, replacing any from a
+        previous run of it"""
+        if self.h5file is None:
+            return
+        try:
+            import labscript_utils.h5_lock, h5py
+            with h5py.File(self.h5file, 'a') as hdf5_file:
+                group = hdf5_file.require_group('%s/%s'%(TIMING_GROUP, self.device_name))
+                if self.worker_name in group:
+                    del group[self.worker_name]
+                group.create_dataset(self.worker_name, data=np.array(self.spans, dtype=TIMING_DTYPE))
+        except Exception as e:
+            # Timing is never worth failing a shot over:
+            if logger is not None:
+                logger.warning('Could not write transition timings to %s: %s'%(self.h5file, str(e)))
+        self.h5file = None
+
+
+def timed_transition(transition, method):
+    @functools.wraps(method)
+    def timed_method(self, *args, **kwargs):
+        timing = self.timing
+        if timing.transition is not None:
+            # Called from within another transition, whose time this is part of:
+            return method(self, *args, **kwargs)
+        if transition == 'transition_to_buffered':
+            # The arguments are device_name, h5file, initial_values, fresh:
+            timing.new_shot(kwargs.get('device_name', args[0] if args else None),
+                            kwargs.get('h5file', args[1] if len(args) > 1 else None))
+        timing.start(transition)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            timing.finish()
+            if transition in FINAL_TRANSITIONS:
+                timing.write(getattr(self, 'logger', None))
+    timed_method.timed_transition = True
+    return timed_method
+
+
+def _get_timing(self):
+    try:
+        return self.__dict__['_transition_timing']
+    except KeyError:
+        timing = self.__dict__['_transition_timing'] = TransitionTiming(self.__class__.__name__)
+        return timing
+
+
+def timed_transitions(cls):
+    """Class decorator for BLACS workers, timing the transitions they define
+    and giving them a TransitionTiming as self.timing"""
+    for transition in TRANSITIONS:
+        method = cls.__dict__.get(transition)
+        if method is not None and not getattr(method, 'timed_transition', False):
+            setattr(cls, transition, timed_transition(transition, method))
+    cls.timing = property(_get_timing)
+    return cls
@@ -11,24 +11,46 @@
 #                                                                   #
 #####################################################################
 
-from labscript_devices import labscript_device, BLACS_tab, BLACS_worker
+from labscript_devices import labscript_device, alias_companion_classes
+from labscript_devices.Profiling import profile
 from labscript import StaticAnalogQuantity, Device, LabscriptError, set_passed_properties
 import numpy as np
 
+# The speed (steps/s) and acceleration (steps/s^2) of each model are
+# conservative estimates of the stages' default settings, used to estimate
+# how long moves will take. Set them on a stage if it has been configured
+# differently.
+
 class ZaberStageTLSR150D(StaticAnalogQuantity):
     minval=0
     maxval=76346
+    speed=10000
+    acceleration=50000
     description = 'Zaber Stage T-LSR150D'
     
 class ZaberStageTLSR300D(StaticAnalogQuantity):
     minval=0
     maxval=151937
+    speed=10000
+    acceleration=50000
     description = 'Zaber Stage T-LSR300D'
     
 class ZaberStageTLS28M(StaticAnalogQuantity):
     minval=0
     maxval=282879
+    speed=40000
+    acceleration=200000
     description = 'Zaber Stage T-LS28-M'
+    
+def move_duration(distance, speed, acceleration):
+    """How long in seconds a stage takes to move distance steps, accelerating
+    up to speed and decelerating to a stop again, or accelerating for half
+    the way and decelerating for the rest if the move is too short to reach
+    full speed"""
+    distance = abs(distance)
+    if distance*acceleration >= speed**2:
+        return float(distance)/speed + float(speed)/acceleration
+    return 2*np.sqrt(float(distance)/acceleration)
 
 @labscript_device
 class ZaberStageController(Device):
@@ -40,8 +62,10 @@ class ZaberStageController(Device):
         Device.__init__(self, name, None, None)
         self.BLACS_connection = com_port
         
+    @profile
     def generate_code(self, hdf5_file):
         data_dict = {}
+        move_parameters = []
         for stage in self.child_devices:
             # Call these functions to finalise the stage, they are standard functions of all subclasses of Output:
             ignore = stage.get_change_times()
@@ -55,151 +79,24 @@ class ZaberStageController(Device):
             if not connection > 0:
                 # error, invalid connection number
                 raise LabscriptError('%s %s has invalid connection number: %s'%(stage.description,stage.name,str(stage.connection)))
+            if str(stage.connection) in data_dict:
+                raise LabscriptError('%s %s has the same connection as another stage: %s'%(stage.description,stage.name,str(stage.connection)))
+            if not (stage.speed > 0 and stage.acceleration > 0):
+                raise LabscriptError('%s %s must have a positive speed and acceleration, not %s and %s'%(stage.description,stage.name,str(stage.speed),str(stage.acceleration)))
             data_dict[str(stage.connection)] = value
+            # The longest the move to this shot's position could take, which is
+            # from whichever end of the stage's travel is furthest away:
+            max_move_time = move_duration(max(value - stage.minval, stage.maxval - value), stage.speed, stage.acceleration)
+            move_parameters.append((str(stage.connection), stage.speed, stage.acceleration, stage.minval, stage.maxval, max_move_time))
         dtypes = [(conn, int) for conn in data_dict]
         data_array = np.zeros(1, dtype=dtypes)
         for conn in data_dict:
             data_array[0][conn] = data_dict[conn] 
         grp = hdf5_file.create_group('/devices/'+self.name)
         grp.create_dataset('static_values', data=data_array)
-        
-
-import time
-
-from blacs.tab_base_classes import Worker, define_state
-from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
-
-from blacs.device_base_class import DeviceTab
-
-@BLACS_tab
-class ZaberstageControllerTab(DeviceTab):
-    def initialise_GUI(self):
-        # Capabilities
-        self.base_units = 'steps'
-        self.base_min = 0
-        self.base_step = 100
-        self.base_decimals = 0
-        
-        self.device = self.settings['connection_table'].find_by_name(self.device_name)
-        self.num_stages = len(self.device.child_list)
-        
-        # Create the AO output objects
-        ao_prop = {}
-        for child_name in self.device.child_list:
-            stage_type = self.device.child_list[child_name].device_class
-            connection = self.device.child_list[child_name].parent_port
-            if stage_type == "ZaberStageTLSR150D":
-                base_max = 76346
-            elif stage_type == "ZaberStageTLSR300D":
-                base_max = 151937
-            else:
-                base_max = 282879
-            
-            ao_prop[connection] = {'base_unit':self.base_units,
-                                   'min':self.base_min,
-                                   'max':base_max,
-                                   'step':self.base_step,
-                                   'decimals':self.base_decimals
-                                  }
-                                
-        # Create the output objects    
-        self.create_analog_outputs(ao_prop)        
-        # Create widgets for output objects
-        dds_widgets,ao_widgets,do_widgets = self.auto_create_widgets()
-        # and auto place the widgets in the UI
-        self.auto_place_widgets(("Zaber Stages",ao_widgets))
-        
-        # Store the Measurement and Automation Explorer (MAX) name
-        self.com_port = str(self.settings['connection_table'].find_by_name(self.device_name).BLACS_connection)
-        
-        # Set the capabilities of this device
-        self.supports_remote_value_check(False)
-        self.supports_smart_programming(False) 
-    
-    def initialise_workers(self):
-        # Create and set the primary worker
-        self.create_worker("main_worker",ZaberWorker,{'com_port':self.com_port})
-        self.primary_worker = "main_worker"
+        move_dtypes = [('connection','a256'), ('speed',float), ('acceleration',float), ('minval',int), ('maxval',int), ('max_move_time',float)]
+        grp.create_dataset('move_parameters', data=np.array(move_parameters, dtype=move_dtypes))
 
-@BLACS_worker    
-class ZaberWorker(Worker):
-    def init(self):
-        # TODO: Make this configurable
-        self.response_timeout = 45 #seconds
 
-        global serial; import serial
-        global h5py; import labscript_utils.h5_lock, h5py
-        global zaberapi; import zaberapi
-        
-        self.connection = serial.Serial(port = self.com_port, timeout = 0.1)
-        response = True
-        while response is not None:
-            response = zaberapi.read(self.connection)
-            
-    def program_manual(self,values):
-        #print "***************programming static*******************"
-        #self.stages.move_absolute(settings)
-        for stage in values:
-            port = [int(s) for s in stage.split() if s.isdigit()][0]
-            zaberapi.move(self.connection,port,data=values[stage])
-        t0 = time.time()
-        ret = []
-        while len(ret)<len(values):
-            if time.time()-t0 > self.response_timeout:                
-                raise Exception('Not all stages responded within %d seconds'%self.response_timeout)
-            line = zaberapi.read(self.connection)
-            if line is not None:
-                ret.append(line)
-        
-        #TODO: return actual position of the zaber stage
-        return values
-    
-    # Apparently this is not used?
-    # def home_stage(self,stage):
-        # zaberapi.command(self.connection,stage,'home',0)
-        # t0 = time.time()
-        # ret = []
-        # while len(ret)<1:
-            # if time.time()-t0 > self.response_timeout:                
-                # raise Exception('Not all stages responded within %d seconds'%self.response_timeout)
-            
-            # line = zaberapi.read(self.connection)
-            # if line is not None:
-                # ret.append(line)
-    
-    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
-        return_data = {}
-        with h5py.File(h5file) as hdf5_file:
-            group = hdf5_file['/devices/'+device_name]
-            if 'static_values' in group:
-                data = group['static_values'][:][0]
-        
-        for stage in data.dtype.names:
-            return_data[stage] = data[stage]
-            port = [int(s) for s in stage.split() if s.isdigit()][0]
-            zaberapi.move(self.connection,port,data=data[stage])
-        t0 = time.time()
-        ret = []
-        while len(ret) < len(data):
-            if time.time()-t0 > self.response_timeout:                
-                raise Exception('Not all stages responded within %d seconds'%self.response_timeout)
-    
-            line = zaberapi.read(self.connection)
-            if line is not None:
-                ret.append(line)
-                        
-        return return_data
-    
-    def transition_to_manual(self):
-        return True
-    
-    def abort_buffered(self):
-        return True
-        
-    def abort_transition_to_buffered(self):
-        return True
-    
-    def shutdown(self):
-        self.connection.close()
-            
-    
+# The BLACS tab and worker have moved to ZaberStageController_blacs.py:
+alias_companion_classes(__name__, ['ZaberstageControllerTab', 'ZaberWorker'])
@@ -0,0 +1,250 @@
+#####################################################################
+#                                                                   #
+# /ZaberStageController_blacs.py                                    #
+#                                                                   #
+# Copyright 2013, Monash University                                 #
+#                                                                   #
+# This file is part of labscript_devices, in the labscript suite    #
+# (see http://labscriptsuite.org), and is licensed under the        #
+# Simplified BSD License. See the license.txt file in the root of   #
+# the project for the full license.                                 #
+#                                                                   #
+#####################################################################
+
+from labscript_devices import BLACS_tab, BLACS_worker
+from labscript_devices.TransitionTiming import timed_transitions
+from labscript_devices.ZaberStageController import (ZaberStageTLSR150D, ZaberStageTLSR300D, ZaberStageTLS28M,
+                                                     move_duration)
+
+import time
+
+from blacs.tab_base_classes import Worker, define_state
+from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
+
+from blacs.device_base_class import DeviceTab
+
+@BLACS_tab
+class ZaberstageControllerTab(DeviceTab):
+    def initialise_GUI(self):
+        # Capabilities
+        self.base_units = 'steps'
+        self.base_min = 0
+        self.base_step = 100
+        self.base_decimals = 0
+        
+        self.device = self.settings['connection_table'].find_by_name(self.device_name)
+        self.num_stages = len(self.device.child_list)
+        
+        # Create the AO output objects
+        ao_prop = {}
+        # Speed, acceleration and range of each stage, so the worker can tell how long moves should take:
+        self.move_parameters = {}
+        for child_name in self.device.child_list:
+            stage_type = self.device.child_list[child_name].device_class
+            connection = self.device.child_list[child_name].parent_port
+            stage_class = {'ZaberStageTLSR150D': ZaberStageTLSR150D,
+                           'ZaberStageTLSR300D': ZaberStageTLSR300D}.get(stage_type, ZaberStageTLS28M)
+            base_max = stage_class.maxval
+            self.move_parameters[connection] = {'speed': stage_class.speed, 'acceleration': stage_class.acceleration,
+                                                'minval': stage_class.minval, 'maxval': stage_class.maxval}
+            
+            ao_prop[connection] = {'base_unit':self.base_units,
+                                   'min':self.base_min,
+                                   'max':base_max,
+                                   'step':self.base_step,
+                                   'decimals':self.base_decimals
+                                  }
+                                
+        # Create the output objects    
+        self.create_analog_outputs(ao_prop)        
+        # Create widgets for output objects
+        dds_widgets,ao_widgets,do_widgets = self.auto_create_widgets()
+        # and auto place the widgets in the UI
+        self.auto_place_widgets(("Zaber Stages",ao_widgets))
+        
+        # Store the Measurement and Automation Explorer (MAX) name
+        self.com_port = str(self.settings['connection_table'].find_by_name(self.device_name).BLACS_connection)
+        
+        # Set the capabilities of this device
+        self.supports_remote_value_check(False)
+        self.supports_smart_programming(True)
+    
+    def initialise_workers(self):
+        # Create and set the primary worker
+        self.create_worker("main_worker",ZaberWorker,{'com_port':self.com_port, 'move_parameters':self.move_parameters})
+        self.primary_worker = "main_worker"
+
+@BLACS_worker    
+@timed_transitions
+class ZaberWorker(Worker):
+    # Command numbers in replies from the stages, in Zaber's binary protocol:
+    MOVE_ABSOLUTE = 20
+    ERROR = 255
+    # Set by the tab from the connection table:
+    move_parameters = {}
+    # We allow stages this many times as long as a move should take, plus
+    # this many seconds, before deciding something has gone wrong:
+    move_timeout_factor = 2
+    move_timeout_margin = 1.0
+    
+    def init(self):
+        # For stages we don't know the speed of:
+        self.response_timeout = 45 #seconds
+
+        global serial; import serial
+        global h5py; import labscript_utils.h5_lock, h5py
+        global zaberapi; import zaberapi
+        
+        # The position we last commanded each stage to move to, and the position
+        # it reported when it got there, keyed by device number. A stage is
+        # absent from confirmed_positions until it has finished its last move:
+        self.commanded_positions = {}
+        self.confirmed_positions = {}
+        
+        self.connection = serial.Serial(port = self.com_port, timeout = 0.1)
+        response = True
+        while response is not None:
+            response = zaberapi.read(self.connection)
+            
+    def handle_reply(self, reply, moving):
+        """Records the position reported by a stage that has finished moving.
+        Any other reply, such as one sent because a stage was moved by hand,
+        means we no longer know where that stage is."""
+        device_number, command_number, data = reply
+        if command_number == self.ERROR:
+            self.commanded_positions.pop(device_number, None)
+            raise Exception('Zaber stage %d reported error code %d'%(device_number, data))
+        if command_number == self.MOVE_ABSOLUTE and device_number in moving:
+            self.confirmed_positions[device_number] = data
+            del moving[device_number]
+        else:
+            self.commanded_positions.pop(device_number, None)
+            self.confirmed_positions.pop(device_number, None)
+            
+    def move_timeout(self, stage, port, value, max_move_time=None):
+        """How long to wait for a stage to move to value, based on how long
+        the move should take from where the stage is. If we don't know where
+        it is, we use max_move_time if given, otherwise the time the move
+        would take from the furthest it could be"""
+        parameters = self.move_parameters.get(stage)
+        if parameters is None:
+            return self.response_timeout
+        if port in self.confirmed_positions:
+            duration = move_duration(value - self.confirmed_positions[port], parameters['speed'], parameters['acceleration'])
+        elif max_move_time is not None:
+            duration = max_move_time
+        else:
+            duration = move_duration(max(value - parameters['minval'], parameters['maxval'] - value),
+                                     parameters['speed'], parameters['acceleration'])
+        return self.move_timeout_factor*duration + self.move_timeout_margin
+        
+    def start_moves(self, values, max_move_times={}):
+        """Starts moving each stage to its value in values, unless it is
+        already there. Returns the stages that are moving, by device number,
+        and how long to wait for each of them."""
+        moving = {}
+        timeouts = {}
+        # Deal with anything the stages have said since we last listened:
+        while self.connection.inWaiting():
+            reply = zaberapi.read(self.connection)
+            if reply is not None:
+                self.handle_reply(reply, moving)
+        for stage, value in values.items():
+            port = [int(s) for s in stage.split() if s.isdigit()][0]
+            if self.commanded_positions.get(port) == value and port in self.confirmed_positions:
+                continue
+            timeouts[port] = self.move_timeout(stage, port, value, max_move_times.get(stage))
+            self.commanded_positions[port] = value
+            self.confirmed_positions.pop(port, None)
+            zaberapi.move(self.connection,port,data=value)
+            moving[port] = stage
+        return moving, timeouts
+        
+    def wait_for_moves(self, moving, timeouts, t0):
+        """Waits for each stage in moving to report its position, raising an
+        exception if any has not done so within its timeout after t0"""
+        while moving:
+            late = [port for port in moving if time.time()-t0 > timeouts[port]]
+            if late:
+                for port in moving:
+                    self.commanded_positions.pop(port, None)
+                raise Exception('Stages did not finish moving in time: ' +
+                                ', '.join('%s within %.1f seconds'%(moving[port], timeouts[port]) for port in sorted(late)))
+            reply = zaberapi.read(self.connection)
+            if reply is not None:
+                self.handle_reply(reply, moving)
+            
+    def move_stages(self, values, max_move_times={}):
+        """Moves each stage to its value in values, unless it is already
+        there. All moves are made at once, and we wait for every stage that
+        moved to report its position. Returns the position of each stage."""
+        moving, timeouts = self.start_moves(values, max_move_times)
+        self.wait_for_moves(moving, timeouts, time.time())
+        positions = {}
+        for stage in values:
+            port = [int(s) for s in stage.split() if s.isdigit()][0]
+            if port not in self.confirmed_positions:
+                # It sent something other than the end of its move while we
+                # waited, having been moved by hand say. It will be moved
+                # again the next time it is programmed:
+                raise Exception('The position of Zaber stage %d (%s) is unknown, '%(port, stage) +
+                                'as it replied unexpectedly while the stages were moving. Program it again.')
+            positions[stage] = self.confirmed_positions[port]
+        return positions
+            
+    def program_manual(self,values):
+        return self.move_stages(values)
+    
+    # Apparently this is not used?
+    # def home_stage(self,stage):
+        # zaberapi.command(self.connection,stage,'home',0)
+        # t0 = time.time()
+        # ret = []
+        # while len(ret)<1:
+            # if time.time()-t0 > self.response_timeout:                
+                # raise Exception('Not all stages responded within %d seconds'%self.response_timeout)
+            
+            # line = zaberapi.read(self.connection)
+            # if line is not None:
+                # ret.append(line)
+    
+    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
+        values = {}
+        max_move_times = {}
+        with h5py.File(h5file,'r') as hdf5_file:
+            group = hdf5_file['/devices/'+device_name]
+            if 'static_values' in group:
+                data = group['static_values'][:][0]
+                for stage in data.dtype.names:
+                    values[stage] = data[stage]
+            if 'move_parameters' in group:
+                self.move_parameters = dict(self.move_parameters)
+                for row in group['move_parameters'][:]:
+                    self.move_parameters[row['connection']] = {'speed': row['speed'], 'acceleration': row['acceleration'],
+                                                               'minval': row['minval'], 'maxval': row['maxval']}
+                    # The longest the move could take, worked out when the shot was compiled:
+                    max_move_times[row['connection']] = row['max_move_time']
+        if fresh:
+            # Move every stage, whether or not we think it is already in place:
+            self.commanded_positions = {}
+            self.confirmed_positions = {}
+        # The shot must not start until every stage is where it should be. BLACS
+        # programs each device in its own worker process, so the other devices
+        # are being programmed while we wait:
+        return self.move_stages(values, max_move_times)
+    
+    def transition_to_manual(self):
+        return True
+        
+    def abort(self):
+        return True
+    
+    def abort_buffered(self):
+        return self.abort()
+        
+    def abort_transition_to_buffered(self):
+        return self.abort()
+    
+    def shutdown(self):
+        self.abort()
+        self.connection.close()
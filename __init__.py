@@ -1,5 +1,7 @@
 import os
 import sys
+import types
+import warnings
 import importlib
 
 __version__ = '2.0.2'
@@ -10,11 +12,60 @@ check_version('labscript_utils', '2.2', '3')
 check_version('labscript', '2.1', '3')
 check_version('blacs', '2.1', '3')
 
+from labscript_devices.manifest import Manifest
+
+# Which classes each module registers, told from their source without importing them:
+class_manifest = Manifest()
+
+# A device's BLACS tab and worker may be kept in a module of its own, named
+# after the device's module with this suffix, so that labscript and runviewer
+# don't have to import BLACS, or the device's drivers, to use the rest:
+COMPANION_SUFFIX = '_blacs'
+
+
+class _DeviceModule(types.ModuleType):
+    """A device module whose BLACS tab and worker have been moved to its
+    companion, but which can still be imported from it, see
+    alias_companion_classes()"""
+    def __init__(self, module, moved_names):
+        types.ModuleType.__init__(self, module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # Python 2 clears a module's globals when it is garbage collected, so
+        # the module whose code ran must be kept alive for its functions:
+        self.__dict__['_module'] = module
+        self.__dict__['_moved_names'] = frozenset(moved_names)
+
+    def __getattr__(self, name):
+        # Only called for names the module doesn't have:
+        if name not in self.__dict__['_moved_names']:
+            raise AttributeError("'module' object has no attribute '%s'"%name)
+        companion_name = self.__name__ + COMPANION_SUFFIX
+        warnings.warn('%s has moved from %s to %s, import it from there instead'%(name, self.__name__, companion_name),
+                      DeprecationWarning, stacklevel=2)
+        companion = importlib.import_module(companion_name)
+        value = getattr(companion, name)
+        self.__dict__[name] = value
+        return value
+
+
+def alias_companion_classes(module_name, names):
+    """Keeps the named classes, moved from a device module to its companion,
+    importable from the device module, for code written before they were
+    moved. The companion is only imported, with a DeprecationWarning, the
+    first time one of them is asked for, so importing the device module still
+    doesn't import BLACS. Call it at the end of the device module as
+    alias_companion_classes(__name__, [...])."""
+    sys.modules[module_name] = _DeviceModule(sys.modules[module_name], names)
+
 
 class ClassRegister(object):
     """A register for looking up classes by module name.  Provides a
      decorator and a method for looking up classes decorated with it,
-     importing as necessary."""
+     importing as necessary. Whether a module has such a class is answered
+     from the manifest where possible, so that only the modules whose
+     classes are actually needed are imported. Classes in a companion module
+     (see COMPANION_SUFFIX) are registered under the name of the module it
+     accompanies."""
     def __init__(self, instancename):
         self.registered_classes = {}
         # The name given to the instance in this namespace, so we can use it in error messages:
@@ -38,27 +89,65 @@ class ClassRegister(object):
                                    'executing a script from the command line, or if you are using an interactive session, ' +
                                    'writing your code in a separate module and importing it.')
 
+        if cls.labscript_device_class_name.endswith(COMPANION_SUFFIX):
+            cls.labscript_device_class_name = cls.labscript_device_class_name[:-len(COMPANION_SUFFIX)]
+
         # Add it to the register:
         self.registered_classes[cls.labscript_device_class_name] = cls
         return cls
 
-    def __getitem__(self, name):
+    def _modules_to_import(self, name):
+        """The modules that may have the class for the named module, out of it
+        and its companion, going by the manifest"""
+        modules = []
+        for module_name in [name, name + COMPANION_SUFFIX]:
+            classes = class_manifest.registered_classes(module_name)
+            if classes is None:
+                # No source to tell from. The companion most likely doesn't exist:
+                if module_name == name:
+                    modules.append(module_name)
+            elif self.instancename in classes:
+                modules.append(module_name)
+        return modules
+
+    def __contains__(self, name):
+        """Whether the module of that name, or its companion, has a class
+        decorated with this register, without importing them unless their
+        source isn't available"""
+        if name in self.registered_classes:
+            return True
+        if class_manifest.registered_classes(name) is not None:
+            return bool(self._modules_to_import(name))
         try:
-            # Ensure the module's code has run (this does not re-import it if it is already in sys.modules)
-            importlib.import_module('.' + name, __name__)
-            print 'imported', name, 'ok!'
-        except ImportError:
-            sys.stderr.write('Error importing module %s.%s whilst looking for classes for device %s. '%(__name__, name, name) +
-                             'Check that the module exists, is named correctly, and can be imported with no errors. ' +
-                             'Full traceback follows:\n')
-            raise
-        # Class definitions in that module have executed now, check to see if class is in our register:
+            self[name]
+        except ValueError:
+            return False
+        return True
+
+    def __getitem__(self, name):
+        # Already imported:
         try:
             return self.registered_classes[name]
         except KeyError:
-            # No? No such class is defined then, or maybe the user forgot to decorate it.
-            raise ValueError('No class decorated as a %s found in module %s, '%(self.instancename, __name__ + '.' + name) +
-                             'Did you forget to decorate the class definition with @%s?'%(self.instancename))
+            pass
+        # Only the modules whose source has such a class, no need to import the others to find out:
+        for module_name in self._modules_to_import(name):
+            try:
+                # Ensure the module's code has run (this does not re-import it if it is already in sys.modules)
+                importlib.import_module('.' + module_name, __name__)
+            except ImportError:
+                sys.stderr.write('Error importing module %s.%s whilst looking for classes for device %s. '%(__name__, module_name, name) +
+                                 'Check that the module exists, is named correctly, and can be imported with no errors. ' +
+                                 'Full traceback follows:\n')
+                raise
+            # Class definitions in that module have executed now, check to see if class is in our register:
+            try:
+                return self.registered_classes[name]
+            except KeyError:
+                pass
+        # No? No such class is defined then, or maybe the user forgot to decorate it.
+        raise ValueError('No class decorated as a %s found in module %s, '%(self.instancename, __name__ + '.' + name) +
+                         'Did you forget to decorate the class definition with @%s?'%(self.instancename))
 
 class SameNameClassRegister(ClassRegister):
     """Subclass of ClassRegister that also checks that the
@@ -0,0 +1,17 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/__init__.py                                           #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Benchmarks of labscript_devices' programming paths, run against the
+simulated hardware in labscript_devices.simulated. Each module can be run
+as a script, for example:
+
+    python -m labscript_devices.benchmarks.pineblaster_upload
+"""
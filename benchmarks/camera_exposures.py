@@ -0,0 +1,94 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/camera_exposures.py                                   #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Times Camera.expose() and Camera.do_checks() for a kinetic series of many
+frames on several cameras sharing a trigger, and compares them with the
+previous checks, which scanned every earlier exposure."""
+
+import sys
+import time
+
+from labscript_devices.Camera import Camera
+
+
+class TriggerDevice(object):
+    """Stands in for the labscript trigger device the cameras are attached to"""
+    def __init__(self):
+        self.child_devices = []
+        self.triggers = []
+
+    def trigger(self, t, duration):
+        self.triggers.append((t, duration))
+
+
+def make_cameras(n_cameras):
+    trigger_device = TriggerDevice()
+    for i in range(n_cameras):
+        # Skip labscript's device machinery, which isn't what we're timing:
+        camera = Camera.__new__(Camera)
+        camera.name = 'camera%d'%i
+        camera.exposure_time = 1e-3
+        camera.minimum_recovery_time = 1e-4
+        camera.exposures = []
+        camera.trigger_device = trigger_device
+        trigger_device.child_devices.append(camera)
+    return trigger_device.child_devices
+
+
+def expose_by_scanning(camera, name, t, frametype, duration):
+    """The checks Camera.expose() used to do"""
+    already_requested = False
+    for other_camera in camera.trigger_device.child_devices:
+        if other_camera is not camera:
+            for _, other_t, _, other_duration in other_camera.exposures:
+                if t == other_t and duration == other_duration:
+                    already_requested = True
+    if not already_requested:
+        camera.trigger_device.trigger(t, duration)
+    for _, other_t, _, other_duration in camera.exposures:
+        if abs(other_t - (t + duration)) < camera.minimum_recovery_time or abs(other_t + other_duration - t) < camera.minimum_recovery_time:
+            raise ValueError('exposures too close together')
+    camera.exposures.append((name, t, frametype, duration))
+
+
+def do_checks_by_scanning(camera):
+    for other_camera in camera.trigger_device.child_devices:
+        if other_camera is not camera:
+            for exposure in camera.exposures:
+                assert exposure in other_camera.exposures
+
+
+def time_series(expose, do_checks, n_exposures, n_cameras):
+    cameras = make_cameras(n_cameras)
+    start_time = time.time()
+    for i in range(n_exposures):
+        for camera in cameras:
+            expose(camera, 'frame', 2e-3*i, 'atoms', 1e-3)
+    expose_time = time.time() - start_time
+    start_time = time.time()
+    for camera in cameras:
+        do_checks(camera)
+    check_time = time.time() - start_time
+    assert len(cameras[0].trigger_device.triggers) == n_exposures
+    return expose_time, check_time
+
+
+def main(n_exposures=10000, n_cameras=2, n_exposures_scanning=2000):
+    print 'Camera exposure checks, %d cameras sharing a trigger'%n_cameras
+    for name, expose, do_checks, n in [('indexed', Camera.expose, Camera.do_checks, n_exposures),
+                                       ('scanning', expose_by_scanning, do_checks_by_scanning, n_exposures_scanning)]:
+        expose_time, check_time = time_series(expose, do_checks, n, n_cameras)
+        print '    %-8s %6d exposures: expose %8.3f s (%6.1f us each), do_checks %8.3f s'%(name, n, expose_time,
+                                                                                       1e6*expose_time/(n*n_cameras), check_time)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
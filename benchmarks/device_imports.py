@@ -0,0 +1,95 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/device_imports.py                                     #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Times importing each device module, as labscript and runviewer do, and
+then its BLACS companion, as BLACS does, each in a fresh interpreter, and
+reports whether importing the device module imported blacs. The median of
+n_repeats runs is reported, excluding the time taken to import
+labscript_devices itself."""
+
+import sys
+import json
+import subprocess
+
+from labscript_devices import COMPANION_SUFFIX
+from labscript_devices.manifest import generate_manifest
+
+# Run in each fresh interpreter: imports the given modules in turn, printing how long each took:
+IMPORT_SCRIPT = """
+import sys, json, time
+import labscript_devices
+%s
+from labscript_devices.benchmarks.device_imports import peak_memory
+times = []
+for module_name in sys.argv[1:]:
+    start_time = time.time()
+    __import__(module_name)
+    times.append(time.time() - start_time)
+blacs_imported = any(name == 'blacs' or name.startswith('blacs.') for name in sys.modules)
+print(json.dumps({'times': times, 'blacs_imported': blacs_imported, 'peak_memory': peak_memory()}))
+"""
+
+
+def peak_memory():
+    """The most memory this process has used so far, in MB, or None where
+    that can't be told"""
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on OS X, kB elsewhere:
+    return peak/1024.0**(2 if sys.platform == 'darwin' else 1)
+
+
+def time_imports(module_names, env=None, setup=''):
+    """Imports the modules in a fresh interpreter, after running the code in
+    setup, returning how long each took, whether blacs was imported and the
+    interpreter's peak memory use, or None if any failed to import"""
+    process = subprocess.Popen([sys.executable, '-c', IMPORT_SCRIPT%setup] + module_names,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        return None
+    return json.loads(stdout.splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values)//2]
+
+
+def main(n_repeats=5):
+    manifest = generate_manifest()
+    devices = sorted(name for name in manifest if name + COMPANION_SUFFIX in manifest)
+    print '%-30s %12s %12s %15s'%('device module', 'device (ms)', 'BLACS (ms)', 'imports blacs')
+    for name in devices:
+        results = [time_imports(['labscript_devices.' + name, 'labscript_devices.' + name + COMPANION_SUFFIX])
+                   for _ in range(n_repeats)]
+        if None in results:
+            # Try the device module on its own, its companion's dependencies may be missing:
+            results = [time_imports(['labscript_devices.' + name]) for _ in range(n_repeats)]
+        if None in results:
+            print '%-30s %12s'%(name, 'failed')
+            continue
+        device_time = median(result['times'][0] for result in results)
+        if len(results[0]['times']) > 1:
+            blacs_time = '%12.1f'%(1e3*median(result['times'][1] for result in results))
+        else:
+            blacs_time = '%12s'%'failed'
+        # Whether the device module imported blacs, in the runs where only it was imported:
+        blacs_imported = time_imports(['labscript_devices.' + name])['blacs_imported']
+        print '%-30s %12.1f %s %15s'%(name, 1e3*device_time, blacs_time, blacs_imported)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
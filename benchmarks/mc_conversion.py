@@ -0,0 +1,101 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/mc_conversion.py                                      #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Converts a shot's worth of analog output values, n_steps steps of 16
+channels, from volts to counts and back, one UniversalLibrary call per value
+as the MCUSB3114Worker used to, and with a Calibration. Asserts the results
+are identical, on random values and on those most likely to be rounded
+differently: exactly on, and just either side of, the steps between counts,
+and out of range. Also asserts that every count converts to the same volts
+as UL, and those volts, the values either side of them and those halfway
+between them back to the same counts. Uses the stand-in UniversalLibrary in
+labscript_devices.simulated.universallibrary."""
+
+import sys
+import time
+
+import numpy as np
+
+from labscript_devices.MCCalibration import Calibration, N_COUNTS
+from labscript_devices.simulated import universallibrary as UL
+
+
+def test_values(calibration, n_steps):
+    """Values in volts most likely to be converted differently, as well as random ones"""
+    low, high = UL.RANGES[calibration.Range]
+    counts = np.random.randint(0, N_COUNTS, n_steps)
+    steps = calibration.toVolts(counts)
+    return np.concatenate([np.random.uniform(low, high, 16*n_steps),
+                           steps, np.nextafter(steps, -np.inf), np.nextafter(steps, np.inf),
+                           steps + 0.5*calibration.lsb, np.nextafter(steps + 0.5*calibration.lsb, -np.inf),
+                           np.linspace(low, high, 101), [low - 1, high + 1, -np.inf, np.inf, np.nan]])
+
+
+def assert_identical(values, ul_results, results, function):
+    mismatched = np.flatnonzero(ul_results != results)
+    assert not len(mismatched), '%s(%r) is %r, UL says %r (%d mismatches)'%(
+        function, values[mismatched[0]], results[mismatched[0]], ul_results[mismatched[0]], len(mismatched))
+
+
+def check_every_count(calibration):
+    """Asserts that every count, and the volts either side of and halfway
+    between every count, convert the same way as with UL"""
+    Range = calibration.Range
+    counts = np.arange(N_COUNTS)
+    ul_volts = np.array([UL.cbToEngUnits(0, Range, count, 0.0) for count in counts])
+    assert_identical(counts, ul_volts, calibration.toVolts(counts), 'toVolts')
+    halfway = ul_volts + 0.5*calibration.lsb
+    values = np.concatenate([ul_volts, np.nextafter(ul_volts, -np.inf), np.nextafter(ul_volts, np.inf),
+                             halfway, np.nextafter(halfway, -np.inf), np.nextafter(halfway, np.inf)])
+    ul_counts = np.array([UL.cbFromEngUnits(0, Range, value, 0) for value in values])
+    assert_identical(values, ul_counts, calibration.fromVolts(values), 'fromVolts')
+
+
+def main(n_steps=1000):
+    for Range in sorted(UL.RANGES):
+        start_time = time.time()
+        calibration = Calibration(UL, 0, Range)
+        calibration_time = time.time() - start_time
+        n_calibration_calls = calibration.n_ul_calls
+        values = test_values(calibration, n_steps)
+
+        start_time = time.time()
+        ul_counts = np.array([UL.cbFromEngUnits(0, Range, value, 0) for value in values])
+        ul_from_time = time.time() - start_time
+        calibration.n_ul_calls = 0
+        start_time = time.time()
+        counts = calibration.fromVolts(values)
+        from_time = time.time() - start_time
+        n_from_calls = calibration.n_ul_calls
+        assert_identical(values, ul_counts, counts, 'fromVolts')
+
+        start_time = time.time()
+        ul_volts = np.array([UL.cbToEngUnits(0, Range, count, 0.0) for count in ul_counts])
+        ul_to_time = time.time() - start_time
+        start_time = time.time()
+        volts = calibration.toVolts(ul_counts)
+        to_time = time.time() - start_time
+        assert_identical(ul_counts, ul_volts, volts, 'toVolts')
+
+        check_every_count(Calibration(UL, 0, Range))
+
+        print 'Range %d (%g to %g V), rounding %s, %s, calibrated in %.1f ms (%d UL calls)'%((Range,) +
+              UL.RANGES[Range] + (calibration.rounding, 'linear' if calibration.linear else 'not linear',
+              1e3*calibration_time, n_calibration_calls))
+        print '    fromVolts of %d values: UL %.1f ms, calibrated %.1f ms (%d UL calls)'%(
+              len(values), 1e3*ul_from_time, 1e3*from_time, n_from_calls)
+        print '    toVolts of %d values:   UL %.1f ms, calibrated %.1f ms (%s)'%(
+              len(values), 1e3*ul_to_time, 1e3*to_time, 'linear table' if calibration.linear_volts else 'table filled as it goes')
+        print '    every count identical both ways'
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
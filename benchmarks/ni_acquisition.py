@@ -0,0 +1,241 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/ni_acquisition.py                                     #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Runs shots through the NI PCIe-6363 workers against the simulated PyDAQmx:
+buffered analog and digital output, buffered acquisition, and wait
+monitoring. For each, reports how long the transitions took. For
+acquisition, also how many samples per second the worker read, and whether
+the traces saved match what was on the inputs. For wait monitoring, how long
+after the last wait's resume edge the worker saw that the waits were over,
+and whether it measured the waits' durations correctly.
+
+Like the startup benchmarks this needs labscript_utils, blacs and zprocess,
+or the stand-ins for them on the PYTHONPATH:
+
+    PYTHONPATH=labscript_devices/benchmarks/stubs/suite python -m labscript_devices.benchmarks.ni_acquisition"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+from labscript_devices.simulated import PyDAQmx
+from labscript_devices.benchmarks.startup import make_worker, write_device_group
+
+DEVICE_NAME = 'ni_card'
+CLOCK_TERMINAL = '/ni_card/PFI0'
+OUTPUT_RATE = 1e6
+NUM = {'AO': 4, 'DO': 32, 'PFI': 16}
+
+ACQUISITIONS_DTYPE = [('connection', 'a256'), ('label', 'a256'), ('start', float), ('stop', float),
+                      ('wait label', 'a256'), ('scale factor', float), ('units', 'a256')]
+WAITS_DTYPE = [('label', 'a256'), ('time', float), ('timeout', float)]
+
+# How long after the start of the experiment each shot's waits are, how
+# long they last, and the width of the pulses resuming from them:
+WAIT_INTERVAL = 0.05
+WAIT_DURATION = 0.02
+WAIT_TIMEOUT = 1
+PULSE_WIDTH = 1e-3
+
+
+class EventRecorder(object):
+    """Stands in for a zprocess event, recording when it is posted"""
+    def __init__(self):
+        self.posted = threading.Event()
+        self.posted_at = None
+
+    def post(self, id, data=None):
+        self.posted_at = time.time()
+        self.posted.set()
+
+
+class RecordCounter(logging.Handler):
+    """Counts the error records logged, rather than printing them"""
+    def __init__(self):
+        logging.Handler.__init__(self, logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def write_shot(shot_file, datasets, attributes, waits=None):
+    import h5py
+    with h5py.File(shot_file, 'w') as hdf5_file:
+        hdf5_file.create_group('data')
+        if waits is not None:
+            dataset = hdf5_file.create_dataset('waits', data=waits)
+            for name in ['acquisition_device', 'timeout_device']:
+                dataset.attrs['wait_monitor_%s'%name] = DEVICE_NAME
+            dataset.attrs['wait_monitor_acquisition_connection'] = 'ctr0'
+            dataset.attrs['wait_monitor_timeout_connection'] = 'port1/line0'
+    attributes = dict(attributes, clock_terminal=CLOCK_TERMINAL)
+    write_device_group(shot_file, DEVICE_NAME, datasets, attributes)
+
+
+def time_call(function, *args):
+    start_time = time.time()
+    result = function(*args)
+    return result, time.time() - start_time
+
+
+def run_outputs(shot_file, n_samples):
+    """A shot of n_samples of analog and digital output at OUTPUT_RATE"""
+    from labscript_devices.NI_PCIe_6363_blacs import NiPCIe6363Worker
+    rng = np.random.RandomState(0)
+    write_shot(shot_file, {'ANALOG_OUTS': rng.uniform(-10, 10, (n_samples + 1, NUM['AO'])).astype(np.float32),
+                           'DIGITAL_OUTS': rng.randint(0, 2**NUM['DO'], n_samples).astype(np.uint32)},
+               {'analog_out_channels': ', '.join('%s/ao%d'%(DEVICE_NAME, i) for i in range(NUM['AO'])),
+                'digital_lines': '%s/port0/line0:%d'%(DEVICE_NAME, NUM['DO'] - 1)})
+    values = dict([('ao%d'%i, 0.0) for i in range(NUM['AO'])] + [('port0/line%d'%i, 0) for i in range(NUM['DO'])] +
+                  [('PFI %d'%i, 0) for i in range(NUM['PFI'])])
+    worker = make_worker(NiPCIe6363Worker, MAX_name=DEVICE_NAME, limits=[-10, 10], num=NUM)
+    worker.init()
+    worker.program_manual(values)
+    _, buffered_time = time_call(worker.transition_to_buffered, DEVICE_NAME, shot_file, values, True)
+    PyDAQmx.send_trigger()
+    time.sleep(n_samples/OUTPUT_RATE)
+    _, manual_time = time_call(worker.transition_to_manual)
+    worker.shutdown()
+    return buffered_time, manual_time
+
+
+def check_traces(shot_file, channels, rate, ai_start_delay):
+    """Whether the traces saved are what was on the inputs"""
+    import h5py
+    with h5py.File(shot_file, 'r') as hdf5_file:
+        for channel in channels:
+            trace = hdf5_file['data/traces/%s'%channel.split('/')[-1]][:]
+            samples = np.round((trace['t'] - ai_start_delay)*rate)
+            expected = PyDAQmx.analog_input(channel, samples/rate).astype(np.float32)
+            if not len(trace) or not np.allclose(trace['values'], expected, atol=1e-6):
+                return False
+    return True
+
+
+def run_acquisition(shot_file, rate, n_channels, duration, stall=0):
+    """A shot of acquiring n_channels at rate for duration. If stall, the
+    worker's reading is held up for that long halfway through, as by
+    another thread holding its lock. Traces are saved of the first 40% of
+    the shot, before any stall. The errors the worker's acquisition thread
+logs, as it retries reading after an overflow, are counted rather than
+printed."""
+    from labscript_devices.NI_PCIe_6363_blacs import NiPCIe6363AcquisitionWorker
+    channels = ['%s/ai%d'%(DEVICE_NAME, i) for i in range(n_channels)]
+    acquisitions = np.array([(channel.split('/')[-1], channel.split('/')[-1], 0, 0.4*duration, '', 1, 'V')
+                             for channel in channels], dtype=ACQUISITIONS_DTYPE)
+    write_shot(shot_file, {'ACQUISITIONS': acquisitions},
+               {'analog_in_channels': ', '.join(channels), 'acquisition_rate': float(rate)})
+    worker = make_worker(NiPCIe6363AcquisitionWorker, device_name=DEVICE_NAME, worker_name='acquisition',
+                         MAX_name=DEVICE_NAME)
+    read_errors = RecordCounter()
+    read_logger = logging.getLogger('BLACS.%s_acquisition.acquisition.daqmxread'%DEVICE_NAME)
+    read_logger.addHandler(read_errors)
+    read_logger.propagate = False
+    worker.init()
+    _, buffered_time = time_call(worker.transition_to_buffered, DEVICE_NAME, shot_file, {}, True)
+    PyDAQmx.send_trigger()
+    start_time = time.time()
+    if stall:
+        time.sleep(duration/2)
+        with worker.daqlock:
+            time.sleep(stall)
+        time.sleep(duration/2)
+    else:
+        time.sleep(duration)
+    task = worker.task
+    _, manual_time = time_call(worker.transition_to_manual)
+    n_read = task.n_read*n_channels
+    throughput = n_read/(time.time() - start_time)
+    worker.shutdown()
+    read_logger.removeHandler(read_errors)
+    read_logger.propagate = True
+    return buffered_time, manual_time, n_read, throughput, read_errors.count, check_traces(
+        shot_file, channels, rate, worker.ai_start_delay)
+
+
+def run_wait_monitor(shot_file, n_waits):
+    """A shot with n_waits waits, each resumed before it times out"""
+    import h5py
+    from labscript_devices.NI_PCIe_6363_blacs import NiPCIe6363WaitMonitorWorker
+    waits = np.zeros(n_waits, dtype=WAITS_DTYPE)
+    waits['label'] = ['wait%d'%i for i in range(n_waits)]
+    waits['time'] = WAIT_INTERVAL*(1 + np.arange(n_waits))
+    waits['timeout'] = WAIT_TIMEOUT
+    write_shot(shot_file, {}, {}, waits)
+    # The wait monitor's input goes high at the start of the experiment and
+    # after each wait, for PULSE_WIDTH:
+    resume_times = np.concatenate([[0], waits['time'] + WAIT_DURATION*(1 + np.arange(n_waits))])
+    edges = np.column_stack([resume_times, resume_times + PULSE_WIDTH]).ravel()
+    PyDAQmx.counter_edges['%s/ctr0'%DEVICE_NAME] = edges
+
+    worker = make_worker(NiPCIe6363WaitMonitorWorker, device_name=DEVICE_NAME, worker_name='wait_monitor',
+                         MAX_name=DEVICE_NAME, kill_lock=threading.Lock())
+    worker.init()
+    worker.all_waits_finished = EventRecorder()
+    _, buffered_time = time_call(worker.transition_to_buffered, DEVICE_NAME, shot_file, {}, True)
+    PyDAQmx.send_trigger()
+    if not worker.all_waits_finished.posted.wait(edges[-1] + WAIT_TIMEOUT):
+        raise RuntimeError('The wait monitor did not see the waits finish')
+    latency = worker.all_waits_finished.posted_at - PyDAQmx.triggered_at - edges[-1]
+    _, manual_time = time_call(worker.transition_to_manual)
+    with h5py.File(shot_file, 'r') as hdf5_file:
+        durations = hdf5_file['data/waits']['duration']
+    error = abs(durations - WAIT_DURATION).max()
+    return buffered_time, manual_time, latency, error
+
+
+def main(rate=100000, n_channels=4, duration_ms=500, n_waits=4):
+    # The workers' warnings and errors go to stderr, as in BLACS's console:
+    logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
+    PyDAQmx.install()
+    duration = duration_ms*1e-3
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print 'NI PCIe-6363 workers, %g us per PyDAQmx call'%(1e6*PyDAQmx.call_time)
+        header = '%-48s %16s %14s'%('', 'to buffered (ms)', 'to manual (ms)')
+
+        print
+        print header
+        PyDAQmx.reset_simulation()
+        n_samples = int(duration*OUTPUT_RATE)
+        buffered_time, manual_time = run_outputs(os.path.join(temp_dir, 'outputs.h5'), n_samples)
+        print '%-48s %16.1f %14.1f'%('outputs, %d samples'%n_samples, 1e3*buffered_time, 1e3*manual_time)
+
+        print
+        print header + ' %14s %14s %12s %8s'%('samples', 'samples/s', 'read errors', 'correct')
+        buffer_time = 100000/float(rate)
+        for name, stall in [('acquisition', 0), ('acquisition, stalled %d ms'%(1.5e3*buffer_time), 1.5*buffer_time)]:
+            PyDAQmx.reset_simulation()
+            buffered_time, manual_time, n_read, throughput, n_errors, correct = run_acquisition(
+                os.path.join(temp_dir, 'acquisition.h5'), rate, n_channels, max(duration, 2*stall), stall)
+            print '%-48s %16.1f %14.1f %14d %14.3g %12d %8s'%('%s, %d x %g Hz'%(name, n_channels, rate),
+                                                              1e3*buffered_time, 1e3*manual_time, n_read, throughput,
+                                                              n_errors, correct)
+
+        print
+        print header + ' %14s %14s'%('latency (ms)', 'error (us)')
+        PyDAQmx.reset_simulation()
+        buffered_time, manual_time, latency, error = run_wait_monitor(os.path.join(temp_dir, 'waits.h5'), n_waits)
+        print '%-48s %16.1f %14.1f %14.1f %14.3g'%('wait monitor, %d waits'%n_waits, 1e3*buffered_time,
+                                                   1e3*manual_time, 1e3*latency, 1e6*error)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,68 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/pineblaster_reconnect.py                              #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Measures how long the PineblasterWorker's abort takes to get the device
+back, for a range of simulated boot times. The abort previously always took
+at least 10 seconds.
+
+The simulated device carries on answering for reset_time after being told
+to restart, so probing it straight away is answered before it has gone down.
+This is shown for comparison, and after each abort the device is checked to
+be listening, as it would not be if abort had returned on such an answer."""
+
+import sys
+import time
+import functools
+
+try:
+    import serial
+except ImportError:
+    # Nothing real is connected, so the stand-in for pyserial will do:
+    from labscript_devices.benchmarks.startup import DRIVER_STUBS_DIR
+    sys.path.append(DRIVER_STUBS_DIR)
+    import serial
+
+from labscript_devices.PineBlasterSerial import wait_for_boot
+from labscript_devices.PineBlaster_blacs import PineblasterWorker
+from labscript_devices.simulated.pineblaster import SimulatedPineBlaster
+from labscript_devices.benchmarks.startup import make_worker
+
+
+def connected_worker(boot_time, reset_time):
+    serial.Serial = functools.partial(SimulatedPineBlaster, boot_time=boot_time, reset_time=reset_time)
+    worker = make_worker(PineblasterWorker, usbport='COM1', max_boot_time=10)
+    worker.init()
+    return worker
+
+
+def main(reset_time=0.05, boot_times=(0.2, 0.5, 1.0, 2.0, 4.0)):
+    print 'PineBlaster restart and reconnect, %.3f s to reset'%reset_time
+    for boot_time in boot_times:
+        worker = connected_worker(boot_time, reset_time)
+        # Probing the open port straight after telling the device to restart:
+        start_time = time.time()
+        worker.pineblaster.write('restart\r\n')
+        early_answer = wait_for_boot(worker.pineblaster)
+        worker.shutdown()
+
+        worker = connected_worker(boot_time, reset_time)
+        start_time = time.time()
+        worker.abort()
+        abort_time = time.time() - start_time
+        # Raises if the device isn't listening:
+        worker.program_manual({'internal': 1})
+        worker.shutdown()
+        print '    boot time %.1f s: probe answered after %.3f s, abort took %.3f s, boot measured %.3f s'%(
+            boot_time, early_answer, abort_time, worker.boot_times[-1])
+
+
+if __name__ == '__main__':
+    main()
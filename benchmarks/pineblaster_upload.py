@@ -0,0 +1,71 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/pineblaster_upload.py                                 #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Compares uploading a PineBlaster program one acknowledged 'set' at a time
+with the pipelined upload used by the PineblasterWorker, both for a fresh
+upload and for a smart-cached upload in which a few instructions changed."""
+
+import sys
+import time
+
+import numpy as np
+
+from labscript_devices.PineBlasterSerial import upload_instructions
+from labscript_devices.SmartCache import changed_instructions, updated_smart_cache
+from labscript_devices.simulated.pineblaster import SimulatedPineBlaster
+
+
+def make_program(n_instructions, seed=0):
+    rng = np.random.RandomState(seed)
+    pulse_program = np.zeros(n_instructions, dtype=[('period', int), ('reps', int)])
+    pulse_program['period'] = rng.randint(4, 40000, n_instructions)
+    pulse_program['reps'] = rng.randint(1, 1000, n_instructions)
+    # Stop instruction:
+    pulse_program[-1] = (0, 0)
+    return pulse_program
+
+
+def upload_one_at_a_time(connection, pulse_program, indices):
+    for i in indices:
+        connection.write('set %d %d %d\r\n'%(i, pulse_program[i]['period'], pulse_program[i]['reps']))
+        response = connection.readline()
+        assert response == 'ok\r\n', 'PineBlaster said \'%s\', expected \'ok\''%repr(response)
+
+
+def time_upload(upload, connection, pulse_program, smart_cache):
+    indices = changed_instructions(pulse_program, smart_cache)
+    start_time = time.time()
+    upload(connection, pulse_program, indices)
+    return len(indices), time.time() - start_time
+
+
+def main(n_instructions=2000, n_changed=10):
+    pulse_program = make_program(n_instructions)
+    # The next shot of a scan, with a handful of delays changed:
+    next_program = pulse_program.copy()
+    rng = np.random.RandomState(1)
+    changed = rng.choice(n_instructions - 1, n_changed, replace=False)
+    next_program['period'][changed] += 1
+
+    print 'PineBlaster upload of %d instructions (%d changed between shots)'%(n_instructions, n_changed)
+    for name, upload in [('one at a time', upload_one_at_a_time), ('pipelined', upload_instructions)]:
+        connection = SimulatedPineBlaster()
+        n_fresh, fresh_time = time_upload(upload, connection, pulse_program, None)
+        smart_cache = updated_smart_cache(pulse_program, None)
+        n_smart, smart_time = time_upload(upload, connection, next_program, smart_cache)
+        assert (connection.instructions[:n_instructions] == next_program).all()
+        assert not connection.n_dropped
+        print '    %-14s fresh: %8.1f ms (%d set)    smart: %8.1f ms (%d set)'%(name, 1e3*fresh_time, n_fresh,
+                                                                             1e3*smart_time, n_smart)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,156 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/pulseblaster_programming.py                           #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Runs shots through the PulseblasterWorker and PulseblasterNoDDSWorker
+against the simulated spinapi: a fresh shot, a smart-programmed repeat of
+it, and a smart-programmed shot with n_changed delays changed, as in a scan.
+For each, reports how long transition_to_buffered took, how many calls it
+made into spinapi and how many instructions it wrote, and how long the shot
+then ran before the board was waiting again. The program written to the
+board is checked against the shot file's after each shot.
+
+Each worker is run against the simulated spinapi as it is, with bulk upload
+and addressable instructions, then without addressable instructions, and
+then without either, as the real spinapi is.
+
+Like the startup benchmarks this needs labscript_utils, blacs and zprocess,
+or the stand-ins for them on the PYTHONPATH:
+
+    PYTHONPATH=labscript_devices/benchmarks/stubs/suite python -m labscript_devices.benchmarks.pulseblaster_programming"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from labscript_devices.simulated import spinapi
+from labscript_devices.benchmarks.startup import (N_FLAGS, make_worker, write_device_group, pulseblaster_program,
+                                                  pulseblaster_initial_values)
+
+INSTRUCTION_FIELDS = ['flags', 'inst', 'inst_data', 'length']
+# The spinapi functions to go without in each run, see the module docstring:
+VARIANTS = [('bulk, addressable', []),
+            ('bulk, in order', ['pb_set_program_address']),
+            ('per row, in order', ['pb_set_program_address', 'pb_inst_dds2_array', 'pb_inst_pbonly_array'])]
+
+DDS_FIELDS = ['freq0', 'phase0', 'amp0', 'dds_en0', 'phase_reset0', 'freq1', 'phase1', 'amp1', 'dds_en1', 'phase_reset1']
+
+
+def make_program(n_instructions, dds, n_changed):
+    """A program running for a few ms and ending by branching back to the
+    WAIT in line zero, and the same with n_changed delays changed"""
+    pulse_program = pulseblaster_program(n_instructions, dds)
+    rng = np.random.RandomState(1)
+    pulse_program['length'] = rng.randint(10, 200, len(pulse_program))*10.0
+    pulse_program['inst'][-1] = spinapi.BRANCH
+    pulse_program['inst_data'][-1] = 0
+    next_program = pulse_program.copy()
+    changed = 2 + rng.choice(n_instructions, n_changed, replace=False)
+    next_program['length'][changed] += 10
+    return pulse_program, next_program
+
+
+@contextmanager
+def without(module, names):
+    """Removes the named attributes from the module for the duration"""
+    removed = dict((name, getattr(module, name)) for name in names)
+    for name in names:
+        delattr(module, name)
+    try:
+        yield
+    finally:
+        for name, value in removed.items():
+            setattr(module, name, value)
+
+
+def write_shot(shot_file, pulse_program, dds):
+    datasets = {'PULSE_PROGRAM': pulse_program}
+    if dds:
+        for i in range(2):
+            datasets['DDS%d/FREQ_REGS'%i] = np.linspace(0, 100, 8)
+            datasets['DDS%d/AMP_REGS'%i] = np.linspace(0, 1, 8).astype(np.float32)
+            datasets['DDS%d/PHASE_REGS'%i] = np.linspace(0, 360, 8, endpoint=False)
+    write_device_group(shot_file, 'pulseblaster', datasets)
+
+
+def check_board(pulse_program, dds):
+    """Checks the board holds the shot's program after the two lines BLACS writes"""
+    instructions = spinapi.board().instructions[2:len(pulse_program)]
+    fields = INSTRUCTION_FIELDS + (DDS_FIELDS if dds else [])
+    for field in fields:
+        assert (instructions[field] == pulse_program[2:][field]).all(), 'board has the wrong %s'%field
+
+
+def run_shot(worker, shot_file, initial_values, fresh, timeout=10):
+    spinapi.call_counts.clear()
+    n_written = spinapi.board().n_written
+    start_time = time.time()
+    worker.transition_to_buffered('pulseblaster', shot_file, initial_values, fresh)
+    programming_time = time.time() - start_time
+    n_calls = spinapi.n_calls()
+    n_written = spinapi.board().n_written - n_written
+    start_time = time.time()
+    worker.start_run()
+    # Poll as the tab's status monitor does, until the board is back waiting on line zero:
+    while True:
+        status, waits_pending = worker.check_status()
+        if status['waiting'] and not waits_pending:
+            break
+        if time.time() - start_time > timeout:
+            raise RuntimeError('The shot did not finish within %d s'%timeout)
+    run_time = time.time() - start_time
+    assert worker.transition_to_manual()
+    return programming_time, n_calls, n_written, run_time
+
+
+def main(n_instructions=2000, n_changed=10):
+    from labscript_devices.PulseBlaster_blacs import PulseblasterWorker
+    from labscript_devices.PulseBlaster_No_DDS_blacs import PulseblasterNoDDSWorker
+    spinapi.install()
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print 'PulseBlaster programming of %d instructions (%d changed between shots), %g us per spinapi call'%(
+            n_instructions, n_changed, 1e6*spinapi.call_time)
+        print '%-40s %16s %10s %12s %10s'%('', 'programming (ms)', 'calls', 'instructions', 'run (ms)')
+        for worker_class, dds in [(PulseblasterWorker, True), (PulseblasterNoDDSWorker, False)]:
+            pulse_program, next_program = make_program(n_instructions, dds, n_changed)
+            shot_files = []
+            for i, program in enumerate([pulse_program, next_program]):
+                shot_files.append(os.path.join(temp_dir, '%s_%d.h5'%(worker_class.__name__, i)))
+                write_shot(shot_files[-1], program, dds)
+            initial_values = pulseblaster_initial_values(dds)
+            for variant, missing_functions in VARIANTS:
+                spinapi.reset_simulation()
+                with without(spinapi, missing_functions):
+                    worker = make_worker(worker_class, board_number=0, num_DO=N_FLAGS,
+                                         programming_scheme='pb_start/BRANCH')
+                    worker.init()
+                    worker.program_manual(initial_values)
+                    print '%s, %s'%(worker_class.__name__, variant)
+                    for name, shot_file, program, fresh in [
+                            ('fresh', shot_files[0], pulse_program, True),
+                            ('smart, unchanged', shot_files[0], pulse_program, False),
+                            ('smart, %d changed'%n_changed, shot_files[1], next_program, False)]:
+                        programming_time, n_calls, n_written, run_time = run_shot(worker, shot_file,
+                                                                                  initial_values, fresh)
+                        check_board(program, dds)
+                        print '    %-36s %16.1f %10d %12d %10.1f'%(name, 1e3*programming_time, n_calls, n_written,
+                                                                   1e3*run_time)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,81 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/pulseblaster_upload.py                                #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Compares ways of uploading a PulseBlaster pulse program to the simulated
+spinapi: a call per instruction unpacking numpy records, as the workers used
+to, a call per instruction unpacking tuples, as upload_instructions does if
+spinapi has no bulk functions, and a single call to the bulk functions. Each
+is timed both with the simulated calls and writes taking as long as on the
+PCI bus, and taking no time at all, which leaves only the Python overhead."""
+
+import sys
+import time
+
+from labscript_devices.PulseBlasterProgramming import upload_instructions
+from labscript_devices.simulated import spinapi
+from labscript_devices.benchmarks.startup import pulseblaster_program
+
+
+class PerRowSpinapi(object):
+    """The simulated spinapi without its bulk functions, as the real one is"""
+    pb_inst_dds2 = staticmethod(spinapi.pb_inst_dds2)
+    pb_inst_pbonly = staticmethod(spinapi.pb_inst_pbonly)
+
+
+def upload_records(pulse_program):
+    function = spinapi.pb_inst_dds2 if 'freq0' in pulse_program.dtype.names else spinapi.pb_inst_pbonly
+    for args in pulse_program:
+        function(*args)
+
+
+METHODS = [('per row, numpy records', upload_records),
+           ('per row, tuples', lambda pulse_program: upload_instructions(PerRowSpinapi, pulse_program)),
+           ('bulk', lambda pulse_program: upload_instructions(spinapi, pulse_program))]
+
+
+def time_upload(method, pulse_program, call_time, instruction_time):
+    spinapi.reset_simulation()
+    spinapi.call_time = call_time
+    spinapi.instruction_time = instruction_time
+    spinapi.pb_start_programming(spinapi.PULSE_PROGRAM)
+    spinapi.call_counts.clear()
+    start_time = time.time()
+    method(pulse_program)
+    upload_time = time.time() - start_time
+    n_calls = spinapi.n_calls()
+    spinapi.pb_stop_programming()
+    instructions = spinapi.board().instructions[:len(pulse_program)]
+    for field in pulse_program.dtype.names:
+        assert (instructions[field] == pulse_program[field]).all(), 'board has the wrong %s'%field
+    return upload_time, n_calls
+
+
+def main(n_instructions=2000):
+    call_time, instruction_time = spinapi.call_time, spinapi.instruction_time
+    try:
+        print 'PulseBlaster upload of %d instructions, %g us per spinapi call, %g us per instruction in bulk'%(
+            n_instructions, 1e6*call_time, 1e6*instruction_time)
+        print '%-40s %10s %16s %16s'%('', 'calls', 'PCI bus (ms)', 'no bus (ms)')
+        for name, dds in [('PulseBlaster', True), ('PulseBlaster_No_DDS', False)]:
+            pulse_program = pulseblaster_program(n_instructions, dds)
+            if not dds:
+                pulse_program = pulse_program[spinapi.PBONLY_FIELDS]
+            print name
+            for method_name, method in METHODS:
+                upload_time, n_calls = time_upload(method, pulse_program, call_time, instruction_time)
+                overhead, _ = time_upload(method, pulse_program, 0, 0)
+                print '    %-36s %10d %16.1f %16.1f'%(method_name, n_calls, 1e3*upload_time, 1e3*overhead)
+    finally:
+        spinapi.call_time, spinapi.instruction_time = call_time, instruction_time
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,72 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/quicksyn_pacing.py                                    #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Times a QuickSyn front panel change, setting frequency and output state
+and reading them back, against simulated devices needing various recovery
+times between commands. Compares the fixed sleeps the QuickSynWorker used to
+make with pacing on the device's answers, and prints the measured minimum
+gap between commands and the latency of each kind of exchange."""
+
+import sys
+import time
+
+from labscript_devices.QuickSynSerial import QuickSynConnection
+from labscript_devices.simulated.quicksyn import SimulatedQuickSyn
+
+
+def program_manual_with_sleeps(connection, freq, gate):
+    """What QuickSynWorker.program_manual used to do"""
+    connection.write('FREQ %i\r'%freq)
+    time.sleep(0.05)
+    connection.write('OUTP:STAT %i\r'%gate)
+    connection.write('FREQ?\r')
+    frequency = connection.readline()
+    time.sleep(0.05)
+    connection.write('OUTP:STAT?\r')
+    state = connection.readline()
+    time.sleep(0.05)
+    return frequency, state
+
+
+def program_manual_paced(quicksyn, freq, gate):
+    quicksyn.write('FREQ %i'%freq, 'OUTP:STAT %i'%gate)
+    return quicksyn.query('FREQ?'), quicksyn.query('OUTP:STAT?')
+
+
+def main(n_changes=20):
+    print 'QuickSyn front panel change, mean of %d'%n_changes
+    for recovery_time in [1e-3, 5e-3, 20e-3]:
+        for supports_chaining in [True, False]:
+            device = SimulatedQuickSyn(recovery_time=recovery_time, supports_chaining=supports_chaining)
+            start_time = time.time()
+            for i in range(n_changes):
+                frequency, state = program_manual_with_sleeps(device, 1e12 + i, i % 2)
+            sleeps_time = (time.time() - start_time)/n_changes
+
+            device = SimulatedQuickSyn(recovery_time=recovery_time, supports_chaining=supports_chaining)
+            quicksyn = QuickSynConnection(device)
+            min_gap = quicksyn.calibrate_min_gap()
+            quicksyn.latencies = {}
+            start_time = time.time()
+            for i in range(n_changes):
+                frequency, state = program_manual_paced(quicksyn, 1e12 + i, i % 2)
+                assert int(frequency) == 1e12 + i and state.strip() == ['OFF', 'ON'][i % 2]
+            paced_time = (time.time() - start_time)/n_changes
+
+            print '    recovery %4.1f ms, %-11s sleeps %6.1f ms, paced %6.1f ms (min gap %4.1f ms, %s)'%(
+                      1e3*recovery_time, 'chaining:' if supports_chaining else 'no chaining:', 1e3*sleeps_time,
+                      1e3*paced_time, 1e3*min_gap, 'merged' if quicksyn.merge_commands else 'separate')
+            for name, statistics in sorted(quicksyn.latency_statistics().items()):
+                print '        %-26s %5.1f ms mean, %5.1f ms max'%(name, 1e3*statistics['mean'], 1e3*statistics['max'])
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
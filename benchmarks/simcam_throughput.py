@@ -0,0 +1,99 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/simcam_throughput.py                                  #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Runs shots against the simulated camera server, the same way a
+CameraWorker does, and reports how fast frames get into the shot file, in
+frames/s and MB/s, both with the server writing frames into the shot file and
+with it transferring them over ZMQ to be written here. Needs no cameras, BLACS
+or labscript."""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+import h5py
+
+from labscript_devices.CameraConnection import LineConnection, ZMQConnection, transfer_frames
+from labscript_devices.simulated.camera_server import SimulatedCameraServer
+
+CAMERA_NAME = 'camera'
+
+
+def make_shot_file(path, n_frames, frame_width, frame_height, bit_depth):
+    table_dtypes = [('name','a256'), ('time',float), ('frametype','a256'), ('exposure_time',float)]
+    exposures = np.array([('frame%d'%i, 1e-3*i, 'atoms', 1e-4) for i in range(n_frames)], dtype=table_dtypes)
+    with h5py.File(path, 'w') as h5_file:
+        group = h5_file.create_group('devices/%s'%CAMERA_NAME)
+        group.create_dataset('EXPOSURES', data=exposures)
+        for name, value in [('frame_width', frame_width), ('frame_height', frame_height),
+                            ('bit_depth', bit_depth), ('orientation', 'side')]:
+            group.attrs[name] = value
+
+
+def check_images(path, n_frames, frame_width, frame_height):
+    """Asserts that the shot file has every frame, where lyse expects it"""
+    with h5py.File(path, 'r') as h5_file:
+        for i in range(n_frames):
+            shape = h5_file['images/side/frame%d/atoms'%i].shape
+            assert shape == (frame_height, frame_width), 'frame%d is %s'%(i, shape)
+
+
+def run_shot(connection, path, use_zmq, transfer, compression):
+    for command in [path, 'done']:
+        if command == 'done' and transfer:
+            with h5py.File(path, 'a') as h5_file:
+                transfer_frames(connection, h5_file, compression=compression)
+            return
+        if use_zmq:
+            responses = [connection.request(command), connection.request('hello', timeout=120)]
+        else:
+            responses = [connection.command(command), connection.readline()]
+        if responses != ['ok', 'done']:
+            raise Exception('invalid response from server: ' + str(responses))
+
+
+def main(n_frames=100, frame_width=1024, frame_height=1024, bit_depth=12, n_shots=3, port=42517):
+    directory = tempfile.mkdtemp()
+    try:
+        print 'Simulated camera throughput, %d frames of %dx%d at %d bits per shot'%(n_frames, frame_width,
+                                                                                   frame_height, bit_depth)
+        modes = [('sockets', False, False, None), ('zmq', True, False, None),
+                 ('transfer, uncompressed', True, True, None), ('transfer, gzip', True, True, 'gzip')]
+        for mode, use_zmq, transfer, compression in modes:
+            server = SimulatedCameraServer(port, CAMERA_NAME, use_zmq=use_zmq)
+            server.start()
+            connection = (ZMQConnection if use_zmq else LineConnection)('localhost', port)
+            try:
+                times = []
+                for i in range(n_shots):
+                    path = os.path.join(directory, 'shot%d.h5'%i)
+                    make_shot_file(path, n_frames, frame_width, frame_height, bit_depth)
+                    start_time = time.time()
+                    run_shot(connection, path, use_zmq, transfer, compression)
+                    times.append(time.time() - start_time)
+                    check_images(path, n_frames, frame_width, frame_height)
+                    os.remove(path)
+            finally:
+                connection.close()
+                server.stop()
+            n_bytes = server.statistics[-1]['bytes']
+            shot_time = min(times)
+            print '    %-22s %7.3f s per shot, %7.1f frames/s, %7.1f MB/s'%(mode, shot_time,
+                                                                                        n_frames/shot_time, n_bytes/shot_time/1e6)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
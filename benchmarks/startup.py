@@ -0,0 +1,805 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/startup.py                                            #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Measures what it costs BLACS and runviewer to start using each device:
+how long its modules take to import and how much memory they use, and how
+long the first calls to the workers' and runviewer parsers' hot entry points
+take, compared with the calls after them. Each measurement is made in a
+fresh interpreter, n_repeats times, and the median reported.
+
+The results are printed, and written as JSON to RESULTS_FILE in the current
+directory, along with the commit they were measured at. If that file already
+holds results, they are compared with the new ones first, so regressions
+between commits show up.
+
+Each case also compiles a small connection table, as a labscript script
+would, timing the generate_code of its device. Cases of devices that BLACS
+programs from what was compiled run the worker on the compiled shot, the
+others on a shot written by hand, so that the shot can be as long as a real
+one without compiling it taking ages.
+
+No hardware is needed: spinapi, PyDAQmx and UniversalLibrary are replaced
+by the simulated drivers in labscript_devices.simulated, and serial by the
+stand-in in stubs/drivers, with the simulated devices in
+labscript_devices.simulated standing in for serial devices, zaberapi and
+the RFBlaster's web server. If use_stubs, labscript, labscript_utils, blacs,
+qtutils and zprocess are replaced by those in stubs/suite too, so that none
+of the labscript suite needs to be installed. The stand-in labscript
+compiles only what the cases need, see its docstring. labscript_devices
+itself imports labscript_utils though, so to run this without it, put
+stubs/suite on the PYTHONPATH:
+
+    PYTHONPATH=labscript_devices/benchmarks/stubs/suite python -m labscript_devices.benchmarks.startup
+
+The RFBlaster's generate_code needs its assembler, from the rfblaster
+package, so it is only timed if that is installed."""
+
+import os
+import imp
+import sys
+import json
+import time
+import shutil
+import socket
+import logging
+import platform
+import functools
+import tempfile
+import subprocess
+
+import numpy as np
+
+from labscript_devices import COMPANION_SUFFIX
+from labscript_devices.manifest import PACKAGE_DIR, generate_manifest
+from labscript_devices.benchmarks.device_imports import peak_memory, time_imports, median
+
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stubs')
+DRIVER_STUBS_DIR = os.path.join(STUBS_DIR, 'drivers')
+SUITE_STUBS_DIR = os.path.join(STUBS_DIR, 'suite')
+
+# The simulated drivers installed in place of the real ones, in each fresh interpreter:
+SIMULATED_DRIVERS = ['spinapi', 'PyDAQmx', 'universallibrary']
+INSTALL_SCRIPT = 'from labscript_devices.benchmarks.startup import install_simulated_drivers; install_simulated_drivers()'
+
+RESULTS_FILE = 'startup_benchmarks.json'
+
+# Marks the line of a case's output holding its results, devices may print too:
+RESULTS_MARKER = 'STARTUP BENCHMARK RESULTS: '
+
+# Changes from previous results of more than this fraction, and this many
+# seconds, are pointed out:
+SIGNIFICANT_CHANGE = 0.2
+SIGNIFICANT_DIFFERENCE = 1e-3
+
+N_FLAGS = 12
+
+
+class Connection(object):
+    """Enough of a connection table entry for the runviewer parsers"""
+    def __init__(self, name, parent_port, device_class=None, child_list=None):
+        self.name = name
+        self.parent_port = parent_port
+        self.device_class = device_class
+        self.child_list = child_list or {}
+
+
+def install_simulated_drivers():
+    for name in SIMULATED_DRIVERS:
+        __import__('labscript_devices.simulated.' + name, fromlist=['install']).install()
+
+
+def make_worker(worker_class, **kwargs):
+    """Returns a worker with the given attributes, as BLACS would make it
+    in the worker process, but without the process"""
+    worker = worker_class.__new__(worker_class)
+    worker.__dict__.update(kwargs)
+    worker.logger = logging.getLogger('BLACS.%s'%worker_class.__name__)
+    return worker
+
+
+def add_trace(name, trace, parent_device_name, connection):
+    pass
+
+
+def write_device_group(shot_file, device_name, datasets, attributes=None):
+    import h5py
+    with h5py.File(shot_file, 'a') as hdf5_file:
+        group = hdf5_file.require_group('devices/%s'%device_name)
+        for name, data in datasets.items():
+            group.create_dataset(name, data=data)
+        for name, value in (attributes or {}).items():
+            group.attrs[name] = value
+        if 'waits' not in hdf5_file:
+            hdf5_file.create_dataset('waits', data=np.zeros(0, dtype=[('label', 'a256'), ('time', float)]))
+
+
+def pulseblaster_program(n_instructions, dds):
+    """A random program for a PulseBlaster, with the two dummy instructions
+    BLACS overwrites at the start and a STOP at the end"""
+    rng = np.random.RandomState(0)
+    dtype = [('flags', np.int32), ('inst', np.int32), ('inst_data', np.int32), ('length', np.float64)]
+    if dds:
+        dds_dtype = []
+        for i in range(2):
+            dds_dtype += [('freq%d'%i, np.int32), ('phase%d'%i, np.int32), ('amp%d'%i, np.int32),
+                          ('dds_en%d'%i, np.int32), ('phase_reset%d'%i, np.int32)]
+        dtype = dds_dtype + dtype
+    pulse_program = np.zeros(n_instructions + 3, dtype=dtype)
+    pulse_program['flags'] = rng.randint(0, 2**N_FLAGS, len(pulse_program))
+    pulse_program['length'] = rng.randint(10, 100000, len(pulse_program))*10.0
+    pulse_program['inst'][-1] = 1 # STOP
+    if dds:
+        for i in range(2):
+            for reg in ['freq', 'phase', 'amp']:
+                pulse_program['%s%d'%(reg, i)] = rng.randint(0, 8, len(pulse_program))
+            pulse_program['dds_en%d'%i] = rng.randint(0, 2, len(pulse_program))
+    return pulse_program
+
+
+def pulseblaster_initial_values(dds):
+    initial_values = dict(('flag %d'%i, 0) for i in range(N_FLAGS))
+    if dds:
+        for i in range(2):
+            initial_values['dds %d'%i] = {'freq': 10e6, 'amp': 0.5, 'phase': 0, 'gate': 0}
+    return initial_values
+
+
+def pulseblaster_connections(name, dds):
+    channels = dict(('flag%d'%i, Connection('flag%d'%i, 'flag %d'%i, 'DigitalOut')) for i in range(N_FLAGS))
+    if dds:
+        for i in range(2):
+            channels['dds%d'%i] = Connection('dds%d'%i, 'dds %d'%i, 'DDS',
+                                             dict((sub, Connection('dds%d_%s'%(i, sub), sub)) for sub in ['freq', 'amp', 'phase']))
+    direct_outputs = Connection('%s_direct_outputs'%name, 'dds', 'DDS', channels)
+    clockline = Connection('%s_clockline'%name, 'internal', 'ClockLine', {direct_outputs.name: direct_outputs})
+    pseudoclock = Connection('%s_pseudoclock'%name, 'clock', 'Pseudoclock', {clockline.name: clockline})
+    return Connection(name, None, 'PulseBlaster', {pseudoclock.name: pseudoclock})
+
+
+def connection_table_entry(device):
+    """The connection table entry runviewer would have for a compiled
+    device, with those of its children"""
+    return Connection(device.name, device.connection, device.__class__.__name__,
+                      dict((child.name, connection_table_entry(child)) for child in device.child_devices))
+
+
+def clock_trace(device):
+    """The trace of the clockline clocking a compiled device, rising at each
+    tick, as runviewer passes it to the device's parser"""
+    clock_line = device.parent_clock_line
+    ticks = clock_line.parent_device.times[clock_line]
+    times = np.repeat(ticks, 2)
+    times[1::2] += 0.5/clock_line.clock_limit
+    return times, 1 - np.arange(len(times)) % 2
+
+
+def free_port():
+    listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening_socket.bind(('localhost', 0))
+    port = listening_socket.getsockname()[1]
+    listening_socket.close()
+    return port
+
+
+def side_shot_file(shot_file):
+    """Another shot file, for cases whose workers don't use the shot they compile"""
+    return os.path.join(os.path.dirname(shot_file), 'compiled.h5')
+
+
+def tick_times(n_ticks, clock_limit):
+    """n_ticks random times, each between one and ten periods of clock_limit
+    after the last, the first after t=0"""
+    rng = np.random.RandomState(1)
+    return np.cumsum(rng.randint(1, 11, n_ticks))/float(clock_limit)
+
+
+def pineblaster_clockline():
+    """The clockline of a PineBlaster, as the master pseudoclock of the
+    connection table being compiled, to clock the device of a case"""
+    from labscript_devices.PineBlaster import PineBlaster
+    return PineBlaster('pineblaster', usbport='COM1').clockline
+
+
+def compile_shot(measure, device, stop_time):
+    """Compiles the shot, stopping at stop_time, and times device's generate_code"""
+    import labscript
+    def generate_code(hdf5_file):
+        measure('generate_code', device.__class__.generate_code, device, hdf5_file)
+    device.generate_code = generate_code
+    labscript.stop(stop_time)
+
+
+def compile_pulseblaster(shot_file, measure, pulseblaster_class, n_instructions, dds):
+    """Compiles a shot of a PulseBlaster toggling one of its flags, and
+    setting its DDSs if dds, n_instructions times"""
+    import labscript
+    labscript.labscript_init(shot_file, new=True)
+    pulseblaster = pulseblaster_class('pulseblaster')
+    flags = [labscript.DigitalOut('flag%d'%i, pulseblaster.direct_outputs, 'flag %d'%i) for i in range(N_FLAGS)]
+    channels = [labscript.DDS('dds%d'%i, pulseblaster.direct_outputs, 'dds %d'%i) for i in range(2)] if dds else []
+    labscript.start()
+    rng = np.random.RandomState(0)
+    states = np.zeros(N_FLAGS, dtype=int)
+    times = tick_times(n_instructions, 1e5)
+    for t in times:
+        flag = rng.randint(N_FLAGS)
+        states[flag] ^= 1
+        if states[flag]:
+            flags[flag].go_high(t)
+        else:
+            flags[flag].go_low(t)
+        for channel in channels:
+            channel.setfreq(t, 10e6*rng.randint(1, 9))
+            channel.setamp(t, rng.randint(0, 8)/8.0)
+    compile_shot(measure, pulseblaster, times[-1] + 1e-3)
+
+
+# The cases. Each sets a device up in a fresh interpreter, compiling or
+# writing what it needs into the shot file, and passes each call to be timed
+# to measure(). BLACS programs the first shot after starting up fresh, and
+# the rest smart:
+
+def pulseblaster(shot_file, measure, n_instructions=2000):
+    from labscript_devices.PulseBlaster_blacs import PulseblasterWorker
+    from labscript_devices.PulseBlaster import PulseBlaster, PulseBlasterParser
+    pulse_program = pulseblaster_program(n_instructions, dds=True)
+    datasets = {'PULSE_PROGRAM': pulse_program}
+    for i in range(2):
+        datasets['DDS%d/FREQ_REGS'%i] = np.linspace(0, 100, 8)
+        datasets['DDS%d/AMP_REGS'%i] = np.linspace(0, 1, 8).astype(np.float32)
+        datasets['DDS%d/PHASE_REGS'%i] = np.linspace(0, 360, 8, endpoint=False)
+    write_device_group(shot_file, 'pulseblaster', datasets)
+    initial_values = pulseblaster_initial_values(dds=True)
+
+    worker = make_worker(PulseblasterWorker, board_number=0, programming_scheme='pb_start/BRANCH')
+    measure('worker.init', worker.init)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'pulseblaster', shot_file, initial_values, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'pulseblaster', shot_file, initial_values, False)
+    parser = PulseBlasterParser(shot_file, pulseblaster_connections('pulseblaster', dds=True))
+    measure('parser.get_traces', parser.get_traces, add_trace)
+    measure('parser.get_traces (again)', parser.get_traces, add_trace)
+    compile_pulseblaster(side_shot_file(shot_file), measure, PulseBlaster, n_instructions, dds=True)
+
+
+def pulseblaster_no_dds(shot_file, measure, n_instructions=2000):
+    from labscript_devices.PulseBlaster_No_DDS_blacs import PulseblasterNoDDSWorker
+    from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS
+    write_device_group(shot_file, 'pulseblaster', {'PULSE_PROGRAM': pulseblaster_program(n_instructions, dds=False)})
+    initial_values = pulseblaster_initial_values(dds=False)
+
+    worker = make_worker(PulseblasterNoDDSWorker, board_number=0, num_DO=N_FLAGS, programming_scheme='pb_start/BRANCH')
+    measure('worker.init', worker.init)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'pulseblaster', shot_file, initial_values, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'pulseblaster', shot_file, initial_values, False)
+    compile_pulseblaster(side_shot_file(shot_file), measure, PulseBlaster_No_DDS, n_instructions, dds=False)
+
+
+def pineblaster(shot_file, measure, n_instructions=2000):
+    import serial
+    from labscript_devices.simulated.pineblaster import SimulatedPineBlaster
+    serial.Serial = SimulatedPineBlaster
+    from labscript_devices.PineBlaster_blacs import PineblasterWorker
+    from labscript_devices.PineBlaster import RunviewerClass
+    from labscript_devices.NI_PCI_6733 import NI_PCI_6733
+    import labscript
+    rng = np.random.RandomState(0)
+    pulse_program = np.zeros(n_instructions, dtype=[('period', int), ('reps', int)])
+    pulse_program['period'] = rng.randint(4, 40000, n_instructions)
+    pulse_program['reps'] = rng.randint(1, 100, n_instructions)
+    # Stop instruction:
+    pulse_program[-1] = (0, 0)
+    write_device_group(shot_file, 'pineblaster', {'PULSE_PROGRAM': pulse_program}, {'is_master_pseudoclock': True})
+
+    worker = make_worker(PineblasterWorker, usbport='COM1', max_boot_time=10)
+    measure('worker.init', worker.init)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'pineblaster', shot_file, {}, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'pineblaster', shot_file, {}, False)
+    clockline = Connection('pineblaster_clockline', 'internal', 'ClockLine')
+    pseudoclock = Connection('pineblaster_pseudoclock', 'clock', 'Pseudoclock', {clockline.name: clockline})
+    parser = RunviewerClass(shot_file, Connection('pineblaster', None, 'PineBlaster', {pseudoclock.name: pseudoclock}))
+    measure('parser.get_traces', parser.get_traces, add_trace)
+    measure('parser.get_traces (again)', parser.get_traces, add_trace)
+
+    # Clocking an NI card, so that it ticks:
+    labscript.labscript_init(side_shot_file(shot_file), new=True)
+    clockline = pineblaster_clockline()
+    ni_card = NI_PCI_6733('ni_card', clockline, 'ni_card/PFI0', MAX_name='ni_card')
+    outputs = [labscript.AnalogOut('ao%d'%i, ni_card, 'ao%d'%i) for i in range(2)]
+    labscript.start()
+    times = tick_times(n_instructions, 0.5*clockline.clock_limit)
+    for t in times:
+        for output in outputs:
+            output.constant(t, rng.uniform(-10, 10))
+    compile_shot(measure, clockline.pseudoclock_device, times[-1] + 1e-3)
+
+
+def quicksyn(shot_file, measure, n_points=1000):
+    import serial
+    from labscript_devices.simulated.quicksyn import SimulatedQuickSyn
+    serial.Serial = SimulatedQuickSyn
+    from labscript_devices.PhaseMatrixQuickSyn_blacs import QuickSynWorker
+    from labscript_devices.PhaseMatrixQuickSynList import PhaseMatrixQuickSynList, QuickSynListDDS, RunviewerClass
+    import labscript
+    frequencies = (np.linspace(6e9, 6.1e9, n_points)*1e3).astype(np.uint64)
+    static_data = np.array([(frequencies[0], 1)], dtype=[('freq0', np.uint64), ('gate0', np.uint16)])
+    table_data = np.array(frequencies, dtype=[('freq0', np.uint64)])
+    write_device_group(shot_file, 'quicksyn', {'STATIC_DATA': static_data, 'TABLE_DATA': table_data})
+    initial_values = {'dds 0': {'freq': 6e9, 'gate': 1}}
+
+    worker = make_worker(QuickSynWorker, address='COM1')
+    measure('worker.init', worker.init)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'quicksyn', shot_file, initial_values, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual, False)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'quicksyn', shot_file, initial_values, False)
+    channel = Connection('dds', 'channel 0', 'QuickSynListDDS',
+                         {'freq': Connection('dds_freq', 'freq'), 'gate': Connection('dds_gate', 'gate')})
+    parser = RunviewerClass(shot_file, Connection('quicksyn', 'internal', 'PhaseMatrixQuickSynList', {channel.name: channel}))
+    times = np.arange(2*n_points + 2)*1e-3
+    clock = (times, np.arange(len(times)) % 2)
+    measure('parser.get_traces', parser.get_traces, add_trace, clock)
+    measure('parser.get_traces (again)', parser.get_traces, add_trace, clock)
+
+    labscript.labscript_init(side_shot_file(shot_file), new=True)
+    quicksyn = PhaseMatrixQuickSynList('quicksyn', pineblaster_clockline(), 'COM1')
+    dds = QuickSynListDDS('dds', quicksyn, 'channel 0')
+    labscript.start()
+    dds.enable()
+    times = tick_times(n_points, 0.5*quicksyn.clock_limit)
+    for t, frequency in zip(times, frequencies/1e3):
+        dds.setfreq(t, frequency)
+    compile_shot(measure, quicksyn, times[-1] + 1e-3)
+
+
+def ni_pci_6733(shot_file, measure, n_samples=20000):
+    from labscript_devices.NI_PCI_6733_blacs import NiPCI6733Worker
+    from labscript_devices.NI_PCI_6733 import NI_PCI_6733, RunviewerClass
+    import labscript
+    rng = np.random.RandomState(0)
+    write_device_group(shot_file, 'ni_card', {'ANALOG_OUTS': rng.uniform(-10, 10, (n_samples, 8)).astype(np.float32),
+                                              'DIGITAL_OUTS': rng.randint(0, 256, n_samples).astype(np.uint32)},
+                       {'analog_out_channels': ', '.join('ni_card/ao%d'%i for i in range(8)),
+                        'digital_lines': 'ni_card/port0/line0:7'})
+    values = dict([('ao%d'%i, 0.0) for i in range(8)] + [('port0/line%d'%i, 0) for i in range(8)])
+
+    worker = make_worker(NiPCI6733Worker, MAX_name='ni_card', limits=[-10, 10], num_AO=8, num_DO=8)
+    measure('worker.init', worker.init)
+    measure('worker.program_manual', worker.program_manual, values)
+    measure('worker.program_manual (again)', worker.program_manual, values)
+    channels = dict(('ao%d'%i, Connection('ao%d'%i, 'ao%d'%i, 'AnalogOut')) for i in range(8))
+    channels.update(('do%d'%i, Connection('do%d'%i, 'port0/line%d'%i, 'DigitalOut')) for i in range(8))
+    parser = RunviewerClass(shot_file, Connection('ni_card', 'internal', 'NI_PCI_6733', channels))
+    times = np.arange(2*n_samples + 2)*1e-6
+    clock = (times, np.arange(len(times)) % 2)
+    measure('parser.get_traces', parser.get_traces, add_trace, clock)
+    measure('parser.get_traces (again)', parser.get_traces, add_trace, clock)
+
+    labscript.labscript_init(side_shot_file(shot_file), new=True)
+    ni_card = NI_PCI_6733('ni_card', pineblaster_clockline(), 'ni_card/PFI0', MAX_name='ni_card')
+    analogs = [labscript.AnalogOut('ao%d'%i, ni_card, 'ao%d'%i) for i in range(8)]
+    digitals = [labscript.DigitalOut('do%d'%i, ni_card, 'port0/line%d'%i) for i in range(8)]
+    labscript.start()
+    # Fewer samples than the worker's shot, as many as the PineBlaster can clock:
+    times = tick_times(n_samples//4, 0.5*ni_card.parent_clock_line.clock_limit)
+    for t in times:
+        for output in analogs:
+            output.constant(t, rng.uniform(-10, 10))
+        for output in digitals:
+            if rng.randint(2):
+                output.go_high(t)
+            else:
+                output.go_low(t)
+    compile_shot(measure, ni_card, times[-1] + 1e-3)
+
+
+def ni_board(module_name, worker_name, shot_file, measure, n_samples=5000):
+    """An NI card with AO, DO and PFI lines, compiled for and programmed by
+    the named device class and worker"""
+    import labscript
+    from labscript_devices.simulated import PyDAQmx
+    device_class = getattr(__import__('labscript_devices.' + module_name, fromlist=[module_name]), module_name)
+    worker_class = getattr(__import__('labscript_devices.' + module_name + COMPANION_SUFFIX, fromlist=[worker_name]), worker_name)
+    RunviewerClass = __import__('labscript_devices.' + module_name, fromlist=['RunviewerClass']).RunviewerClass
+    num = {'AO': 4, 'DO': 32, 'PFI': 16}
+    labscript.labscript_init(shot_file, new=True)
+    ni_card = device_class('ni_card', pineblaster_clockline(), 'ni_card/PFI0', MAX_name='ni_card')
+    analogs = [labscript.AnalogOut('ao%d'%i, ni_card, 'ao%d'%i) for i in range(num['AO'])]
+    digitals = [labscript.DigitalOut('do%d'%i, ni_card, 'port0/line%d'%i) for i in range(8)]
+    labscript.start()
+    rng = np.random.RandomState(0)
+    times = tick_times(n_samples, 0.5*ni_card.parent_clock_line.clock_limit)
+    for t in times:
+        for output in analogs:
+            output.constant(t, rng.uniform(-10, 10))
+        for output in digitals:
+            if rng.randint(2):
+                output.go_high(t)
+            else:
+                output.go_low(t)
+    compile_shot(measure, ni_card, times[-1] + 1e-3)
+    values = dict([('ao%d'%i, 0.0) for i in range(num['AO'])] + [('port0/line%d'%i, 0) for i in range(num['DO'])] +
+                  [('PFI %d'%i, 0) for i in range(num['PFI'])])
+
+    worker = make_worker(worker_class, MAX_name='ni_card', limits=[-10, 10], num=num)
+    measure('worker.init', worker.init)
+    measure('worker.program_manual', worker.program_manual, values)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'ni_card', shot_file, values, True)
+    # The shot, clocked at the rate the worker tells the card to expect:
+    PyDAQmx.send_trigger()
+    time.sleep(2*len(times)/1e6)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'ni_card', shot_file, values, False)
+    worker.transition_to_manual(True)
+    worker.shutdown()
+    parser = RunviewerClass(shot_file, connection_table_entry(ni_card))
+    clock = clock_trace(ni_card)
+    measure('parser.get_traces', parser.get_traces, add_trace, clock)
+    measure('parser.get_traces (again)', parser.get_traces, add_trace, clock)
+
+
+def mc_usb_3114(shot_file, measure, n_steps=200):
+    import labscript
+    from labscript_devices.MC_USB_3114 import MC_USB_3114, RunviewerClass
+    from labscript_devices.MC_USB_3114_blacs import MCUSB3114Worker
+    labscript.labscript_init(shot_file, new=True)
+    board = MC_USB_3114('mc_board', pineblaster_clockline(), 'flag 0')
+    analogs = [labscript.AnalogOut('ao%d'%i, board, 'ao%d'%i) for i in range(4)]
+    digitals = [labscript.DigitalOut('do%d'%i, board, 'port0/line%d'%i) for i in range(8)]
+    labscript.start()
+    rng = np.random.RandomState(0)
+    times = tick_times(n_steps, 0.5*board.clock_limit)
+    for t in times:
+        for output in analogs:
+            output.constant(t, rng.uniform(0, 10))
+        for output in digitals:
+            if rng.randint(2):
+                output.go_high(t)
+            else:
+                output.go_low(t)
+    compile_shot(measure, board, times[-1] + 0.1)
+    values = dict([('ao%d'%i, 0.0) for i in range(16)] + [('port0/line%d'%i, 0) for i in range(8)])
+
+    # The simulated board's counter never counts, so don't wait for the shot to finish:
+    worker = make_worker(MCUSB3114Worker, name='mc_board', limits=[0, 10], num_AO=16, num_DO=8, BoardNum=0,
+                         sequencer_timeout=0)
+    measure('worker.init', worker.init)
+    measure('worker.program_manual', worker.program_manual, values)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'mc_board', shot_file, values, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'mc_board', shot_file, values, False)
+    worker.transition_to_manual(True)
+    worker.shutdown()
+    parser = RunviewerClass(shot_file, connection_table_entry(board))
+    clock = clock_trace(board)
+    measure('parser.get_traces', parser.get_traces, add_trace, clock)
+    measure('parser.get_traces (again)', parser.get_traces, add_trace, clock)
+
+
+def novatech(shot_file, measure, n_points=100):
+    import serial
+    import labscript
+    from labscript_devices.simulated.novatech import SimulatedNovatechDDS9m
+    serial.Serial = SimulatedNovatechDDS9m
+    from labscript_devices.NovaTechDDS9M import NovaTechDDS9M, RunviewerClass
+    from labscript_devices.NovaTechDDS9M_blacs import NovatechDDS9mWorker
+    labscript.labscript_init(shot_file, new=True)
+    novatech = NovaTechDDS9M('novatech', pineblaster_clockline(), com_port='COM1')
+    channels = [labscript.DDS('dds%d'%i, novatech, 'channel %d'%i) for i in range(2)]
+    static_channels = [labscript.StaticDDS('dds%d'%i, novatech, 'channel %d'%i) for i in range(2, 4)]
+    labscript.start()
+    rng = np.random.RandomState(0)
+    times = tick_times(n_points, 0.5*novatech.clock_limit)
+    for t in times:
+        for channel in channels:
+            channel.setfreq(t, rng.uniform(1e6, 100e6))
+            channel.setamp(t, rng.uniform(0, 1))
+            channel.setphase(t, rng.uniform(0, 360))
+    for channel in static_channels:
+        channel.setfreq(10e6)
+        channel.setamp(0.5)
+        channel.setphase(90)
+    compile_shot(measure, novatech, times[-1] + 1e-3)
+    values = dict(('channel %d'%i, {'freq': 10e6, 'amp': 0.5, 'phase': 0}) for i in range(4))
+
+    worker = make_worker(NovatechDDS9mWorker, com_port='COM1', baud_rate=115200, update_mode='synchronous')
+    measure('worker.init', worker.init)
+    measure('worker.program_manual', worker.program_manual, values)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'novatech', shot_file, values, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'novatech', shot_file, values, False)
+    worker.shutdown()
+    parser = RunviewerClass(shot_file, connection_table_entry(novatech))
+    clock = clock_trace(novatech)
+    measure('parser.get_traces', parser.get_traces, add_trace, clock)
+    measure('parser.get_traces (again)', parser.get_traces, add_trace, clock)
+
+
+def rfblaster(shot_file, measure, n_points=2000):
+    import labscript
+    from labscript_devices.simulated.rfblaster import SimulatedRFBlaster
+    from labscript_devices.RFBlaster import RFBlaster
+    from labscript_devices.RFBlaster_blacs import RFBlasterWorker
+    rng = np.random.RandomState(0)
+    dtype = [('time', float)] + [('%s%d'%(name, i), float) for i in range(2) for name in ['amp', 'freq', 'phase']]
+    table_data = np.zeros(n_points, dtype=dtype)
+    table_data['time'] = tick_times(n_points, RFBlaster.clock_limit)
+    datasets = {'TABLE_DATA': table_data}
+    for i in range(2):
+        table_data['amp%d'%i] = rng.uniform(0, 1, n_points)
+        table_data['freq%d'%i] = rng.uniform(1e6, 100e6, n_points)
+        table_data['phase%d'%i] = rng.uniform(0, 360, n_points)
+        # Roughly as much machine code as the RFBlaster's assembler makes of that:
+        datasets['BINARY_CODE/DDS%d'%i] = np.string_(rng.bytes(32*n_points))
+    write_device_group(shot_file, 'rfblaster', datasets)
+    values = dict(('dds %d'%i, {'freq': 10e6, 'amp': 0.5, 'phase': 0, 'gate': True}) for i in range(2))
+
+    server = SimulatedRFBlaster()
+    worker = make_worker(RFBlasterWorker, address=server.start(), num_DDS=2)
+    measure('worker.init', worker.init)
+    measure('worker.program_manual', worker.program_manual, values)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'rfblaster', shot_file, values, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (again)', worker.transition_to_buffered, 'rfblaster', shot_file, values, False)
+    worker.shutdown()
+    server.stop()
+
+    try:
+        imp.find_module('rfblaster')
+    except ImportError:
+        # Without its assembler, the RFBlaster can't be compiled for:
+        return
+    labscript.labscript_init(side_shot_file(shot_file), new=True)
+    device = RFBlaster('rfblaster', 'localhost')
+    channels = [labscript.DDS('dds%d'%i, device.direct_outputs, 'dds %d'%i) for i in range(2)]
+    labscript.start()
+    for row in table_data:
+        for i, channel in enumerate(channels):
+            channel.setamp(row['time'], row['amp%d'%i])
+            channel.setfreq(row['time'], row['freq%d'%i])
+            channel.setphase(row['time'], row['phase%d'%i])
+    compile_shot(measure, device, table_data['time'][-1] + 1e-3)
+
+
+def zaber(shot_file, measure, n_stages=3):
+    import serial
+    import labscript
+    from labscript_devices.simulated import zaberapi
+    zaberapi.install()
+    serial.Serial = functools.partial(zaberapi.SimulatedZaberStages, n_stages=n_stages)
+    from labscript_devices.ZaberStageController import ZaberStageController, ZaberStageTLSR150D
+    from labscript_devices.ZaberStageController_blacs import ZaberWorker
+    labscript.labscript_init(shot_file, new=True)
+    controller = ZaberStageController('zaber', com_port='COM1')
+    stages = [ZaberStageTLSR150D('stage%d'%i, controller, 'device %d'%i) for i in range(1, n_stages + 1)]
+    labscript.start()
+    # Short moves, of a tenth of a second or so:
+    for i, stage in enumerate(stages):
+        stage.constant(100*(i + 1))
+    compile_shot(measure, controller, 1e-3)
+    values = dict(('device %d'%i, 50*i) for i in range(1, n_stages + 1))
+
+    worker = make_worker(ZaberWorker, com_port='COM1', move_parameters={})
+    measure('worker.init', worker.init)
+    measure('worker.program_manual', worker.program_manual, values)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'zaber', shot_file, values, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (smart)', worker.transition_to_buffered, 'zaber', shot_file, values, False)
+    worker.shutdown()
+
+
+def simcam(shot_file, measure, n_exposures=20):
+    import labscript
+    from labscript_devices.PulseBlaster import PulseBlaster
+    from labscript_devices.SimCam import SimCam
+    from labscript_devices.SimCam_blacs import SimCamWorker
+    labscript.labscript_init(shot_file, new=True)
+    pulseblaster = PulseBlaster('pulseblaster')
+    camera = SimCam('camera', pulseblaster.direct_outputs, 'flag 1', exposure_time=1e-4, frame_width=256, frame_height=256)
+    labscript.start()
+    for i in range(n_exposures):
+        camera.expose('frame%d'%i, 1e-3*(i + 1), 'atoms')
+    compile_shot(measure, camera, 1e-3*(n_exposures + 1))
+    # The camera server writes the frames into the shot, so the next shot needs a fresh copy:
+    next_shot_file = os.path.join(os.path.dirname(shot_file), 'next_shot.h5')
+    shutil.copy(shot_file, next_shot_file)
+
+    worker = make_worker(SimCamWorker, port=str(free_port()), device_name='camera')
+    measure('worker.init', worker.init)
+    # Starts the simulated camera server:
+    measure('worker.update_settings_and_check_connectivity', worker.update_settings_and_check_connectivity, 'localhost', False)
+    measure('worker.transition_to_buffered', worker.transition_to_buffered, 'camera', shot_file, {}, True)
+    measure('worker.transition_to_manual', worker.transition_to_manual)
+    measure('worker.transition_to_buffered (again)', worker.transition_to_buffered, 'camera', next_shot_file, {}, False)
+    measure('worker.transition_to_manual (again)', worker.transition_to_manual)
+    worker.shutdown()
+
+
+CASES = [('PulseBlaster', pulseblaster),
+         ('PulseBlaster_No_DDS', pulseblaster_no_dds),
+         ('PineBlaster', pineblaster),
+         ('PhaseMatrixQuickSyn', quicksyn),
+         ('NI_PCI_6733', ni_pci_6733),
+         ('NI_PCIe_6363', functools.partial(ni_board, 'NI_PCIe_6363', 'NiPCIe6363Worker')),
+         ('NI_USB_6343', functools.partial(ni_board, 'NI_USB_6343', 'NI_USB_6343Worker')),
+         ('MC_USB_3114', mc_usb_3114),
+         ('NovaTechDDS9M', novatech),
+         ('RFBlaster', rfblaster),
+         ('ZaberStageController', zaber),
+         ('SimCam', simcam)]
+
+
+def run_case(name):
+    """Runs the named case in this interpreter, printing how long each call
+    took, and the peak memory use"""
+    case = dict(CASES)[name]
+    install_simulated_drivers()
+    timings = []
+    def measure(call_name, function, *args):
+        start_time = time.time()
+        function(*args)
+        timings.append((call_name, time.time() - start_time))
+    temp_dir = tempfile.mkdtemp()
+    try:
+        case(os.path.join(temp_dir, 'shot.h5'), measure)
+    finally:
+        shutil.rmtree(temp_dir)
+    print(RESULTS_MARKER + json.dumps({'timings': timings, 'peak_memory': peak_memory()}))
+
+
+def benchmark_environment(use_stubs):
+    """The environment for the fresh interpreters, with the stubs first on the PYTHONPATH"""
+    env = dict(os.environ)
+    path = [DRIVER_STUBS_DIR] + ([SUITE_STUBS_DIR] if use_stubs else [])
+    if env.get('PYTHONPATH'):
+        path.append(env['PYTHONPATH'])
+    env['PYTHONPATH'] = os.pathsep.join(path)
+    return env
+
+
+def stub_names(stubs_dir):
+    return sorted(set(os.path.splitext(filename)[0] for filename in os.listdir(stubs_dir)))
+
+
+def time_case(name, env):
+    """Runs the named case in a fresh interpreter, returning its results,
+    or its error message if it failed"""
+    script = 'from labscript_devices.benchmarks.startup import run_case; run_case(%s)'%repr(name)
+    process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    stdout, stderr = process.communicate()
+    for line in stdout.splitlines():
+        if line.startswith(RESULTS_MARKER):
+            return json.loads(line[len(RESULTS_MARKER):])
+    lines = stderr.strip().splitlines()
+    return {'error': lines[-1] if lines else 'exit status %d'%process.returncode}
+
+
+def summarise(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {'median': median(values), 'min': min(values), 'max': max(values)}
+
+
+def benchmark_imports(n_repeats, env):
+    manifest = generate_manifest()
+    devices = sorted(name for name in manifest if name + COMPANION_SUFFIX in manifest)
+    results = {}
+    for name in devices:
+        modules = ['labscript_devices.' + name, 'labscript_devices.' + name + COMPANION_SUFFIX]
+        runs = [time_imports(modules, env, INSTALL_SCRIPT) for _ in range(n_repeats)]
+        if None in runs:
+            # Perhaps the companion's dependencies are missing, try the device module on its own:
+            modules = modules[:1]
+            runs = [time_imports(modules, env, INSTALL_SCRIPT) for _ in range(n_repeats)]
+        if None in runs:
+            results[name] = {'error': 'failed to import'}
+            continue
+        results[name] = {'device': summarise(run['times'][0] for run in runs),
+                         'BLACS': summarise(run['times'][1] for run in runs) if len(modules) > 1 else None,
+                         'peak_memory': summarise(run['peak_memory'] for run in runs)}
+    return results
+
+
+def benchmark_cases(n_repeats, env):
+    results = {}
+    for name, case in CASES:
+        runs = [time_case(name, env) for _ in range(n_repeats)]
+        errors = [run['error'] for run in runs if 'error' in run]
+        if errors:
+            results[name] = {'error': errors[0]}
+            continue
+        results[name] = {'calls': [(call_name, summarise(run['timings'][i][1] for run in runs))
+                                   for i, (call_name, _) in enumerate(runs[0]['timings'])],
+                         'peak_memory': summarise(run['peak_memory'] for run in runs)}
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PACKAGE_DIR,
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timings(results):
+    """{name: median time} of everything timed in a set of results"""
+    medians = {}
+    for name, result in results['imports'].items():
+        for module in ['device', 'BLACS']:
+            if result.get(module):
+                medians['import %s (%s)'%(name, module)] = result[module]['median']
+    for name, result in results['cases'].items():
+        for call_name, summary in result.get('calls', []):
+            medians['%s %s'%(name, call_name)] = summary['median']
+    return medians
+
+
+def compare(previous, results):
+    old, new = timings(previous), timings(results)
+    print '\nCompared with commit %s:'%previous.get('commit')
+    n_changes = 0
+    for name in sorted(set(old) & set(new)):
+        difference = new[name] - old[name]
+        if abs(difference) > SIGNIFICANT_DIFFERENCE and abs(difference) > SIGNIFICANT_CHANGE*old[name]:
+            print '    %-60s %8.1f ms -> %8.1f ms'%(name, 1e3*old[name], 1e3*new[name])
+            n_changes += 1
+    if not n_changes:
+        print '    no changes of more than %d%% and %g ms'%(100*SIGNIFICANT_CHANGE, 1e3*SIGNIFICANT_DIFFERENCE)
+
+
+def format_memory(summary):
+    return '%6.1f MB'%summary['median'] if summary else '     ? MB'
+
+
+def print_results(results):
+    print '%-30s %12s %12s %12s'%('imports', 'device (ms)', 'BLACS (ms)', 'peak memory')
+    for name, result in sorted(results['imports'].items()):
+        if 'error' in result:
+            print '%-30s %s'%(name, result['error'])
+            continue
+        blacs_time = '%12.1f'%(1e3*result['BLACS']['median']) if result['BLACS'] else '%12s'%'failed'
+        print '%-30s %12.1f %s %12s'%(name, 1e3*result['device']['median'], blacs_time, format_memory(result['peak_memory']))
+    print '\n%-50s %12s %12s'%('first calls', 'time (ms)', 'peak memory')
+    for name, case in CASES:
+        result = results['cases'][name]
+        if 'error' in result:
+            print '%-50s failed: %s'%(name, result['error'])
+            continue
+        print '%-50s %12s %12s'%(name, '', format_memory(result['peak_memory']))
+        for call_name, summary in result['calls']:
+            print '    %-46s %12.1f'%(call_name, 1e3*summary['median'])
+
+
+def main(n_repeats=3, use_stubs=1):
+    env = benchmark_environment(use_stubs)
+    results = {'commit': current_commit(),
+               'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+               'python': sys.version.split()[0],
+               'platform': platform.platform(),
+               'n_repeats': n_repeats,
+               'stubs': stub_names(DRIVER_STUBS_DIR) + (stub_names(SUITE_STUBS_DIR) if use_stubs else []),
+               'simulated': SIMULATED_DRIVERS,
+               'imports': benchmark_imports(n_repeats, env),
+               'cases': benchmark_cases(n_repeats, env)}
+    print_results(results)
+    if os.path.exists(RESULTS_FILE):
+        with open(RESULTS_FILE) as f:
+            compare(json.load(f), results)
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+    print '\nWrote %s'%os.path.abspath(RESULTS_FILE)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
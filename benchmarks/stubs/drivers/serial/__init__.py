@@ -0,0 +1,48 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/drivers/serial/__init__.py                      #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for pyserial. Ports open, but nothing is ever connected to
+them: writes go nowhere and reads time out. Benchmarks put simulated devices
+in place of Serial to talk to."""
+
+import time
+
+
+class SerialException(IOError):
+    pass
+
+
+class Serial(object):
+    def __init__(self, port=None, baudrate=9600, timeout=None, **kwargs):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.is_open = True
+
+    def write(self, data):
+        return len(data)
+
+    def read(self, size=1):
+        if self.timeout:
+            time.sleep(self.timeout)
+        return ''
+
+    def readline(self):
+        return self.read()
+
+    def readlines(self):
+        return []
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
@@ -0,0 +1,14 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/blacs/__init__.py                         #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for BLACS, with the base classes of device tabs and workers.
+Workers can be made and driven in the benchmarking process itself, without
+the GUI or worker processes."""
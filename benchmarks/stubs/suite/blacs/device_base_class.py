@@ -0,0 +1,14 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/blacs/device_base_class.py                #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+class DeviceTab(object):
+    def __init__(self, *args, **kwargs):
+        raise NotImplementedError('Device tabs need BLACS, not its stand-in')
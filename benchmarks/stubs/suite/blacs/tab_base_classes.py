@@ -0,0 +1,32 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/blacs/tab_base_classes.py                 #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+import logging
+
+MODE_MANUAL = 1
+MODE_TRANSITION_TO_BUFFERED = 2
+MODE_TRANSITION_TO_MANUAL = 4
+MODE_BUFFERED = 8
+
+
+def define_state(allowed_modes, queue_state_indefinitely, delete_stale_states=False):
+    def decorator(function):
+        return function
+    return decorator
+
+
+class Worker(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+        self.logger = logging.getLogger('BLACS.worker')
+
+    def init(self):
+        pass
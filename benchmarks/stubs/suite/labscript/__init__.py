@@ -0,0 +1,545 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/labscript/__init__.py                     #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for labscript, with the names the device modules import, so
+that they can be imported without it. There is enough of labscript's
+devices, outputs and pseudoclocks to compile a small connection table too,
+so that the devices' generate_code can be run, the same way as with
+labscript:
+
+    labscript_init('shot.h5', new=True)
+    pineblaster = PineBlaster('pineblaster')
+    output = AnalogOut('output', ni_card, 'ao0')
+    start()
+    output.constant(1e-3, 2.0)
+    stop(0.1)
+
+Unlike labscript, outputs can't ramp and have no units, the only
+pseudoclock is the master one, waits aren't supported, and instructions
+aren't offset by trigger delays. Each pseudoclock ticks once at every time
+an output on one of its clocklines changes, and at the stop time. Device
+properties are saved as attributes of the devices' groups in the shot file,
+where the stand-in for labscript_utils.properties reads them, except those
+that are None."""
+
+import inspect
+from functools import wraps
+
+import numpy as np
+
+# The version the device modules check for:
+__version__ = '2.1.0'
+
+PROPERTY_LOCATIONS = ['connection_table_properties', 'device_properties']
+
+
+class LabscriptError(Exception):
+    pass
+
+
+class config(object):
+    suppress_mild_warnings = True
+    suppress_all_warnings = False
+    compression = 'gzip'
+
+
+startupinfo = None
+
+
+class Compiler(object):
+    """The shot being compiled"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hdf5_filename = None
+        self.inventory = []
+        self.master_pseudoclock = None
+        self.start_called = False
+
+
+compiler = Compiler()
+
+
+def set_passed_properties(property_names=None):
+    """Saves the named arguments of the decorated __init__, or attributes of
+    the device if it has no argument of that name, as its properties"""
+    property_names = property_names or {}
+    def decorator(function):
+        @wraps(function)
+        def new_function(instance, *args, **kwargs):
+            return_value = function(instance, *args, **kwargs)
+            call_values = inspect.getcallargs(function, instance, *args, **kwargs)
+            for location, names in property_names.items():
+                for name in names:
+                    if name in call_values:
+                        instance.set_property(name, call_values[name], location)
+                    elif hasattr(instance, name):
+                        instance.set_property(name, getattr(instance, name), location)
+            return return_value
+        return new_function
+    return decorator
+
+
+def bitfield(arrays, dtype):
+    """Packs a list of arrays of ones and zeros into an array of dtype, the
+    first being the least significant bit. Bits whose entry isn't an array
+    are zero."""
+    dtype = np.dtype(dtype)
+    lengths = [len(array) for array in arrays if np.iterable(array)]
+    bits = np.zeros(max(lengths) if lengths else 1, dtype=dtype)
+    for i, array in enumerate(arrays[:8*dtype.itemsize]):
+        if np.iterable(array):
+            bits |= np.asarray(array, dtype=dtype) << dtype.type(i)
+    return bits
+
+
+class Device(object):
+    description = 'Generic Device'
+    allowed_children = None
+
+    def __init__(self, name, parent_device, connection, call_parents_add_device=True, **kwargs):
+        if self.allowed_children is None:
+            self.allowed_children = [Device]
+        for device in compiler.inventory:
+            if device.name == name:
+                raise LabscriptError('There is already a device named %s'%name)
+        self.name = name
+        self.parent_device = parent_device
+        self.connection = connection
+        self.child_devices = []
+        self._properties = {}
+        if parent_device is not None and call_parents_add_device:
+            parent_device.add_device(self)
+        compiler.inventory.append(self)
+
+    def add_device(self, device):
+        if any(isinstance(device, DeviceClass) for DeviceClass in self.allowed_children):
+            self.child_devices.append(device)
+        else:
+            raise LabscriptError('Devices of type %s cannot be attached to devices of type %s.'%(device.description, self.description))
+
+    def set_property(self, name, value, location=None, overwrite=False):
+        if location not in PROPERTY_LOCATIONS:
+            raise LabscriptError('Device %s: %s is not a valid location for the property %s'%(self.name, location, name))
+        for properties in self._properties.values():
+            if name in properties and not overwrite:
+                raise LabscriptError('Device %s already has the property %s'%(self.name, name))
+        self._properties.setdefault(location, {})[name] = value
+
+    def get_property(self, name, location=None):
+        for property_location, properties in self._properties.items():
+            if location in [None, property_location] and name in properties:
+                return properties[name]
+        raise LabscriptError('Device %s has no property %s'%(self.name, name))
+
+    @property
+    def pseudoclock_device(self):
+        device = self
+        while device is not None and not isinstance(device, PseudoclockDevice):
+            device = device.parent_device
+        return device
+
+    @property
+    def parent_clock_line(self):
+        device = self.parent_device
+        while device is not None and not isinstance(device, ClockLine):
+            device = device.parent_device
+        if device is None:
+            raise LabscriptError('%s is not connected to a clockline'%self.name)
+        return device
+
+    def get_all_outputs(self):
+        """The outputs below this device, not counting the children of outputs"""
+        outputs = []
+        for device in self.child_devices:
+            if isinstance(device, Output):
+                outputs.append(device)
+            else:
+                outputs.extend(device.get_all_outputs())
+        return outputs
+
+    def init_device_group(self, hdf5_file):
+        return hdf5_file['/devices'].create_group(self.name)
+
+    def generate_code(self, hdf5_file):
+        for device in self.child_devices:
+            device.generate_code(hdf5_file)
+
+
+class IntermediateDevice(Device):
+    def __init__(self, name, parent_device, **kwargs):
+        if not isinstance(parent_device, ClockLine):
+            raise LabscriptError('The parent of %s must be a ClockLine'%name)
+        Device.__init__(self, name, parent_device, 'internal', **kwargs)
+
+
+class ClockLine(Device):
+    description = 'Generic ClockLine'
+    allowed_children = [IntermediateDevice]
+
+    def __init__(self, name, pseudoclock, connection, ramping_allowed=True, **kwargs):
+        self.ramping_allowed = ramping_allowed
+        Device.__init__(self, name, pseudoclock, connection, **kwargs)
+
+    @property
+    def clock_limit(self):
+        limits = [device.clock_limit for device in self.child_devices if hasattr(device, 'clock_limit')]
+        return min(limits + [self.parent_device.clock_limit])
+
+
+class Pseudoclock(Device):
+    description = 'Generic Pseudoclock'
+    allowed_children = [ClockLine]
+
+    def __init__(self, name, pseudoclock_device, connection, **kwargs):
+        Device.__init__(self, name, pseudoclock_device, connection, **kwargs)
+        self.clock = []
+        self.times = {}
+
+    @property
+    def clock_limit(self):
+        return self.parent_device.clock_limit
+
+    def generate_clock(self):
+        """An instruction, one tick long, at each time any clockline ticks"""
+        ticks = dict((clock_line, set(times)) for clock_line, times in self.times.items())
+        all_times = sorted(set().union(*ticks.values()))
+        # The last tick, at the stop time, is as short as the pseudoclock allows:
+        steps = np.diff(all_times + [all_times[-1] + 1.0/self.clock_limit])
+        self.clock = []
+        for t, step in zip(all_times, steps):
+            self.clock.append({'start': t, 'reps': 1, 'step': step,
+                               'enabled_clocks': [clock_line for clock_line in self.child_devices if t in ticks[clock_line]]})
+
+    def generate_code(self, hdf5_file):
+        outputs_by_clock_line = dict((clock_line, []) for clock_line in self.child_devices)
+        for output in self.get_all_outputs():
+            outputs_by_clock_line[output.parent_clock_line].append(output)
+        stop_time = self.parent_device.stop_time
+        for clock_line, outputs in outputs_by_clock_line.items():
+            change_times = set([0, stop_time])
+            for output in outputs:
+                change_times.update(output.get_change_times())
+            times = np.array(sorted(change_times))
+            if times[-1] > stop_time:
+                raise LabscriptError('Devices on %s have instructions after the stop time of %ss'%(clock_line.name, stop_time))
+            if np.diff(times).min() < 1.0/clock_line.clock_limit:
+                raise LabscriptError('Devices on %s change closer together than its clock limit of %sHz allows'%(clock_line.name, clock_line.clock_limit))
+            self.times[clock_line] = times
+            for output in outputs:
+                output.make_timeseries(times)
+                output.expand_timeseries()
+        self.generate_clock()
+        Device.generate_code(self, hdf5_file)
+
+
+class Output(Device):
+    description = 'generic output'
+    allowed_children = []
+    dtype = np.float64
+    scale_factor = 1
+    default_value = 0
+
+    def __init__(self, name, parent_device, connection, limits=None, unit_conversion_class=None,
+                 unit_conversion_parameters=None, default_value=None, **kwargs):
+        Device.__init__(self, name, parent_device, connection, **kwargs)
+        self.limits = limits
+        self.unit_conversion_class = unit_conversion_class
+        self.unit_conversion_parameters = unit_conversion_parameters or {}
+        if default_value is not None:
+            self.default_value = default_value
+        self.instructions = {}
+
+    def check_value(self, value, units):
+        if units is not None:
+            raise LabscriptError('The stand-in for labscript has no units, give %s values in its base units'%self.name)
+        if self.limits is not None and not self.limits[0] <= value <= self.limits[1]:
+            raise LabscriptError('%s %s can only have values between %s and %s, not %s'%(self.description, self.name,
+                                                                                      self.limits[0], self.limits[1], value))
+
+    def add_instruction(self, time, instruction, units=None):
+        if not compiler.start_called:
+            raise LabscriptError('Cannot add instructions prior to calling start()')
+        self.check_value(instruction, units)
+        time = round(time, 10)
+        if time < 0:
+            raise LabscriptError('%s %s has an instruction at t=%ss, before the start of the shot'%(self.description, self.name, time))
+        if time in self.instructions:
+            raise LabscriptError('%s %s has two instructions at t=%ss'%(self.description, self.name, time))
+        self.instructions[time] = instruction
+
+    def get_change_times(self):
+        if 0 not in self.instructions:
+            self.instructions[0] = self.default_value
+        self.times = sorted(self.instructions)
+        return self.times
+
+    def make_timeseries(self, change_times):
+        """The value at each of change_times, that of the last instruction at or before it"""
+        values = np.array([self.instructions[t] for t in self.times])
+        self.timeseries = values[np.searchsorted(self.times, change_times, side='right') - 1]
+
+    def expand_timeseries(self, *args, **kwargs):
+        self.raw_output = np.array(self.timeseries, dtype=self.dtype)
+
+
+class AnalogQuantity(Output):
+    description = 'analog quantity'
+
+    def constant(self, t, value, units=None):
+        self.add_instruction(t, value, units)
+
+
+class AnalogOut(AnalogQuantity):
+    description = 'analog output'
+
+
+class StaticAnalogQuantity(Output):
+    description = 'static analog quantity'
+    static_value = None
+
+    def constant(self, value, units=None):
+        if self.static_value is not None:
+            raise LabscriptError('%s %s can only be set once, it is already %s'%(self.description, self.name, self.static_value))
+        self.check_value(value, units)
+        self.static_value = value
+
+    def get_change_times(self):
+        return []
+
+    def make_timeseries(self, change_times):
+        pass
+
+    def expand_timeseries(self, *args, **kwargs):
+        if self.static_value is None:
+            self.static_value = self.default_value
+        self.raw_output = np.array([self.static_value], dtype=self.dtype)
+
+
+class DigitalQuantity(Output):
+    description = 'digital quantity'
+    allowed_states = {1: 'high', 0: 'low'}
+    dtype = np.uint32
+
+    def go_high(self, t):
+        self.add_instruction(t, 1)
+
+    def go_low(self, t):
+        self.add_instruction(t, 0)
+
+
+class DigitalOut(DigitalQuantity):
+    description = 'digital output'
+
+
+class StaticDigitalQuantity(DigitalQuantity):
+    description = 'static digital quantity'
+    static_value = None
+
+    def set_value(self, value):
+        if self.static_value is not None:
+            raise LabscriptError('%s %s can only be set once, it is already %s'%(self.description, self.name, self.static_value))
+        self.static_value = value
+
+    def go_high(self):
+        self.set_value(1)
+
+    def go_low(self):
+        self.set_value(0)
+
+    get_change_times = StaticAnalogQuantity.__dict__['get_change_times']
+    make_timeseries = StaticAnalogQuantity.__dict__['make_timeseries']
+    expand_timeseries = StaticAnalogQuantity.__dict__['expand_timeseries']
+
+
+class StaticDigitalOut(StaticDigitalQuantity):
+    description = 'static digital output'
+
+
+class AnalogIn(Device):
+    description = 'Analog Input'
+
+    def __init__(self, name, parent_device, connection, scale_factor=1.0, units='Volts', **kwargs):
+        Device.__init__(self, name, parent_device, connection, **kwargs)
+        self.scale_factor = scale_factor
+        self.units = units
+        self.acquisitions = []
+
+    def acquire(self, label, start_time, end_time, wait_label='', scale_factor=None, units=None):
+        self.acquisitions.append({'label': label, 'start_time': start_time, 'end_time': end_time,
+                                  'wait_label': wait_label,
+                                  'scale_factor': self.scale_factor if scale_factor is None else scale_factor,
+                                  'units': self.units if units is None else units})
+        return end_time - start_time
+
+
+class DDS(Device):
+    description = 'DDS'
+    allowed_children = [AnalogQuantity, DigitalOut, DigitalQuantity]
+    quantity_class = AnalogQuantity
+
+    def __init__(self, name, parent_device, connection, digital_gate={},
+                 freq_limits=None, freq_conv_class=None, freq_conv_params={},
+                 amp_limits=None, amp_conv_class=None, amp_conv_params={},
+                 phase_limits=None, phase_conv_class=None, phase_conv_params={},
+                 call_parents_add_device=True, **kwargs):
+        # The parent may choose our unit conversions, by our connection:
+        self.connection = connection
+        if hasattr(parent_device, 'get_default_unit_conversion_classes'):
+            default_classes = parent_device.get_default_unit_conversion_classes(self)
+            freq_conv_class, amp_conv_class, phase_conv_class = [conv_class or default for conv_class, default in
+                                                                 zip([freq_conv_class, amp_conv_class, phase_conv_class],
+                                                                     default_classes)]
+        Device.__init__(self, name, parent_device, connection, call_parents_add_device=False, **kwargs)
+        self.frequency = self.quantity_class(self.name + '_freq', self, 'freq', freq_limits, freq_conv_class, freq_conv_params)
+        self.amplitude = self.quantity_class(self.name + '_amp', self, 'amp', amp_limits, amp_conv_class, amp_conv_params)
+        self.phase = self.quantity_class(self.name + '_phase', self, 'phase', phase_limits, phase_conv_class, phase_conv_params)
+        self.gate = None
+        if 'device' in digital_gate and 'connection' in digital_gate:
+            self.gate = DigitalOut(self.name + '_gate', digital_gate['device'], digital_gate['connection'])
+        if call_parents_add_device:
+            self.parent_device.add_device(self)
+
+    def setfreq(self, t, value, units=None):
+        self.frequency.constant(t, value, units)
+
+    def setamp(self, t, value, units=None):
+        self.amplitude.constant(t, value, units)
+
+    def setphase(self, t, value, units=None):
+        self.phase.constant(t, value, units)
+
+    def enable(self, t):
+        if self.gate is None:
+            raise LabscriptError('DDS %s has no digital gate'%self.name)
+        self.gate.go_high(t)
+
+    def disable(self, t):
+        if self.gate is None:
+            raise LabscriptError('DDS %s has no digital gate'%self.name)
+        self.gate.go_low(t)
+
+
+class StaticDDS(DDS):
+    description = 'Static RF'
+    allowed_children = [StaticAnalogQuantity, DigitalOut, StaticDigitalOut]
+    quantity_class = StaticAnalogQuantity
+
+    def setfreq(self, value, units=None):
+        self.frequency.constant(value, units)
+
+    def setamp(self, value, units=None):
+        self.amplitude.constant(value, units)
+
+    def setphase(self, value, units=None):
+        self.phase.constant(value, units)
+
+
+class TriggerableDevice(Device):
+    trigger_edge_type = 'rising'
+
+    def __init__(self, name, parent_device, connection, parentless=False, **kwargs):
+        if None in [parent_device, connection] and not parentless:
+            raise LabscriptError('No parent device or connection given for %s'%name)
+        if parent_device is not None:
+            # Our parent is a Trigger, made for us unless we were given one:
+            if isinstance(parent_device, Trigger):
+                if parent_device.trigger_edge_type != self.trigger_edge_type:
+                    raise LabscriptError('%s needs %s triggers, but %s gives %s ones'%(name, self.trigger_edge_type,
+                                                                                  parent_device.name, parent_device.trigger_edge_type))
+                self.trigger_device = parent_device
+            else:
+                self.trigger_device = Trigger('%s_trigger'%name, parent_device, connection, self.trigger_edge_type)
+            parent_device = self.trigger_device
+            connection = 'trigger'
+        Device.__init__(self, name, parent_device, connection, **kwargs)
+
+
+class Trigger(DigitalOut):
+    description = 'trigger device'
+    allowed_children = [TriggerableDevice]
+
+    def __init__(self, name, parent_device, connection, trigger_edge_type='rising', **kwargs):
+        DigitalOut.__init__(self, name, parent_device, connection, **kwargs)
+        if trigger_edge_type not in ['rising', 'falling']:
+            raise LabscriptError('%s has an invalid trigger edge type %s'%(name, trigger_edge_type))
+        self.trigger_edge_type = trigger_edge_type
+        if trigger_edge_type == 'falling':
+            self.default_value = 1
+
+    def trigger(self, t, duration):
+        if self.trigger_edge_type == 'rising':
+            self.go_high(t)
+            self.go_low(t + duration)
+        else:
+            self.go_low(t)
+            self.go_high(t + duration)
+
+
+class PseudoclockDevice(TriggerableDevice):
+    description = 'Generic Pseudoclock Device'
+    allowed_children = [Pseudoclock]
+    trigger_delay = 0
+    wait_delay = 0
+
+    def __init__(self, name, trigger_device=None, trigger_connection=None, **kwargs):
+        if trigger_device is not None:
+            raise LabscriptError('%s can\'t be triggered, the stand-in for labscript only has a master pseudoclock'%name)
+        if compiler.master_pseudoclock is not None:
+            raise LabscriptError('There is already a master pseudoclock, %s'%compiler.master_pseudoclock.name)
+        compiler.master_pseudoclock = self
+        TriggerableDevice.__init__(self, name, None, None, parentless=True, **kwargs)
+        self.trigger_times = [0]
+        self.stop_time = None
+
+    @property
+    def is_master_pseudoclock(self):
+        return compiler.master_pseudoclock is self
+
+
+def labscript_init(hdf5_filename, labscript_file=None, new=False, overwrite=False):
+    compiler.reset()
+    compiler.hdf5_filename = hdf5_filename
+
+
+def start():
+    compiler.start_called = True
+    return 0
+
+
+def save_properties(hdf5_file, device):
+    group = hdf5_file['/devices'].require_group(device.name)
+    for properties in device._properties.values():
+        for name, value in properties.items():
+            if value is not None:
+                group.attrs[name] = value
+
+
+def generate_code():
+    import labscript_utils.h5_lock, h5py
+    with h5py.File(compiler.hdf5_filename, 'a') as hdf5_file:
+        hdf5_file.require_group('devices')
+        if 'waits' not in hdf5_file:
+            hdf5_file.create_dataset('waits', data=np.zeros(0, dtype=[('label', 'a256'), ('time', float), ('timeout', float)]))
+        for device in compiler.inventory:
+            if device.parent_device is None:
+                device.generate_code(hdf5_file)
+        for device in compiler.inventory:
+            if device._properties:
+                save_properties(hdf5_file, device)
+
+
+def stop(t):
+    for device in compiler.inventory:
+        if isinstance(device, PseudoclockDevice):
+            device.stop_time = t
+    generate_code()
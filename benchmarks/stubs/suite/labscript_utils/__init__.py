@@ -0,0 +1,19 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/labscript_utils/__init__.py               #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for labscript_utils, with the parts the device modules use"""
+
+# The version the device modules check for:
+__version__ = '2.2.0'
+
+
+def check_version(module_name, at_least, less_than):
+    pass
@@ -0,0 +1,13 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/labscript_utils/h5_lock.py                #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for labscript_utils.h5_lock. Shot files are only opened by one
+process at a time in the benchmarks, so no locking is needed."""
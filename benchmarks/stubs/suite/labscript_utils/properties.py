@@ -0,0 +1,17 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/labscript_utils/properties.py             #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for labscript_utils.properties, reading properties from the
+attributes of a device's group in the shot file"""
+
+
+def get(h5_file, device_name, location):
+    return dict(h5_file['devices'][device_name].attrs)
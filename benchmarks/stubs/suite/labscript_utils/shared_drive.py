@@ -0,0 +1,21 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/labscript_utils/shared_drive.py           #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for labscript_utils.shared_drive: paths are the same
+everywhere"""
+
+
+def path_to_agnostic(path):
+    return path
+
+
+def path_to_local(path):
+    return path
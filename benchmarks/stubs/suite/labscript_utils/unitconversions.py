@@ -0,0 +1,26 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/labscript_utils/unitconversions.py        #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for labscript_utils.unitconversions, with the classes the
+device modules use"""
+
+
+class UnitConversion(object):
+    def __init__(self, calibration_parameters=None):
+        self.parameters = calibration_parameters or {}
+
+
+class NovaTechDDS9mFreqConversion(UnitConversion):
+    base_unit = 'Hz'
+
+
+class NovaTechDDS9mAmpConversion(UnitConversion):
+    base_unit = 'Arb'
@@ -0,0 +1,43 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/multipart_form.py                         #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for the multipart_form module BLACS provides to the
+RFBlasterWorker, building multipart/form-data request bodies"""
+
+import mimetools
+
+
+class MultiPartForm(object):
+    def __init__(self):
+        self.form_fields = []
+        self.files = []
+        self.boundary = mimetools.choose_boundary()
+
+    def get_content_type(self):
+        return 'multipart/form-data; boundary=%s'%self.boundary
+
+    def add_field(self, name, value):
+        self.form_fields.append((name, value))
+
+    def add_file_content(self, fieldname, filename, body, mimetype='application/octet-stream'):
+        self.files.append((fieldname, filename, mimetype, str(body)))
+
+    def __str__(self):
+        part_boundary = '--' + self.boundary
+        parts = []
+        for name, value in self.form_fields:
+            parts.extend([part_boundary, 'Content-Disposition: form-data; name="%s"'%name, '', value])
+        for fieldname, filename, mimetype, body in self.files:
+            parts.extend([part_boundary,
+                          'Content-Disposition: form-data; name="%s"; filename="%s"'%(fieldname, filename),
+                          'Content-Type: %s'%mimetype, '', body])
+        parts.extend([part_boundary + '--', ''])
+        return '\r\n'.join(parts)
@@ -0,0 +1,17 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/qtutils/__init__.py                       #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for qtutils, with the names the device modules import"""
+
+
+class UiLoader(object):
+    def load(self, path):
+        raise NotImplementedError('Loading a UI needs qtutils, not its stand-in')
@@ -0,0 +1,29 @@
+#####################################################################
+#                                                                   #
+# /benchmarks/stubs/suite/zprocess/__init__.py                      #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for zprocess, with the inter-process events the workers wait
+on and post. Nothing is ever posted, so waiting on one always times out."""
+
+
+class TimeoutError(Exception):
+    pass
+
+
+class Event(object):
+    def __init__(self, event_name, type='wait'):
+        self.event_name = event_name
+        self.type = type
+
+    def post(self, id, data=None):
+        pass
+
+    def wait(self, id, timeout=None):
+        raise TimeoutError('Event %s was not posted'%self.event_name)
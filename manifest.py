@@ -0,0 +1,136 @@
+#####################################################################
+#                                                                   #
+# /manifest.py                                                      #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Which classes each module in labscript_devices decorates with
+@labscript_device, @BLACS_tab, @BLACS_worker and @runviewer_parser, worked out
+from the modules' source without importing them, and their many
+dependencies.
+
+The answers for every module are stored in manifest.json alongside, so that
+looking them up doesn't mean parsing the source either. Each module's entry
+is checked against a hash of its source before being used, and worked out
+afresh if the source has changed, so the manifest is only ever a cache. Run
+this module to regenerate it after adding or changing devices:
+
+    python -m labscript_devices.manifest
+"""
+
+import os
+import ast
+import json
+import hashlib
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_FILE = os.path.join(PACKAGE_DIR, 'manifest.json')
+
+REGISTER_NAMES = ['labscript_device', 'BLACS_tab', 'BLACS_worker', 'runviewer_parser']
+
+
+def registered_classes_in_source(source):
+    """Returns {register name: class name} for the classes decorated with
+    each register in a module's source"""
+    classes = {}
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Name):
+                decorator_name = decorator.id
+            elif isinstance(decorator, ast.Attribute):
+                decorator_name = decorator.attr
+            else:
+                continue
+            if decorator_name in REGISTER_NAMES:
+                classes[decorator_name] = node.name
+    return classes
+
+
+def read_source(module_name):
+    """Returns the source of a module in labscript_devices, or None if it has none"""
+    try:
+        with open(os.path.join(PACKAGE_DIR, module_name + '.py'), 'rb') as f:
+            return f.read()
+    except IOError:
+        return None
+
+
+def source_hash(source):
+    # Line endings normalised, in case git has converted them:
+    return hashlib.md5(source.replace('\r\n', '\n')).hexdigest()
+
+
+def make_entry(source):
+    return {'md5': source_hash(source), 'classes': registered_classes_in_source(source)}
+
+
+def generate_manifest():
+    """Returns the manifest entries for every module in labscript_devices"""
+    entries = {}
+    for filename in sorted(os.listdir(PACKAGE_DIR)):
+        module_name, extension = os.path.splitext(filename)
+        if extension == '.py' and module_name not in ['__init__', 'manifest']:
+            entries[module_name] = make_entry(read_source(module_name))
+    return entries
+
+
+def write_manifest():
+    entries = generate_manifest()
+    with open(MANIFEST_FILE, 'w') as f:
+        json.dump(entries, f, indent=4, sort_keys=True, separators=(',', ': '))
+        f.write('\n')
+    return entries
+
+
+class Manifest(object):
+    """The manifest, loaded when first needed. Each module's entry is checked
+    against its source the first time the module is looked up, and the answer
+    remembered."""
+    def __init__(self, filename=MANIFEST_FILE):
+        self.filename = filename
+        self.entries = None
+        self.registered = {}
+
+    def load(self):
+        try:
+            with open(self.filename) as f:
+                self.entries = json.load(f)
+        except (IOError, ValueError):
+            # No manifest, or a corrupt one. Work everything out from source:
+            self.entries = {}
+
+    def registered_classes(self, module_name):
+        """Returns {register name: class name} for the classes a module
+        registers, or None if it can't be told from source"""
+        try:
+            return self.registered[module_name]
+        except KeyError:
+            pass
+        if self.entries is None:
+            self.load()
+        source = read_source(module_name)
+        if source is None:
+            classes = None
+        else:
+            entry = self.entries.get(module_name)
+            if entry is None or entry['md5'] != source_hash(source):
+                try:
+                    entry = make_entry(source)
+                except SyntaxError:
+                    # Leave it to the import to report:
+                    entry = {'classes': None}
+            classes = entry['classes']
+        self.registered[module_name] = classes
+        return classes
+
+
+if __name__ == '__main__':
+    entries = write_manifest()
+    print 'Wrote %s: %d modules'%(MANIFEST_FILE, len(entries))
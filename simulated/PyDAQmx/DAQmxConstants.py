@@ -0,0 +1,36 @@
+#####################################################################
+#                                                                   #
+# /simulated/PyDAQmx/DAQmxConstants.py                              #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""The constants the NI workers use, and the error codes the simulated
+PyDAQmx raises, with the values of the real ones"""
+
+DAQmx_Val_Volts = 10348
+DAQmx_Val_Seconds = 10364
+DAQmx_Val_Rising = 10280
+DAQmx_Val_Falling = 10171
+DAQmx_Val_FiniteSamps = 10178
+DAQmx_Val_ContSamps = 10123
+DAQmx_Val_GroupByChannel = 0
+DAQmx_Val_GroupByScanNumber = 1
+DAQmx_Val_ChanPerLine = 0
+DAQmx_Val_ChanForAllLines = 1
+DAQmx_Val_RSE = 10083
+DAQmx_Val_NRSE = 10078
+DAQmx_Val_Diff = 10106
+DAQmx_Val_Cfg_Default = -1
+DAQmx_Val_WaitInfinitely = -1.0
+
+DAQmxErrorInvalidTask = -200088
+DAQmxErrorSamplesNoLongerAvailable = -200279
+DAQmxErrorSamplesNotYetAvailable = -200284
+DAQmxErrorWriteNumChansMismatch = -200524
+DAQmxErrorFiniteOperationNotComplete = -200010
+DAQmxErrorChanTypeMismatch = -200559
@@ -0,0 +1,20 @@
+#####################################################################
+#                                                                   #
+# /simulated/PyDAQmx/DAQmxTypes.py                                  #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""The types the NI workers use"""
+
+from ctypes import byref, c_long, c_ulong, c_double, c_ulonglong
+
+int32 = c_long
+uInt32 = c_ulong
+uInt64 = c_ulonglong
+float64 = c_double
+bool32 = c_ulong
@@ -0,0 +1,366 @@
+#####################################################################
+#                                                                   #
+# /simulated/PyDAQmx/__init__.py                                    #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A simulated PyDAQmx, with the Task methods, constants and types the NI
+workers use. Call install() before a worker's init() to use it in place of
+the real one.
+
+Tasks keep time in wall-clock time. A timed task starts sampling when
+started, or if configured with a start trigger, when send_trigger() is
+called, standing in for the master pseudoclock starting the experiment.
+Tasks clocked from a terminal, by the pseudoclock, start then too.
+
+- Analog inputs read analog_input(channel, times), a sine wave of a
+  frequency depending on the channel's number, sampled at the task's rate.
+  Reads wait until the samples asked for have been acquired, raising a
+  DAQError if that takes longer than the timeout. If more samples than fit
+  in the task's buffer are acquired without being read, the next read
+  raises a DAQError, as for a buffer overflow.
+- Counter inputs measuring semi-periods read the time between successive
+  edges in counter_edges[channel], edge times in seconds since the last
+  send_trigger(). Each is available once the later edge has happened.
+- Outputs keep what was written to them, in Task.data. Timed, finite
+  outputs finish once their samples have been output at the task's rate,
+  and stopping them sooner raises a DAQError, as on the real cards.
+
+Each call into the library takes call_time, and is counted in call_counts,
+by function name."""
+
+import re
+import sys
+import time
+
+import numpy as np
+
+from labscript_devices.simulated.PyDAQmx import DAQmxConstants, DAQmxTypes
+from labscript_devices.simulated.PyDAQmx.DAQmxConstants import *
+from labscript_devices.simulated.PyDAQmx.DAQmxTypes import *
+
+# The version reported:
+VERSION = (15, 0, 0)
+
+# How long each call into the library takes, in seconds:
+call_time = 10e-6
+
+# The frequency of the sine wave on analog input 0. Input n has n + 1 times it:
+WAVEFORM_FREQUENCY = 1e3
+
+# {function name: number of calls}, for benchmarking:
+call_counts = {}
+
+# {counter channel: edge times}, see the module docstring:
+counter_edges = {}
+
+# Tasks started and not yet stopped:
+running_tasks = []
+
+# When send_trigger() was last called:
+triggered_at = None
+
+# How often blocking reads check whether their samples have arrived:
+POLL_INTERVAL = 1e-3
+
+
+class DAQError(Exception):
+    def __init__(self, error, message, function_name):
+        Exception.__init__(self, 'In function %s: %s (%d)'%(function_name, message, error))
+        self.error = error
+        self.mess = message
+        self.fname = function_name
+
+
+def install():
+    """Puts this in sys.modules in place of PyDAQmx"""
+    sys.modules['PyDAQmx'] = sys.modules[__name__]
+    sys.modules['PyDAQmx.DAQmxConstants'] = DAQmxConstants
+    sys.modules['PyDAQmx.DAQmxTypes'] = DAQmxTypes
+
+
+def reset_simulation():
+    """Forgets all tasks, counter inputs and calls"""
+    global triggered_at
+    del running_tasks[:]
+    counter_edges.clear()
+    call_counts.clear()
+    triggered_at = None
+
+
+def n_calls():
+    return sum(call_counts.values())
+
+
+def send_trigger(terminal=None):
+    """Starts the tasks waiting for a start trigger on the given terminal,
+    or on any terminal if None, and the clock for counter_edges"""
+    global triggered_at
+    triggered_at = time.time()
+    for task in running_tasks:
+        if task.trigger_source is not None and task.started_at is None:
+            if terminal is None or task.trigger_source == terminal:
+                task.started_at = triggered_at
+
+
+def analog_input(channel, times):
+    """What an analog input channel reads at the given times"""
+    number = int(re.search(r'(\d*)$', channel).group(1) or 0)
+    return np.sin(2*np.pi*WAVEFORM_FREQUENCY*(number + 1)*times)
+
+
+def expand_channels(names):
+    """The physical channels in a list of them such as 'Dev1/ai0:3, Dev1/ai8'"""
+    channels = []
+    for name in names.split(','):
+        name = name.strip()
+        match = re.match(r'^(.*?)(\d+):(\d+)$', name)
+        if match:
+            prefix, first, last = match.group(1), int(match.group(2)), int(match.group(3))
+            step = 1 if last >= first else -1
+            channels.extend('%s%d'%(prefix, i) for i in range(first, last + step, step))
+        else:
+            channels.append(name)
+    return channels
+
+
+def _call(name):
+    call_counts[name] = call_counts.get(name, 0) + 1
+    finish_at = time.time() + call_time
+    while time.time() < finish_at:
+        pass
+
+
+def _set(value, number):
+    """Sets an output argument, passed by reference or not"""
+    if hasattr(value, '_obj'):
+        value = value._obj
+    value.value = number
+
+
+def DAQmxGetSysNIDAQMajorVersion(value):
+    _call('DAQmxGetSysNIDAQMajorVersion')
+    _set(value, VERSION[0])
+    return 0
+
+
+def DAQmxGetSysNIDAQMinorVersion(value):
+    _call('DAQmxGetSysNIDAQMinorVersion')
+    _set(value, VERSION[1])
+    return 0
+
+
+def DAQmxGetSysNIDAQUpdateVersion(value):
+    _call('DAQmxGetSysNIDAQUpdateVersion')
+    _set(value, VERSION[2])
+    return 0
+
+
+class Task(object):
+    def __init__(self):
+        _call('DAQmxCreateTask')
+        # 'AI', 'AO', 'DO' or 'CI', once channels are added:
+        self.kind = None
+        self.channels = []
+        self.n_lines = 0
+        self.ranges = []
+        self.rate = None
+        self.sample_mode = None
+        self.samples_per_channel = None
+        self.buffer_size = None
+        self.trigger_source = None
+        self.cleared = False
+        # When the task was started, and when it started sampling:
+        self.started = False
+        self.started_at = None
+        # Samples per channel read so far:
+        self.n_read = 0
+        # What was last written, one row per sample, and whether it was timed:
+        self.data = None
+        self.n_samples = 0
+
+    def _check(self, function_name):
+        _call('DAQmx' + function_name)
+        if self.cleared:
+            raise DAQError(DAQmxErrorInvalidTask, 'Task specified is invalid or does not exist.', function_name)
+
+    def _add_channels(self, kind, channels, n_lines=None, limits=None):
+        if self.kind not in [None, kind]:
+            raise DAQError(DAQmxErrorChanTypeMismatch, 'Task cannot contain a channel of the specified type.',
+                           'Create%sChan'%kind)
+        self.kind = kind
+        self.channels.extend(channels)
+        self.n_lines += len(channels) if n_lines is None else n_lines
+        self.ranges.extend([limits]*len(channels))
+
+    def CreateAOVoltageChan(self, physicalChannel, nameToAssignToChannel, minVal, maxVal, units, customScaleName):
+        self._check('CreateAOVoltageChan')
+        self._add_channels('AO', expand_channels(physicalChannel), limits=(minVal, maxVal))
+        return 0
+
+    def CreateAIVoltageChan(self, physicalChannel, nameToAssignToChannel, terminalConfig, minVal, maxVal, units,
+                            customScaleName):
+        self._check('CreateAIVoltageChan')
+        self._add_channels('AI', expand_channels(physicalChannel), limits=(minVal, maxVal))
+        return 0
+
+    def CreateDOChan(self, lines, nameToAssignToLines, lineGrouping):
+        self._check('CreateDOChan')
+        if lineGrouping == DAQmx_Val_ChanForAllLines:
+            # One channel of all the lines:
+            self._add_channels('DO', [lines], n_lines=len(expand_channels(lines)))
+        else:
+            self._add_channels('DO', expand_channels(lines))
+        return 0
+
+    def CreateCISemiPeriodChan(self, counter, nameToAssignToChannel, minVal, maxVal, units, customScaleName):
+        self._check('CreateCISemiPeriodChan')
+        self._add_channels('CI', expand_channels(counter))
+        return 0
+
+    def CfgSampClkTiming(self, source, rate, activeEdge, sampleMode, sampsPerChan):
+        self._check('CfgSampClkTiming')
+        self.rate = float(rate)
+        self.sample_mode = sampleMode
+        self.samples_per_channel = sampsPerChan
+        if source:
+            # Clocked externally, by the pseudoclock, which starts when triggered:
+            self.trigger_source = source
+        if sampleMode == DAQmx_Val_ContSamps:
+            # The buffer sizes DAQmx chooses for continuous inputs, unless asked for larger:
+            default_size = 10000 if rate <= 10000 else 100000 if rate <= 1000000 else 1000000
+            self.buffer_size = max(sampsPerChan, default_size)
+        else:
+            self.buffer_size = sampsPerChan
+        return 0
+
+    def CfgImplicitTiming(self, sampleMode, sampsPerChan):
+        self._check('CfgImplicitTiming')
+        self.sample_mode = sampleMode
+        self.buffer_size = sampsPerChan
+        return 0
+
+    def CfgDigEdgeStartTrig(self, triggerSource, triggerEdge):
+        self._check('CfgDigEdgeStartTrig')
+        self.trigger_source = triggerSource
+        return 0
+
+    def StartTask(self):
+        self._check('StartTask')
+        if not self.started:
+            self.started = True
+            self.n_read = 0
+            self.started_at = None if self.trigger_source is not None else time.time()
+            running_tasks.append(self)
+        return 0
+
+    def StopTask(self):
+        self._check('StopTask')
+        if not self.started:
+            return 0
+        self.started = False
+        running_tasks.remove(self)
+        if self.kind in ['AO', 'DO'] and self.rate is not None and self.sample_mode == DAQmx_Val_FiniteSamps:
+            if self.started_at is None or time.time() < self.started_at + self.n_samples/self.rate:
+                raise DAQError(DAQmxErrorFiniteOperationNotComplete,
+                               'Finite acquisition or generation has been stopped before the requested number '
+                               'of samples were acquired or generated.', 'StopTask')
+        return 0
+
+    def ClearTask(self):
+        _call('DAQmxClearTask')
+        if self.started:
+            self.started = False
+            running_tasks.remove(self)
+        self.cleared = True
+        return 0
+
+    def _write(self, function_name, numSampsPerChan, autoStart, dataLayout, writeArray, sampsPerChanWritten,
+               n_values):
+        self._check(function_name)
+        writeArray = np.asarray(writeArray)
+        if writeArray.size != numSampsPerChan*n_values:
+            raise DAQError(DAQmxErrorWriteNumChansMismatch,
+                           'Write cannot be performed, because the number of channels in the data does not match '
+                           'the number of channels in the task.', function_name)
+        if dataLayout == DAQmx_Val_GroupByChannel:
+            self.data = writeArray.reshape((n_values, numSampsPerChan)).transpose().copy()
+        else:
+            self.data = writeArray.reshape((numSampsPerChan, n_values)).copy()
+        self.n_samples = numSampsPerChan
+        if sampsPerChanWritten is not None:
+            _set(sampsPerChanWritten, numSampsPerChan)
+        if autoStart:
+            self.StartTask()
+        return 0
+
+    def WriteAnalogF64(self, numSampsPerChan, autoStart, timeout, dataLayout, writeArray, sampsPerChanWritten,
+                       reserved):
+        return self._write('WriteAnalogF64', numSampsPerChan, autoStart, dataLayout, writeArray,
+                           sampsPerChanWritten, len(self.channels))
+
+    def WriteDigitalLines(self, numSampsPerChan, autoStart, timeout, dataLayout, writeArray, sampsPerChanWritten,
+                          reserved):
+        return self._write('WriteDigitalLines', numSampsPerChan, autoStart, dataLayout, writeArray,
+                           sampsPerChanWritten, self.n_lines)
+
+    def _n_available(self):
+        """The number of samples per channel acquired and not yet read"""
+        if self.started_at is None:
+            return 0
+        n_acquired = int((time.time() - self.started_at)*self.rate)
+        if self.sample_mode == DAQmx_Val_FiniteSamps:
+            n_acquired = min(n_acquired, self.samples_per_channel)
+        return n_acquired - self.n_read
+
+    def _wait_for(self, function_name, n_available, timeout):
+        """Waits for n_available() to be true, raising a DAQError after timeout"""
+        start_time = time.time()
+        while not n_available():
+            if not self.started:
+                raise DAQError(DAQmxErrorInvalidTask, 'Task specified is invalid or does not exist.', function_name)
+            if timeout != DAQmx_Val_WaitInfinitely and time.time() - start_time >= timeout:
+                raise DAQError(DAQmxErrorSamplesNotYetAvailable,
+                               'Some or all of the samples requested have not yet been acquired.', function_name)
+            time.sleep(POLL_INTERVAL)
+
+    def ReadAnalogF64(self, numSampsPerChan, timeout, fillMode, readArray, arraySizeInSamps, sampsPerChanRead,
+                      reserved):
+        self._check('ReadAnalogF64')
+        self._wait_for('ReadAnalogF64', lambda: self._n_available() >= numSampsPerChan, timeout)
+        if self._n_available() > self.buffer_size:
+            raise DAQError(DAQmxErrorSamplesNoLongerAvailable,
+                           'Attempted to read samples that are no longer available. The requested sample was '
+                           'previously available, but has since been overwritten.', 'ReadAnalogF64')
+        times = (self.n_read + np.arange(numSampsPerChan))/self.rate
+        data = np.empty((len(self.channels), numSampsPerChan))
+        for i, (channel, (minVal, maxVal)) in enumerate(zip(self.channels, self.ranges)):
+            data[i] = np.clip(analog_input(channel, times), minVal, maxVal)
+        if fillMode == DAQmx_Val_GroupByScanNumber:
+            data = data.transpose()
+        readArray[:data.size] = data.ravel()
+        self.n_read += numSampsPerChan
+        _set(sampsPerChanRead, numSampsPerChan)
+        return 0
+
+    def _n_edges_available(self):
+        edges = counter_edges.get(self.channels[0], [])
+        if triggered_at is None:
+            return 0
+        return int(np.searchsorted(edges, time.time() - triggered_at, 'right'))
+
+    def ReadCounterF64(self, numSampsPerChan, timeout, readArray, arraySizeInSamps, sampsPerChanRead, reserved):
+        self._check('ReadCounterF64')
+        # Semi-period n is the time between edges n and n + 1:
+        self._wait_for('ReadCounterF64', lambda: self._n_edges_available() - 1 - self.n_read >= numSampsPerChan,
+                       timeout)
+        edges = counter_edges[self.channels[0]]
+        readArray[:numSampsPerChan] = np.diff(edges[self.n_read:self.n_read + numSampsPerChan + 1])
+        self.n_read += numSampsPerChan
+        _set(sampsPerChanRead, numSampsPerChan)
+        return 0
@@ -0,0 +1,14 @@
+#####################################################################
+#                                                                   #
+# /simulated/__init__.py                                            #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Software stand-ins for the hardware (and hardware libraries) used by the
+BLACS workers in labscript_devices, so that their programming paths can be
+exercised and benchmarked on a machine with no devices attached."""
@@ -0,0 +1,289 @@
+#####################################################################
+#                                                                   #
+# /simulated/camera_server.py                                       #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A simulated camera server, speaking the same socket and ZMQ protocols
+as the camera servers the CameraWorker talks to. For each shot it reads the
+camera's EXPOSURES from the shot file, 'acquires' a synthetic frame for each
+at the configured frame rate, and writes them into the shot file under
+/images/<orientation>/<name>/<frametype>, where lyse expects them. Over ZMQ,
+the CameraWorker can instead ask for the frames to be sent to it with the
+'transfer' command, in which case they are sent in batches as multipart
+messages, a JSON header followed by the raw buffer of each frame.
+
+The frame size, bit depth and frame rate can be set as device properties of
+the camera (see SimCam), otherwise the server's defaults are used. Run this
+module as a script to serve frames for a camera outside of BLACS:
+
+    python -m labscript_devices.simulated.camera_server <camera name> [port]
+"""
+
+import sys
+import time
+import json
+import socket
+import logging
+import threading
+
+import numpy as np
+
+import labscript_utils.h5_lock, h5py
+import labscript_utils.properties
+import labscript_utils.shared_drive as shared_drive
+
+from labscript_devices.CameraConnection import write_frames
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedCameraServer(object):
+    def __init__(self, port, camera_name, use_zmq=False, frame_width=512, frame_height=512,
+                 bit_depth=12, frame_rate=0, compression=None):
+        self.port = int(port)
+        self.camera_name = camera_name
+        self.use_zmq = use_zmq
+        self.defaults = {'frame_width': frame_width, 'frame_height': frame_height,
+                         'bit_depth': bit_depth, 'frame_rate': frame_rate}
+        self.compression = compression
+
+        self.h5_filepath = None
+        self.exposures = None
+        self.frames = []
+        self.frame_pools = {}
+        self.acquisition_thread = None
+        self.aborting = threading.Event()
+        # One dict per shot of how many frames and bytes were written or sent, and how long it took:
+        self.statistics = []
+
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.server_thread = None
+
+    def start(self):
+        target = self.serve_zmq if self.use_zmq else self.serve_sockets
+        self.server_thread = threading.Thread(target=target)
+        self.server_thread.daemon = True
+        if not self.use_zmq:
+            self.listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.listening_socket.bind(('', self.port))
+            self.listening_socket.listen(5)
+            # So that we notice when we are asked to stop:
+            self.listening_socket.settimeout(0.2)
+        self.server_thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.abort()
+        if self.server_thread is not None:
+            self.server_thread.join()
+        if not self.use_zmq:
+            self.listening_socket.close()
+
+    def settings(self, h5_file):
+        settings = dict(self.defaults)
+        device_properties = labscript_utils.properties.get(h5_file, self.camera_name, 'device_properties')
+        for name in settings:
+            if name in device_properties:
+                settings[name] = device_properties[name]
+        settings['orientation'] = device_properties.get('orientation', 'side')
+        return settings
+
+    def transition_to_buffered(self, h5_filepath):
+        self.h5_filepath = shared_drive.path_to_local(h5_filepath)
+        with h5py.File(self.h5_filepath, 'r') as h5_file:
+            group = h5_file['devices/%s'%self.camera_name]
+            self.exposures = group['EXPOSURES'][:] if 'EXPOSURES' in group else []
+            self.shot_settings = self.settings(h5_file)
+        self.frames = []
+        self.aborting.clear()
+        self.acquisition_thread = threading.Thread(target=self.acquire)
+        self.acquisition_thread.daemon = True
+        self.acquisition_thread.start()
+
+    def acquire(self):
+        """Produces a frame for each exposure, no faster than the frame rate"""
+        settings = self.shot_settings
+        shape = (settings['frame_height'], settings['frame_width'])
+        bit_depth = settings['bit_depth']
+        dtype = np.uint8 if bit_depth <= 8 else np.uint16 if bit_depth <= 16 else np.uint32
+        if (shape, bit_depth) not in self.frame_pools:
+            # A few frames of a cloud on a background, with shot noise, to cycle
+            # through so that making frames doesn't dominate the timing:
+            full_scale = 2**bit_depth - 1
+            y, x = np.indices(shape)
+            cloud = np.exp(-((x - shape[1]/2.)**2 + (y - shape[0]/2.)**2)/(2*(min(shape)/8.)**2))
+            rng = np.random.RandomState(0)
+            self.frame_pools[shape, bit_depth] = [np.clip(rng.poisson(full_scale*(0.02 + 0.5*cloud)), 0, full_scale).astype(dtype)
+                                                  for _ in range(4)]
+        frame_pool = self.frame_pools[shape, bit_depth]
+        start_time = time.time()
+        for i in range(len(self.exposures)):
+            if settings['frame_rate']:
+                delay = start_time + float(i)/settings['frame_rate'] - time.time()
+                if delay > 0 and self.aborting.wait(delay):
+                    return
+            if self.aborting.is_set():
+                return
+            self.frames.append(frame_pool[i % len(frame_pool)])
+
+    def transition_to_manual(self):
+        self.acquisition_thread.join()
+        start_time = time.time()
+        with h5py.File(self.h5_filepath, 'a') as h5_file:
+            write_frames(h5_file, self.shot_settings['orientation'], self.exposures, self.frames, self.compression, None)
+        n_bytes = sum(frame.nbytes for frame in self.frames)
+        write_time = time.time() - start_time
+        self.record_statistics(len(self.frames), n_bytes, write_time, 'wrote')
+        self.frames = []
+
+    def record_statistics(self, n_frames, n_bytes, duration, verb):
+        self.statistics.append({'frames': n_frames, 'bytes': n_bytes, 'duration': duration})
+        if duration:
+            logger.info('%s: %s %d frames in %.3f s (%.1f frames/s, %.1f MB/s)', self.camera_name, verb, n_frames, duration,
+                        n_frames/duration, n_bytes/duration/1e6)
+
+    def transfer(self, sock):
+        """Sends the shot's frames to the client in reply to its requests for
+        'frames <max_bytes>', at least one frame and otherwise no more than
+        max_bytes of them per reply, until the client has them all"""
+        if self.acquisition_thread is None:
+            sock.send('error: no shot to transfer frames from')
+            return
+        sock.send('ok')
+        self.acquisition_thread.join()
+        frames = zip(self.exposures, self.frames)
+        start_time = time.time()
+        n_bytes = 0
+        i = 0
+        while True:
+            while not sock.poll(200):
+                if self.stopping.is_set():
+                    return
+            request = sock.recv()
+            try:
+                max_bytes = int(request.split()[1])
+            except (IndexError, ValueError):
+                sock.send('error: expected frames <max_bytes>, not %s'%request)
+                return
+            batch = []
+            batch_bytes = 0
+            while i < len(frames) and (not batch or batch_bytes + frames[i][1].nbytes <= max_bytes):
+                batch.append(frames[i])
+                batch_bytes += frames[i][1].nbytes
+                i += 1
+            header = {'orientation': self.shot_settings['orientation'], 'done': i == len(frames),
+                      'frames': [{'name': exposure['name'], 'frametype': exposure['frametype'],
+                                  'dtype': frame.dtype.str, 'shape': frame.shape} for exposure, frame in batch]}
+            sock.send_multipart([json.dumps(header)] + [frame for _, frame in batch], copy=False)
+            n_bytes += batch_bytes
+            if header['done']:
+                break
+        self.record_statistics(len(frames), n_bytes, time.time() - start_time, 'sent')
+        self.frames = []
+
+    def abort(self):
+        self.aborting.set()
+        if self.acquisition_thread is not None:
+            self.acquisition_thread.join()
+        self.frames = []
+
+    def handle(self, command, respond):
+        """Carries out a command, calling respond() with each response"""
+        with self.lock:
+            try:
+                if command == 'hello':
+                    respond('hello')
+                elif command == 'abort':
+                    self.abort()
+                    respond('done')
+                elif command == 'transfer':
+                    respond('error: frames can only be transferred over ZMQ')
+                elif command == 'done':
+                    respond('ok')
+                    self.transition_to_manual()
+                    respond('done')
+                else:
+                    # Anything else is the path to the shot file:
+                    respond('ok')
+                    self.transition_to_buffered(command)
+                    respond('done')
+            except Exception as e:
+                respond('error: %s'%str(e).replace('\n', ' '))
+
+    def serve_sockets(self):
+        while not self.stopping.is_set():
+            try:
+                connection, _ = self.listening_socket.accept()
+            except socket.timeout:
+                continue
+            thread = threading.Thread(target=self.serve_connection, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def serve_connection(self, connection):
+        connection.settimeout(None)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        respond = lambda response: connection.sendall(response + '\r\n')
+        buffer = ''
+        try:
+            while not self.stopping.is_set():
+                data = connection.recv(4096)
+                if not data:
+                    break
+                buffer += data
+                while '\n' in buffer:
+                    line, buffer = buffer.split('\n', 1)
+                    self.handle(line.strip(), respond)
+        except socket.error:
+            pass
+        finally:
+            connection.close()
+
+    def serve_zmq(self):
+        import zmq
+        sock = zmq.Context.instance().socket(zmq.REP)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.bind('tcp://*:%d'%self.port)
+        responses = []
+        def respond(response):
+            # The first response answers this request, later ones answer the client's follow up requests:
+            if responses:
+                while not sock.poll(200):
+                    if self.stopping.is_set():
+                        return
+                sock.recv()
+            sock.send(response)
+            responses.append(response)
+        try:
+            while not self.stopping.is_set():
+                if not sock.poll(200):
+                    continue
+                command = sock.recv()
+                responses = []
+                if command == 'transfer':
+                    with self.lock:
+                        self.transfer(sock)
+                else:
+                    self.handle(command, respond)
+        finally:
+            sock.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    server = SimulatedCameraServer(sys.argv[2] if len(sys.argv) > 2 else 1027, sys.argv[1])
+    server.start()
+    print 'Simulated camera %s serving on port %d. Ctrl-C to quit.'%(server.camera_name, server.port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,131 @@
+#####################################################################
+#                                                                   #
+# /simulated/novatech.py                                            #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A simulated Novatech DDS9m, presenting the same interface as the
+serial.Serial object the NovatechDDS9mWorker talks to.
+
+Each command line takes command_time to carry out, after it has arrived at
+the device's baud rate, and is answered with OK, or with the four channels'
+values and a status line for QUE. Echo is on until turned off with e d, as
+it is when the device powers up."""
+
+import time
+from collections import deque
+
+N_CHANNELS = 4
+TABLE_SIZE = 16384
+
+
+class SimulatedNovatechDDS9m(object):
+    def __init__(self, port='simulated', baudrate=115200, timeout=0.1, command_time=1e-4, latency=1e-3):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.command_time = command_time
+        self.latency = latency
+        self.is_open = True
+
+        self.echo = True
+        self.mode = '0'
+        self.update_mode = 'a'
+        # (frequency in 0.1 Hz, phase in 1/16384ths of a turn, amplitude out of 1023) of each channel:
+        self.values = [[0, 0, 0] for _ in range(N_CHANNELS)]
+        # The same of channels 0 and 1, at each address of the table:
+        self.table = [{} for _ in range(2)]
+
+        # Counters for benchmarking:
+        self.n_lines = 0
+
+        # When the device will have finished with what it has been sent:
+        self._ready_at = time.time()
+        # (time available to the host, text) of responses from the device:
+        self._responses = deque()
+        self._partial_line = ''
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        now = time.time()
+        self._partial_line += data
+        lines = self._partial_line.split('\r\n')
+        self._partial_line = lines.pop()
+        for line in lines:
+            self.n_lines += 1
+            arrival = max(now + self.latency, self._ready_at) + 10.0*(len(line) + 2)/self.baudrate
+            self._ready_at = arrival + self.command_time
+            response = ''
+            if self.echo:
+                response += line + '\r\n'
+            response += self._execute(line.strip())
+            self._responses.append((self._ready_at + 10.0*len(response)/self.baudrate, response))
+        return len(data)
+
+    def _execute(self, command):
+        args = command.split()
+        if not args:
+            return '?0\r\n'
+        name, args = args[0], args[1:]
+        if name == 'e' and args:
+            self.echo = args[0] == 'e'
+        elif name == 'm' and args:
+            self.mode = args[0]
+        elif name == 'I' and args:
+            self.update_mode = args[0]
+        elif name == 'QUE':
+            lines = ['%08x %04x %04x 0 0 0 0\r\n'%(freq, phase, amp) for freq, phase, amp in self.values]
+            return ''.join(lines) + '0 0 0 0\r\n'
+        elif len(name) == 2 and name[0] in 'FVP' and name[1].isdigit() and args:
+            channel = int(name[1])
+            if name[0] == 'F':
+                self.values[channel][0] = int(round(float(args[0])*1e7))
+            elif name[0] == 'P':
+                self.values[channel][1] = int(args[0])
+            else:
+                self.values[channel][2] = int(args[0])
+        elif name[0] == 't' and len(args) == 2:
+            channel = int(name[1:])
+            address = int(args[0], 16)
+            freq, phase, amp, ignore = args[1].split(',')
+            if address >= TABLE_SIZE:
+                return '?3\r\n'
+            self.table[channel][address] = (int(freq, 16), int(phase, 16), int(amp, 16))
+        else:
+            return '?1\r\n'
+        return 'OK\r\n'
+
+    def readline(self):
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        now = time.time()
+        if self._responses:
+            ready_at, response = self._responses[0]
+            if self.timeout is None or ready_at <= now + self.timeout:
+                time.sleep(max(0, ready_at - now))
+                line, rest = response.split('\r\n', 1)
+                if rest:
+                    self._responses[0] = (ready_at, rest)
+                else:
+                    self._responses.popleft()
+                return line + '\r\n'
+        if self.timeout is not None:
+            time.sleep(self.timeout)
+        return ''
+
+    def readlines(self):
+        lines = []
+        line = self.readline()
+        while line:
+            lines.append(line)
+            line = self.readline()
+        return lines
+
+    def close(self):
+        self.is_open = False
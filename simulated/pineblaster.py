@@ -0,0 +1,174 @@
+#####################################################################
+#                                                                   #
+# /simulated/pineblaster.py                                         #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A simulated PineBlaster, presenting the same interface as the
+serial.Serial object the PineblasterWorker talks to.
+
+Timing is modelled in wall-clock time: bytes take 10 bit periods each on the
+wire, each direction of the USB link adds a fixed latency, and the firmware
+takes command_time to process each line. Lines arriving while the firmware's
+receive buffer already holds rx_buffer_size bytes are dropped, as they are on
+the real device, in which case no response is ever sent.
+
+Told to restart, the firmware carries on answering for reset_time before it
+goes down, and is then unresponsive for boot_time, as after opening the port."""
+
+import time
+from collections import deque
+
+import numpy as np
+
+
+class SimulatedPineBlaster(object):
+    def __init__(self, port='simulated', baudrate=115200, timeout=1, rx_buffer_size=128,
+                 command_time=50e-6, latency=1e-3, boot_time=0, reset_time=0, max_instructions=15000,
+                 clock_resolution=25e-9):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.rx_buffer_size = rx_buffer_size
+        self.command_time = command_time
+        self.latency = latency
+        self.boot_time = boot_time
+        self.reset_time = reset_time
+        self.clock_resolution = clock_resolution
+        self.is_open = True
+
+        self.instructions = np.zeros(max_instructions, dtype=[('period', int), ('reps', int)])
+        self.output = 0
+
+        # Counters for benchmarking:
+        self.n_writes = 0
+        self.n_commands = 0
+        self.n_dropped = 0
+
+        now = time.time()
+        # Opening the port resets the device, and it is unresponsive from
+        # when it goes down until it has booted:
+        self._down_at = now
+        self._booted_at = now + boot_time
+        # When the host-to-device line is next free to transmit:
+        self._tx_free_at = now
+        # When the firmware will have finished processing the last line it received:
+        self._busy_until = now
+        # (start time, number of bytes) of lines received but not yet read by the firmware:
+        self._unread = deque()
+        # (time available to the host, text) of responses from the firmware:
+        self._responses = deque()
+        self._partial_line = ''
+
+    def _byte_time(self, n_bytes):
+        return 10.0*n_bytes/self.baudrate
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        self.n_writes += 1
+        now = time.time()
+        self._partial_line += data
+        lines = self._partial_line.split('\n')
+        self._partial_line = lines.pop()
+        for line in lines:
+            n_bytes = len(line) + 1
+            tx_start = max(now, self._tx_free_at)
+            self._tx_free_at = tx_start + self._byte_time(n_bytes)
+            arrival = self._tx_free_at + self.latency
+            if self._down_at <= arrival < self._booted_at:
+                # The device is resetting and isn't listening:
+                continue
+            while self._unread and self._unread[0][0] <= arrival:
+                self._unread.popleft()
+            if sum(unread_bytes for _, unread_bytes in self._unread) + n_bytes > self.rx_buffer_size:
+                # Receive buffer overflow. The line is mangled and the firmware won't respond to it:
+                self.n_dropped += 1
+                continue
+            start = max(arrival, self._busy_until)
+            self._busy_until = start + self.command_time
+            self._unread.append((start, n_bytes))
+            self.n_commands += 1
+            response = self._execute(line.strip(), self._busy_until)
+            if response:
+                self._responses.append((self._busy_until + self._byte_time(len(response)) + self.latency, response))
+        return len(data)
+
+    def _execute(self, command, t):
+        args = command.split()
+        if command == 'hello':
+            return 'hello\r\n'
+        elif args and args[0] == 'set' and len(args) == 4:
+            address, period, reps = [int(arg) for arg in args[1:]]
+            if not 0 <= address < len(self.instructions):
+                return 'invalid address\r\n'
+            self.instructions[address] = (period, reps)
+            return 'ok\r\n'
+        elif command in ['go high', 'go low']:
+            self.output = int(command == 'go high')
+            return 'ok\r\n'
+        elif command == 'hwstart':
+            return 'ok\r\n'
+        elif command == 'start':
+            self._responses.append((t + self.program_duration() + self.latency, 'done\r\n'))
+            return 'ok\r\n'
+        elif command == 'restart':
+            # The device reboots, forgetting its program and anything it was going to say:
+            self._down_at = t + self.reset_time
+            self._booted_at = self._down_at + self.boot_time
+            self._responses = deque(response for response in self._responses if response[0] < self._down_at)
+            self.instructions[:] = 0
+            return None
+        return 'invalid command\r\n'
+
+    def program_duration(self):
+        """The time the current program takes to run, not counting WAITs"""
+        stops = np.flatnonzero((self.instructions['period'] == 0) & (self.instructions['reps'] == 0))
+        program = self.instructions[:stops[0]] if len(stops) else self.instructions
+        return float(np.sum(program['period']*program['reps']))*self.clock_resolution
+
+    def readline(self):
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        now = time.time()
+        if self._responses:
+            ready_at, response = self._responses[0]
+            if self.timeout is None or ready_at <= now + self.timeout:
+                time.sleep(max(0, ready_at - now))
+                self._responses.popleft()
+                return response
+        if self.timeout is not None:
+            time.sleep(self.timeout)
+        return ''
+
+    def flush(self):
+        """Waits until everything written has been sent"""
+        time.sleep(max(0, self._tx_free_at - time.time()))
+
+    def readlines(self):
+        lines = []
+        line = self.readline()
+        while line:
+            lines.append(line)
+            line = self.readline()
+        return lines
+
+    @property
+    def in_waiting(self):
+        now = time.time()
+        return sum(len(response) for ready_at, response in self._responses if ready_at <= now)
+
+    def reset_input_buffer(self):
+        now = time.time()
+        while self._responses and self._responses[0][0] <= now:
+            self._responses.popleft()
+
+    flushInput = reset_input_buffer
+
+    def close(self):
+        self.is_open = False
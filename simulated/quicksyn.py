@@ -0,0 +1,160 @@
+#####################################################################
+#                                                                   #
+# /simulated/quicksyn.py                                            #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A simulated PhaseMatrix QuickSyn, presenting the same interface as the
+serial.Serial object the QuickSynWorker talks to.
+
+Each line takes command_time per command in it to carry out, and the device
+then needs recovery_time before it will listen again. Lines arriving sooner
+are ignored, which is the grumpiness the QuickSynWorker used to guard against
+with fixed sleeps. If not supports_chaining, lines of several commands
+separated by semicolons are ignored too.
+
+In list mode (FREQ:MODE LIST) the output starts at the first frequency of
+the list and steps to the next one each time trigger() is called, standing in
+for a clock tick on the trigger input."""
+
+import time
+from collections import deque
+
+
+class SimulatedQuickSyn(object):
+    def __init__(self, port='simulated', baudrate=115200, timeout=0.1, command_time=1e-3,
+                 recovery_time=5e-3, latency=1e-3, supports_chaining=True):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.command_time = command_time
+        self.recovery_time = recovery_time
+        self.latency = latency
+        self.supports_chaining = supports_chaining
+        self.is_open = True
+
+        self.frequency = 5000000000000 # mHz
+        self.output = 0
+        self.reference = 'EXT'
+        self.temperature = 35.0
+        self.frequency_list = []
+        self.list_index = 0
+        self.mode = 'CW'
+        self.trigger_source = 'IMM'
+
+        # Counters for benchmarking:
+        self.n_lines = 0
+        self.n_ignored = 0
+
+        # When the device will next listen:
+        self._ready_at = time.time()
+        # (time available to the host, text) of responses from the device:
+        self._responses = deque()
+        self._partial_line = ''
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        now = time.time()
+        self._partial_line += data
+        lines = self._partial_line.split('\r')
+        self._partial_line = lines.pop()
+        for line in lines:
+            self.n_lines += 1
+            arrival = now + 10.0*(len(line) + 1)/self.baudrate + self.latency
+            commands = line.split(';')
+            if arrival < self._ready_at or (len(commands) > 1 and not self.supports_chaining):
+                self.n_ignored += 1
+                continue
+            done = arrival + self.command_time*len(commands)
+            self._ready_at = done + self.recovery_time
+            answers = [answer for answer in [self._execute(command.strip().lstrip(':')) for command in commands]
+                       if answer is not None]
+            if answers:
+                response = ';'.join(answers) + '\n'
+                self._responses.append((done + 10.0*len(response)/self.baudrate + self.latency, response))
+        return len(data)
+
+    def _execute(self, command):
+        args = command.split()
+        if not args:
+            return None
+        name, args = args[0].upper(), args[1:]
+        if name == '*OPC?':
+            return '1'
+        elif name == 'FREQ?':
+            if self.mode == 'LIST':
+                return '%d'%self.frequency_list[self.list_index]
+            return '%d'%self.frequency
+        elif name == 'FREQ' and args:
+            self.frequency = int(float(args[0]))
+        elif name == 'OUTP:STAT?':
+            return 'ON' if self.output else 'OFF'
+        elif name == 'OUTP:STAT' and args:
+            self.output = int(args[0] in ['1', 'ON'])
+        elif name == 'LIST:FREQ' and args:
+            self.frequency_list = [int(float(freq)) for freq in args[0].split(',')]
+        elif name == 'LIST:FREQ:APP' and args:
+            self.frequency_list.extend(int(float(freq)) for freq in args[0].split(','))
+        elif name == 'LIST:FREQ:POIN?':
+            return '%d'%len(self.frequency_list)
+        elif name == 'LIST:TRIG:SOUR' and args:
+            self.trigger_source = args[0]
+        elif name == 'FREQ:MODE?':
+            return self.mode
+        elif name == 'FREQ:MODE' and args and args[0] in ['CW', 'LIST']:
+            if args[0] == 'LIST' and not self.frequency_list:
+                return None
+            self.mode = args[0]
+            self.list_index = 0
+        elif name == 'ROSC:SOUR?':
+            return self.reference
+        elif name == 'ROSC:SOUR' and args:
+            self.reference = args[0]
+        elif name == 'STAT?':
+            # External reference present, frequency and reference locked, and the output state:
+            return '%X'%(0x01 | (self.output << 3))
+        elif name == 'DIAG:MEAS?':
+            return '%.1f'%self.temperature
+        return None
+
+    def trigger(self):
+        """A rising edge on the trigger input"""
+        if self.mode == 'LIST' and self.trigger_source == 'EXT':
+            self.list_index = min(self.list_index + 1, len(self.frequency_list) - 1)
+
+    def output_frequency(self):
+        """The frequency being output, in mHz"""
+        if self.mode == 'LIST':
+            return self.frequency_list[self.list_index]
+        return self.frequency
+
+    def readline(self):
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        now = time.time()
+        if self._responses:
+            ready_at, response = self._responses[0]
+            if self.timeout is None or ready_at <= now + self.timeout:
+                time.sleep(max(0, ready_at - now))
+                self._responses.popleft()
+                return response
+        if self.timeout is not None:
+            time.sleep(self.timeout)
+        return ''
+
+    def readlines(self):
+        lines = []
+        line = self.readline()
+        while line:
+            lines.append(line)
+            line = self.readline()
+        return lines
+
+    def close(self):
+        self.is_open = False
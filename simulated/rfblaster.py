@@ -0,0 +1,101 @@
+#####################################################################
+#                                                                   #
+# /simulated/rfblaster.py                                           #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A simulated RFBlaster, serving the same web form the RFBlasterWorker
+talks to, on localhost. The page shows the frequency (MHz), amplitude and
+phase of each channel in its input fields. Posting the form with set_dds
+sets them, and posting binary programs with upload_and_run stores them and
+answers once they have been loaded, at upload_rate bytes per second. Run
+start() first, and use its address as the worker's:
+
+    server = SimulatedRFBlaster()
+    worker.address = server.start()
+"""
+
+import cgi
+import time
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+
+class RFBlasterRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_page(self):
+        page = self.server.rfblaster.page()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html')
+        self.send_header('Content-length', len(page))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def do_GET(self):
+        self.send_page()
+
+    def do_POST(self):
+        form = cgi.FieldStorage(fp=self.rfile, headers=self.headers,
+                                environ={'REQUEST_METHOD': 'POST', 'CONTENT_TYPE': self.headers['Content-Type']})
+        self.server.rfblaster.handle_form(form)
+        self.send_page()
+
+
+class SimulatedRFBlaster(object):
+    def __init__(self, num_DDS=2, upload_rate=1e6):
+        self.num_DDS = num_DDS
+        self.upload_rate = upload_rate
+        self.values = [{'f': 0.0, 'a': 0.0, 'p': 0.0} for _ in range(num_DDS)]
+        self.programs = {}
+        self.running = False
+        self.httpd = None
+
+        # Counters for benchmarking:
+        self.n_requests = 0
+
+    def start(self):
+        """Starts serving on a free port, returning the address of the form"""
+        self.httpd = HTTPServer(('localhost', 0), RFBlasterRequestHandler)
+        self.httpd.rfblaster = self
+        thread = threading.Thread(target=self.httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return 'http://localhost:%d/'%self.httpd.server_port
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def page(self):
+        fields = []
+        for i, values in enumerate(self.values):
+            for register in 'fap':
+                fields.append('<input type="text" name="%s_ch%d_in" value="%f">'%(register, i, values[register]))
+        return '<html><body><form method="post" enctype="multipart/form-data">\n%s\n</form></body></html>\n'%'\n'.join(fields)
+
+    def handle_form(self, form):
+        self.n_requests += 1
+        if 'set_dds' in form:
+            for i, values in enumerate(self.values):
+                for register in 'fap':
+                    name = '%s_ch%d_in'%(register, i)
+                    if name in form:
+                        values[register] = float(form.getfirst(name))
+        elif 'upload_and_run' in form:
+            n_bytes = 0
+            for i in range(self.num_DDS):
+                name = 'pulse_ch%d'%i
+                if name in form:
+                    self.programs[i] = form[name].value
+                    n_bytes += len(self.programs[i])
+            time.sleep(n_bytes/self.upload_rate)
+            self.running = True
+        elif 'halt' in form:
+            self.running = False
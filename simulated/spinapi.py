@@ -0,0 +1,449 @@
+#####################################################################
+#                                                                   #
+# /simulated/spinapi.py                                             #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A simulated spinapi, the Python wrapper of SpinCore's PulseBlaster
+library, with the functions the PulseBlaster workers use. Call install()
+before a worker's init() to use it in place of the real one.
+
+Each board has an instruction memory and, for each of its DDS channels,
+frequency, phase and amplitude register files, which are written to as the
+real library's pb_start_programming, pb_inst_*, pb_set_* and
+pb_stop_programming would. Running is modelled in wall-clock time: pb_start
+starts the program at instruction zero (or continues it from a WAIT), and
+each instruction lasts its length in ns, so pb_read_status reports the board
+running, waiting and stopped when the real one would.
+
+Each call into the library takes call_time, as on the PCI bus, and is counted
+in call_counts, by function name, so that benchmarks can tell how many calls
+programming a shot took.
+
+Besides the real library's functions, pb_inst_pbonly_array and
+pb_inst_dds2_array write a whole array of instructions in one call, as a
+loop in C over them would, taking call_time plus instruction_time for each
+instruction, and pb_set_program_address sets the address the next
+instruction is written to, which is otherwise only ever the one after the
+last. The workers use them if the spinapi they are given has them."""
+
+import sys
+import time
+
+import numpy as np
+
+# What the workers' 'from spinapi import *' gets, as from the real spinapi:
+__all__ = ['CONTINUE', 'STOP', 'LOOP', 'END_LOOP', 'JSR', 'RTS', 'BRANCH', 'LONG_DELAY', 'WAIT',
+           'PULSE_PROGRAM', 'FREQ_REGS', 'PHASE_REGS', 'ns', 'us', 'ms', 'MHz', 'kHz', 'Hz',
+           'pb_count_boards', 'pb_select_board', 'pb_init', 'pb_core_clock', 'pb_close', 'pb_select_dds',
+           'pb_start_programming', 'pb_stop_programming', 'pb_inst_pbonly', 'pb_inst_dds2',
+           'pb_set_freq', 'pb_set_phase', 'pb_set_amp', 'pb_start', 'pb_stop', 'pb_reset',
+           'pb_read_status', 'program_freq_regs', 'program_phase_regs', 'program_amp_regs']
+
+# The version the PulseBlaster workers check for:
+__version__ = '3.1.1'
+
+CONTINUE = 0
+STOP = 1
+LOOP = 2
+END_LOOP = 3
+JSR = 4
+RTS = 5
+BRANCH = 6
+LONG_DELAY = 7
+WAIT = 8
+
+PULSE_PROGRAM = 0
+FREQ_REGS = 1
+PHASE_REGS = 2
+
+ns = 1.0
+us = 1000.0
+ms = 1000000.0
+
+MHz = 1.0
+kHz = 0.001
+Hz = 0.000001
+
+INSTRUCTION_DTYPE = [('freq0', np.int32), ('phase0', np.int32), ('amp0', np.int32), ('dds_en0', np.int32),
+                     ('phase_reset0', np.int32), ('freq1', np.int32), ('phase1', np.int32), ('amp1', np.int32),
+                     ('dds_en1', np.int32), ('phase_reset1', np.int32), ('flags', np.int64), ('inst', np.int32),
+                     ('inst_data', np.int32), ('length', np.float64)]
+
+# The boards there are, and what they are like:
+n_boards = 1
+max_instructions = 4096
+n_registers = 1024
+n_dds = 2
+
+# How long each call into the library takes, in seconds:
+call_time = 10e-6
+
+# How long each instruction written in bulk takes to store, in seconds:
+instruction_time = 1e-6
+
+# The fields of pb_inst_pbonly's and pb_inst_dds2's arguments, and so of the
+# arrays pb_inst_pbonly_array and pb_inst_dds2_array take:
+PBONLY_FIELDS = ['flags', 'inst', 'inst_data', 'length']
+DDS2_FIELDS = ['freq0', 'phase0', 'amp0', 'dds_en0', 'phase_reset0', 'freq1', 'phase1', 'amp1', 'dds_en1',
+               'phase_reset1'] + PBONLY_FIELDS
+
+# {function name: number of calls}, for benchmarking:
+call_counts = {}
+
+
+class SimulatedPulseBlaster(object):
+    def __init__(self, board_number):
+        self.board_number = board_number
+        self.instructions = np.zeros(max_instructions, dtype=INSTRUCTION_DTYPE)
+        self.registers = [dict((target, np.zeros(n_registers)) for target in ['freq', 'phase', 'amp'])
+                          for _ in range(n_dds)]
+        self.core_clock = None
+        self.selected_dds = 0
+        # What is being programmed, and the address to write next:
+        self.programming = None
+        self.address = 0
+        # How many instructions have been written, for benchmarking:
+        self.n_written = 0
+
+        self.state = 'reset'
+        # The instruction being executed, and when it started, or if
+        # waiting, when it started waiting:
+        self.instruction = 0
+        self.started_at = None
+        # {address of LOOP instruction: iterations left}
+        self.loop_counters = {}
+        # Return addresses of JSR instructions:
+        self.call_stack = []
+        # The program as it was when last started, see timeline():
+        self.opcodes = None
+        self.start_times = None
+        self.jumps = None
+
+    def write_instruction(self, values):
+        if self.programming != PULSE_PROGRAM:
+            raise RuntimeError('pb_start_programming(PULSE_PROGRAM) has not been called')
+        if self.address >= max_instructions:
+            raise RuntimeError('The board has room for only %d instructions'%max_instructions)
+        self.instructions[self.address] = values
+        self.address += 1
+        self.n_written += 1
+        return self.address - 1
+
+    def write_instructions(self, instructions, fields):
+        """Writes the given fields of an array of instructions at the next
+        addresses, zeroing the others. Returns the first address."""
+        if self.programming != PULSE_PROGRAM:
+            raise RuntimeError('pb_start_programming(PULSE_PROGRAM) has not been called')
+        start, stop = self.address, self.address + len(instructions)
+        if stop > max_instructions:
+            raise RuntimeError('The board has room for only %d instructions'%max_instructions)
+        self.instructions[start:stop] = 0
+        for field in fields:
+            self.instructions[field][start:stop] = instructions[field]
+        self.address = stop
+        self.n_written += len(instructions)
+        _wait(instruction_time*len(instructions))
+        return start
+
+    def write_register(self, target, value, address=None):
+        if address is None:
+            address = self.address
+            self.address += 1
+        if address >= n_registers:
+            raise RuntimeError('The board has only %d %s registers'%(n_registers, target))
+        self.registers[self.selected_dds][target][address] = value
+
+    def timeline(self):
+        """Works out what it can of the program's timing in advance, so that
+        advance() need only step through instructions that don't go on to
+        the next, rather than all of them: when each instruction would start
+        if executed in order from the first, and where the instructions
+        that don't go on to the next are"""
+        self.opcodes = self.instructions['inst'].copy()
+        durations = self.instructions['length']*1e-9
+        long_delays = self.opcodes == LONG_DELAY
+        durations[long_delays] *= self.instructions['inst_data'][long_delays]
+        self.start_times = np.concatenate([[0], np.cumsum(durations)])
+        in_order = (self.opcodes == CONTINUE) | long_delays
+        # The last instruction can't go on to the next either:
+        in_order[-1] = False
+        self.jumps = np.flatnonzero(~in_order)
+
+    def start(self):
+        now = time.time()
+        self.advance(now)
+        self.timeline()
+        if self.state == 'waiting':
+            # Triggered:
+            self.state = 'running'
+            self.started_at = now
+        elif self.state in ['reset', 'stopped']:
+            self.instruction = 0
+            self.loop_counters = {}
+            self.call_stack = []
+            self.begin(self.instruction, now)
+
+    def begin(self, instruction, now):
+        """Moves on to the instruction, which executes at once unless it is a
+        WAIT, which waits for a trigger first"""
+        self.instruction = instruction
+        self.started_at = now
+        self.state = 'waiting' if self.instructions[instruction]['inst'] == WAIT else 'running'
+
+    def advance(self, now):
+        """Executes instructions until the one in progress at the given time"""
+        while self.state == 'running':
+            # Skip to the next instruction that doesn't go on to the next one,
+            # unless the time comes before then:
+            jump = self.jumps[np.searchsorted(self.jumps, self.instruction)]
+            if jump > self.instruction:
+                elapsed = now - self.started_at + self.start_times[self.instruction]
+                if elapsed < self.start_times[jump]:
+                    instruction = np.searchsorted(self.start_times, elapsed, 'right') - 1
+                    self.started_at += self.start_times[instruction] - self.start_times[self.instruction]
+                    self.instruction = instruction
+                    return
+                self.begin(jump, self.started_at + self.start_times[jump] - self.start_times[self.instruction])
+                continue
+            instruction = self.instructions[self.instruction]
+            duration = instruction['length']*1e-9
+            if instruction['inst'] == LONG_DELAY:
+                duration *= instruction['inst_data']
+            ends_at = self.started_at + duration
+            if ends_at > now:
+                return
+            next_instruction = self.next_instruction(instruction)
+            if next_instruction is None:
+                self.state = 'stopped'
+                return
+            self.begin(next_instruction, ends_at)
+
+    def next_instruction(self, instruction):
+        """The address of the instruction to execute after the given one,
+        or None if it stops the program"""
+        opcode = instruction['inst']
+        if opcode == STOP:
+            return None
+        elif opcode == BRANCH:
+            return instruction['inst_data']
+        elif opcode == LOOP:
+            self.loop_counters.setdefault(self.instruction, instruction['inst_data'])
+        elif opcode == END_LOOP:
+            start = instruction['inst_data']
+            self.loop_counters[start] -= 1
+            if self.loop_counters[start] > 0:
+                return start
+            del self.loop_counters[start]
+        elif opcode == JSR:
+            self.call_stack.append(self.instruction + 1)
+            return instruction['inst_data']
+        elif opcode == RTS:
+            return self.call_stack.pop()
+        if self.instruction + 1 == max_instructions:
+            # Run off the end of memory:
+            return None
+        return self.instruction + 1
+
+    def status(self):
+        self.advance(time.time())
+        return {'stopped': self.state == 'stopped', 'reset': self.state == 'reset',
+                'running': self.state == 'running', 'waiting': self.state == 'waiting'}
+
+
+boards = {}
+selected_board = 0
+
+
+def install():
+    """Puts this in sys.modules in place of spinapi"""
+    sys.modules['spinapi'] = sys.modules[__name__]
+
+
+def reset_simulation():
+    """Forgets all boards and calls"""
+    boards.clear()
+    call_counts.clear()
+
+
+def board(board_number=None):
+    """The simulated board, by default the one selected"""
+    if board_number is None:
+        board_number = selected_board
+    if board_number not in boards:
+        boards[board_number] = SimulatedPulseBlaster(board_number)
+    return boards[board_number]
+
+
+def n_calls():
+    return sum(call_counts.values())
+
+
+def _wait(duration):
+    finish_at = time.time() + duration
+    while time.time() < finish_at:
+        pass
+
+
+def _call(name):
+    call_counts[name] = call_counts.get(name, 0) + 1
+    _wait(call_time)
+
+
+def _flags(flags):
+    """The flags as an integer. As a string, flag zero is the first
+    character."""
+    if isinstance(flags, basestring):
+        return int(flags[::-1], 2)
+    return int(flags)
+
+
+def pb_count_boards():
+    _call('pb_count_boards')
+    return n_boards
+
+
+def pb_select_board(board_number):
+    global selected_board
+    _call('pb_select_board')
+    if not 0 <= board_number < n_boards:
+        raise RuntimeError('There is no board %d'%board_number)
+    selected_board = board_number
+
+
+def pb_init():
+    _call('pb_init')
+    board()
+
+
+def pb_core_clock(clock_freq):
+    _call('pb_core_clock')
+    board().core_clock = clock_freq
+
+
+def pb_close():
+    _call('pb_close')
+
+
+def pb_select_dds(dds):
+    _call('pb_select_dds')
+    if not 0 <= dds < n_dds:
+        raise RuntimeError('There is no DDS %d'%dds)
+    board().selected_dds = dds
+
+
+def pb_start_programming(target):
+    _call('pb_start_programming')
+    pulseblaster = board()
+    pulseblaster.programming = target
+    pulseblaster.address = 0
+
+
+def pb_stop_programming():
+    _call('pb_stop_programming')
+    board().programming = None
+
+
+def pb_inst_pbonly(flags, inst, inst_data, length):
+    _call('pb_inst_pbonly')
+    return board().write_instruction((0,)*10 + (_flags(flags), inst, inst_data, length))
+
+
+def pb_inst_dds2(freq0, phase0, amp0, dds_en0, phase_reset0, freq1, phase1, amp1, dds_en1, phase_reset1,
+                 flags, inst, inst_data, length):
+    _call('pb_inst_dds2')
+    return board().write_instruction((freq0, phase0, amp0, dds_en0, phase_reset0, freq1, phase1, amp1,
+                                      dds_en1, phase_reset1, _flags(flags), inst, inst_data, length))
+
+
+def pb_inst_pbonly_array(instructions):
+    _call('pb_inst_pbonly_array')
+    return board().write_instructions(instructions, PBONLY_FIELDS)
+
+
+def pb_inst_dds2_array(instructions):
+    _call('pb_inst_dds2_array')
+    return board().write_instructions(instructions, DDS2_FIELDS)
+
+
+def pb_set_program_address(address):
+    _call('pb_set_program_address')
+    pulseblaster = board()
+    if pulseblaster.programming != PULSE_PROGRAM:
+        raise RuntimeError('pb_start_programming(PULSE_PROGRAM) has not been called')
+    if not 0 <= address < max_instructions:
+        raise RuntimeError('The board has room for only %d instructions'%max_instructions)
+    pulseblaster.address = address
+
+
+def pb_set_freq(freq):
+    _call('pb_set_freq')
+    if board().programming != FREQ_REGS:
+        raise RuntimeError('pb_start_programming(FREQ_REGS) has not been called')
+    board().write_register('freq', freq)
+
+
+def pb_set_phase(phase):
+    _call('pb_set_phase')
+    if board().programming != PHASE_REGS:
+        raise RuntimeError('pb_start_programming(PHASE_REGS) has not been called')
+    board().write_register('phase', phase)
+
+
+def pb_set_amp(amp, address):
+    _call('pb_set_amp')
+    board().write_register('amp', amp, address)
+
+
+def pb_start():
+    _call('pb_start')
+    board().start()
+
+
+def pb_stop():
+    _call('pb_stop')
+    pulseblaster = board()
+    pulseblaster.advance(time.time())
+    pulseblaster.state = 'stopped'
+
+
+def pb_reset():
+    _call('pb_reset')
+    pulseblaster = board()
+    pulseblaster.state = 'reset'
+    pulseblaster.instruction = 0
+
+
+def pb_read_status():
+    _call('pb_read_status')
+    return board().status()
+
+
+# These are in Python in the real spinapi too, calling the functions above:
+
+def program_freq_regs(*freqs, **kwargs):
+    call_stop_programming = kwargs.pop('call_stop_programming', True)
+    pb_start_programming(FREQ_REGS)
+    for freq in freqs:
+        pb_set_freq(freq)
+    if call_stop_programming:
+        pb_stop_programming()
+
+
+def program_phase_regs(*phases, **kwargs):
+    call_stop_programming = kwargs.pop('call_stop_programming', True)
+    pb_start_programming(PHASE_REGS)
+    for phase in phases:
+        pb_set_phase(phase)
+    if call_stop_programming:
+        pb_stop_programming()
+
+
+def program_amp_regs(*amps):
+    for i, amp in enumerate(amps):
+        pb_set_amp(amp, i)
@@ -0,0 +1,81 @@
+#####################################################################
+#                                                                   #
+# /simulated/universallibrary.py                                    #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for Measurement Computing's UniversalLibrary, for 16 bit
+boards, with the functions and constants the MC workers use. Call install()
+before a worker's init() to use it in place of the real one.
+
+Like the real library, the volts/counts conversion functions work in single
+precision, truncate, and clip to the range of the DAC. Their calls are
+counted in n_calls. Outputs go nowhere, and the counter never counts."""
+
+import sys
+import math
+import types
+
+import numpy as np
+
+BIP10VOLTS = 1
+UNI10VOLTS = 100
+UNI5VOLTS = 101
+
+AUXPORT = 1
+DIGITALOUT = 1
+DIGITALIN = 2
+
+SIMULTANEOUS = 2
+LOADREG1 = 1
+
+# (low, high) voltages of the ranges, keyed by their UniversalLibrary constants:
+RANGES = {BIP10VOLTS: (-10.0, 10.0),
+          UNI10VOLTS: (0.0, 10.0),
+          UNI5VOLTS: (0.0, 5.0)}
+
+N_COUNTS = 2**16
+
+n_calls = 0
+
+
+def cbFromEngUnits(BoardNum, Range, EngUnits, DataVal):
+    global n_calls
+    n_calls += 1
+    low, high = RANGES[Range]
+    counts = (np.float32(EngUnits) - np.float32(low))/np.float32(high - low)*np.float32(N_COUNTS)
+    if math.isnan(counts):
+        return 0
+    return int(min(max(math.floor(counts), 0), N_COUNTS - 1))
+
+
+def cbToEngUnits(BoardNum, Range, DataVal, EngUnits):
+    global n_calls
+    n_calls += 1
+    low, high = RANGES[Range]
+    return float(np.float32(low) + np.float32(DataVal)*np.float32(high - low)/np.float32(N_COUNTS))
+
+
+def install():
+    """Puts this in sys.modules in place of UniversalLibrary, as both its
+    UniversalLibrary and constants modules"""
+    module = sys.modules[__name__]
+    package = types.ModuleType('UniversalLibrary')
+    package.UniversalLibrary = package.constants = module
+    sys.modules['UniversalLibrary'] = package
+    sys.modules['UniversalLibrary.UniversalLibrary'] = sys.modules['UniversalLibrary.constants'] = module
+
+
+def _succeed(*args, **kwargs):
+    return 0
+
+cbDConfigPort = cbDOut = cbAOut = cbAOutScan = cbCLoad32 = _succeed
+
+
+def cbCIn32(BoardNum, CounterNum, Count):
+    return 0
@@ -0,0 +1,127 @@
+#####################################################################
+#                                                                   #
+# /simulated/zaberapi.py                                            #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""A stand-in for zaberapi, speaking Zaber's binary protocol over a serial
+connection, with the functions the ZaberWorker uses. Call install() before
+the worker's init() to use it in place of the real one.
+
+SimulatedZaberStages presents the same interface as the serial.Serial
+object the stages are daisy chained on. Each stage moves as the
+ZaberStageController estimates it does, so a move absolute command is
+answered with the stage's new position once the move would be finished."""
+
+import sys
+import time
+import struct
+from collections import deque
+
+from labscript_devices.ZaberStageController import move_duration
+
+COMMANDS = {'home': 1, 'move absolute': 20, 'return current position': 60}
+MOVE_ABSOLUTE = COMMANDS['move absolute']
+ERROR = 255
+
+# Device number, command number and data, little endian:
+PACKET = struct.Struct('<BBi')
+
+
+def command(connection, device, command_name, data):
+    connection.write(PACKET.pack(device, COMMANDS[command_name], data))
+
+
+def move(connection, device, data):
+    command(connection, device, 'move absolute', data)
+
+
+def read(connection):
+    """A reply from one of the stages, as (device number, command number,
+    data), or None if there is none within the connection's timeout"""
+    packet = connection.read(PACKET.size)
+    if len(packet) < PACKET.size:
+        return None
+    return PACKET.unpack(packet)
+
+
+def install():
+    """Puts this in sys.modules in place of zaberapi"""
+    sys.modules['zaberapi'] = sys.modules[__name__]
+
+
+class SimulatedZaberStages(object):
+    def __init__(self, port='simulated', baudrate=9600, timeout=None, n_stages=3,
+                 speed=10000, acceleration=50000, maxval=76346, latency=1e-3):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.speed = speed
+        self.acceleration = acceleration
+        self.maxval = maxval
+        self.latency = latency
+        self.is_open = True
+
+        # Positions in steps, keyed by device number:
+        self.positions = dict((device, 0) for device in range(1, n_stages + 1))
+
+        # Counters for benchmarking:
+        self.n_moves = 0
+
+        # (time available to the host, packet) of replies from the stages:
+        self._replies = deque()
+        self._partial_packet = ''
+
+    def _reply_at(self, t, device, command_number, data):
+        self._replies.append((t, PACKET.pack(device, command_number, data)))
+        self._replies = deque(sorted(self._replies))
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        now = time.time()
+        self._partial_packet += data
+        while len(self._partial_packet) >= PACKET.size:
+            packet, self._partial_packet = self._partial_packet[:PACKET.size], self._partial_packet[PACKET.size:]
+            device, command_number, value = PACKET.unpack(packet)
+            arrival = now + 10.0*PACKET.size/self.baudrate + self.latency
+            if device not in self.positions:
+                continue
+            if command_number == MOVE_ABSOLUTE:
+                if not 0 <= value <= self.maxval:
+                    self._reply_at(arrival, device, ERROR, MOVE_ABSOLUTE)
+                    continue
+                self.n_moves += 1
+                done = arrival + move_duration(value - self.positions[device], self.speed, self.acceleration)
+                self.positions[device] = value
+                self._reply_at(done, device, command_number, value)
+            else:
+                self._reply_at(arrival, device, command_number, self.positions[device])
+        return len(data)
+
+    def inWaiting(self):
+        now = time.time()
+        return PACKET.size*sum(1 for ready_at, _ in self._replies if ready_at <= now)
+
+    def read(self, size=1):
+        # Replies are read a whole packet at a time:
+        if not self.is_open:
+            raise IOError('Port %s is closed'%self.port)
+        now = time.time()
+        if self._replies:
+            ready_at, packet = self._replies[0]
+            if self.timeout is None or ready_at <= now + self.timeout:
+                time.sleep(max(0, ready_at - now))
+                self._replies.popleft()
+                return packet[:size]
+        if self.timeout is not None:
+            time.sleep(self.timeout)
+        return ''
+
+    def close(self):
+        self.is_open = False
@@ -0,0 +1,158 @@
+#####################################################################
+#                                                                   #
+# /test_MCCalibration.py                                            #
+#                                                                   #
+# This file is part of the module labscript_devices, in the         #
+# labscript suite (see http://labscriptsuite.org), and is           #
+# licensed under the Simplified BSD License. See the license.txt    #
+# file in the root of the project for the full license.             #
+#                                                                   #
+#####################################################################
+
+"""Checks that MCCalibration converts between volts and counts bit for bit
+as UL does, using the stand-in UniversalLibrary in
+labscript_devices.simulated.universallibrary, and variants of it that round
+to nearest or aren't linear. Run with:
+
+    python -m unittest labscript_devices.test_MCCalibration
+"""
+
+import math
+import unittest
+
+import numpy as np
+
+from labscript_devices.MCCalibration import Calibration, N_COUNTS
+from labscript_devices.simulated import universallibrary
+
+RANGES = universallibrary.RANGES
+
+
+class RoundingUL(object):
+    """The stand-in UL, but rounding volts to the nearest count"""
+    cbToEngUnits = staticmethod(universallibrary.cbToEngUnits)
+
+    @staticmethod
+    def cbFromEngUnits(BoardNum, Range, EngUnits, DataVal):
+        low, high = RANGES[Range]
+        counts = (np.float32(EngUnits) - np.float32(low))/np.float32(high - low)*np.float32(N_COUNTS)
+        if math.isnan(counts):
+            return 0
+        return int(min(max(math.floor(counts + 0.5), 0), N_COUNTS - 1))
+
+
+class NonlinearUL(object):
+    """The stand-in UL, with a DAC whose steps aren't all the same size"""
+    cbFromEngUnits = staticmethod(universallibrary.cbFromEngUnits)
+
+    @staticmethod
+    def cbToEngUnits(BoardNum, Range, DataVal, EngUnits):
+        low, high = RANGES[Range]
+        fraction = float(DataVal)/N_COUNTS
+        return float(np.float32(low + (high - low)*fraction*(1 + 1e-3*(1 - fraction))))
+
+
+class BoardRecordingUL(object):
+    """The stand-in UL, recording which boards it is asked about"""
+
+    def __init__(self):
+        self.boards = set()
+
+    def cbFromEngUnits(self, BoardNum, Range, EngUnits, DataVal):
+        self.boards.add(BoardNum)
+        return universallibrary.cbFromEngUnits(BoardNum, Range, EngUnits, DataVal)
+
+    def cbToEngUnits(self, BoardNum, Range, DataVal, EngUnits):
+        self.boards.add(BoardNum)
+        return universallibrary.cbToEngUnits(BoardNum, Range, DataVal, EngUnits)
+
+
+class CalibrationTests(unittest.TestCase):
+    ULs = [universallibrary, RoundingUL, NonlinearUL]
+
+    def assertIdentical(self, values, expected, results, function):
+        results = np.asarray(results)
+        self.assertEqual(results.shape, expected.shape)
+        mismatched = np.flatnonzero(expected != results)
+        if len(mismatched):
+            self.fail('%s(%r) is %r, UL says %r (%d mismatches)'%(
+                function, values[mismatched[0]], results[mismatched[0]], expected[mismatched[0]], len(mismatched)))
+
+    def ul_volts(self, UL, Range, counts):
+        return np.array([UL.cbToEngUnits(0, Range, int(count), 0.0) for count in counts])
+
+    def ul_counts(self, UL, Range, values):
+        return np.array([UL.cbFromEngUnits(0, Range, value, 0) for value in values])
+
+    def test_every_count_to_volts(self):
+        counts = np.arange(N_COUNTS)
+        for UL in self.ULs:
+            for Range in RANGES:
+                calibration = Calibration(UL, 0, Range)
+                self.assertIdentical(counts, self.ul_volts(UL, Range, counts), calibration.toVolts(counts), 'toVolts')
+
+    def test_volts_around_every_count_to_counts(self):
+        for UL in self.ULs:
+            for Range in RANGES:
+                calibration = Calibration(UL, 0, Range)
+                volts = self.ul_volts(UL, Range, np.arange(N_COUNTS))
+                halfway = (volts[1:] + volts[:-1])/2
+                values = np.concatenate([volts, np.nextafter(volts, -np.inf), np.nextafter(volts, np.inf),
+                                         halfway, np.nextafter(halfway, -np.inf), np.nextafter(halfway, np.inf)])
+                self.assertIdentical(values, self.ul_counts(UL, Range, values), calibration.fromVolts(values), 'fromVolts')
+
+    def test_out_of_range_and_non_finite_volts(self):
+        for UL in self.ULs:
+            for Range in RANGES:
+                low, high = RANGES[Range]
+                calibration = Calibration(UL, 0, Range)
+                values = np.array([low - 1e-3, low - 1, high + 1e-3, high + 1, high, -1e30, 1e30,
+                                   -np.inf, np.inf, np.nan])
+                self.assertIdentical(values, self.ul_counts(UL, Range, values), calibration.fromVolts(values), 'fromVolts')
+
+    def test_random_volts(self):
+        rng = np.random.RandomState(0)
+        for UL in self.ULs:
+            for Range in RANGES:
+                low, high = RANGES[Range]
+                calibration = Calibration(UL, 0, Range)
+                values = rng.uniform(low - 0.1, high + 0.1, (1000, 16))
+                counts = calibration.fromVolts(values)
+                self.assertIdentical(values.ravel(), self.ul_counts(UL, Range, values.ravel()), counts.ravel(), 'fromVolts')
+                volts = calibration.toVolts(counts)
+                self.assertIdentical(counts.ravel(), self.ul_volts(UL, Range, counts.ravel()), volts.ravel(), 'toVolts')
+
+    def test_out_of_range_counts(self):
+        counts = np.array([-1, N_COUNTS, 0, N_COUNTS - 1])
+        for UL in self.ULs:
+            for Range in RANGES:
+                calibration = Calibration(UL, 0, Range)
+                self.assertIdentical(counts, self.ul_volts(UL, Range, counts), calibration.toVolts(counts), 'toVolts')
+
+    def test_linear_table_needs_no_ul_calls(self):
+        for Range in RANGES:
+            calibration = Calibration(universallibrary, 0, Range)
+            self.assertTrue(calibration.linear_volts)
+            self.assertTrue(calibration.linear)
+            calibration.n_ul_calls = 0
+            calibration.toVolts(np.arange(N_COUNTS))
+            self.assertEqual(calibration.n_ul_calls, 0)
+
+    def test_detects_rounding_and_nonlinearity(self):
+        self.assertEqual(Calibration(universallibrary, 0, universallibrary.BIP10VOLTS).rounding, 'truncate')
+        self.assertEqual(Calibration(RoundingUL, 0, universallibrary.BIP10VOLTS).rounding, 'nearest')
+        # Its counts are still linear in volts, only the volts of each count aren't:
+        calibration = Calibration(NonlinearUL, 0, universallibrary.BIP10VOLTS)
+        self.assertFalse(calibration.linear_volts)
+        self.assertTrue(calibration.linear)
+
+    def test_uses_board_number(self):
+        UL = BoardRecordingUL()
+        calibration = Calibration(UL, 3, universallibrary.UNI5VOLTS)
+        calibration.fromVolts([-np.inf, 1.0, 2.5])
+        calibration.toVolts([-1, 7])
+        self.assertEqual(UL.boards, set([3]))
+
+
+if __name__ == '__main__':
+    unittest.main()